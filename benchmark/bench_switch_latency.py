@@ -24,8 +24,10 @@ THE SOFTWARE.
 """
 
 import itertools
+import json
 import logging
 import os
+import time
 import codecs
 import subprocess
 import random
@@ -36,12 +38,24 @@ import cocotb_test.simulator
 
 import cocotb
 from cocotb.clock import Clock
-from cocotb.triggers import RisingEdge, Event
+from cocotb.triggers import RisingEdge, ClockCycles, Event
 from cocotb.regression import TestFactory
+from cocotb.utils import get_sim_time, get_sim_steps
+from cocotb.queue import Queue
 
 from cocotbext.axi import AxiStreamBus, AxiStreamSource, AxiStreamSink, AxiStreamFrame
 from cocotbext.axi.stream import define_stream
 
+from frame_factory import FrameFactory
+
+import profile_io
+import results_db
+from scoreboard import Scoreboard, IngressRecorder, BatchMeans
+from occupancy import OccupancySampler
+from fairness import ArbiterMonitor
+from links import LinkMonitors
+from harness_profile import HarnessProfiler
+
 
 EthHdrBus, EthHdrTransaction, EthHdrSource, EthHdrSink, EthHdrMonitor = define_stream("EthHdr",
     signals=["hdr_valid", "hdr_ready", "dest_mac", "src_mac", "type"]
@@ -101,6 +115,10 @@ class TB:
 
 async def latency_test(dut, idle_inserter=None, backpressure_inserter=None):
 
+    wall_start = time.perf_counter()
+    # wall time per phase and Python hot spots of the bench itself
+    profiler = HarnessProfiler() if int(os.getenv("BENCH_PROFILE", "0")) else None
+
     tb = TB(dut)
     tb.set_idle_generator(idle_inserter)
     tb.set_backpressure_generator(backpressure_inserter)
@@ -110,6 +128,23 @@ async def latency_test(dut, idle_inserter=None, backpressure_inserter=None):
     bench_file = str(os.getenv("BENCH_FILE"))
     architecture = str(os.getenv("ARCHITECTURE"))
     data_width = str(os.getenv("DATA_WIDTH"))
+    quiet = not int(os.getenv("BENCH_VERBOSE", "0"))
+    recorder_size = int(os.getenv("BENCH_RECORDER_SIZE", "65536"))
+    window = int(os.getenv("BENCH_WINDOW", "0"))
+    # measurement window: warm-up and drain frames are simulated but not recorded
+    warmup_frames = int(os.getenv("BENCH_WARMUP", "0"))
+    warmup_cycles = int(os.getenv("BENCH_WARMUP_CYCLES", "0"))
+    drain_frames = int(os.getenv("BENCH_DRAIN", "0"))
+    # relative precision of the mean latency to stop at (0 runs the whole profile)
+    precision = float(os.getenv("BENCH_PRECISION", "0"))
+    batch_size = int(os.getenv("BENCH_BATCH_SIZE", "1000"))
+    # cycles between queue occupancy samples (0 does not sample)
+    occupancy_interval = int(os.getenv("BENCH_OCCUPANCY", "0"))
+    # grants and head-of-queue waits at the output arbiters
+    arbiters = int(os.getenv("BENCH_ARBITERS", "0"))
+    starvation = int(os.getenv("BENCH_STARVATION", "1000"))
+    # cycles per utilization sample of the ports (0 does not monitor them)
+    links_interval = int(os.getenv("BENCH_LINKS", "0"))
 
     # additional hardware parameters
     USER_ENABLE= int(os.getenv("PARAM_AXIS_USER_ENABLE"))
@@ -134,169 +169,302 @@ async def latency_test(dut, idle_inserter=None, backpressure_inserter=None):
     await tb.reset()
 
     # Prepare main folder for results
-    dir_file = f'latency/results'
+    dir_file = str(os.getenv("RESULTS_DIR", "latency/results"))
     Path(dir_file).mkdir(parents=True, exist_ok=True)
 
     # prepare final output file
-    bench_file_name = bench_file.split('/')
-    output_file = f'{dir_file}/{architecture}-{data_width}-{bench_file_name[len(bench_file_name)-1]}'
-
-    # temporal files to store frame data at the input and output AXIS
-    tmp_gen = f'{dir_file}/tmp_gen.txt'
-    tmp_in = f'{dir_file}/tmp_in.txt'
-    tmp_out = f'{dir_file}/tmp_out.txt'
-
-    # Load frames
-    test_frames = [[list() for y in range(tb.radix)] for x in range(tb.radix)]
-    # Altenative with events
-    # test_frames_timed = [list() for x in range(tb.radix)]
-
-    f_gen = open(tmp_gen, "a")
-
-    with open(bench_file) as f:
-        line = f.readline().strip('\n')
-        line = f.readline().strip('\n')
-        line = f.readline().strip('\n')
-        while line:
-            # parse traffic file
-            line_list = line.split(",")
-            input = int(line_list[0])
-            output = int(line_list[1])
-            length = int(line_list[2])
-
-            test_data = bytearray(itertools.islice(itertools.cycle(range(256)), length))
-
-            test_frame = AxiStreamFrame(test_data, tx_complete=tx_complete_source)
-            # Altenative with events
-            # test_frame = AxiStreamFrame(test_data, tx_complete=Event())
-
-            tdest = [0 if (i!=output) else 1 for i in range(tb.radix)][::-1]
-            tdest_int = int(''.join(map(str, tdest)), 2)
-            test_frame.tdest = tdest_int
-
-            test_frame.tid = cur_id | (input << src_shift)
-            test_frame.tuser = length%(2**USER_WIDTH)
-
-            test_frames[input][output].append(test_frame)
-            # Altenative with events
-            # test_frames_timed[input].append(test_frame)
-
-            f_gen.write(f'{input},{output},{test_frame.tid}\n')
-
-            await tb.source[input].send(test_frame)
+    output_file = f'{dir_file}/{architecture}-{data_width}-{profile_io.results_name(bench_file)}'
+
+    # Prepare results, the file holds the latest run and every run is kept in
+    # the results database
+    f_out = open(output_file, "w")
+    metadata = f'Architecture,{architecture},TrafficProfile,{bench_file}'
+    if warmup_frames or warmup_cycles or drain_frames or precision:
+        metadata += f',Warmup,{warmup_frames},WarmupCycles,{warmup_cycles},Drain,{drain_frames},Precision,{precision}'
+    f_out.write(f'{metadata}\n')
+    f_out.write(f'Input,Output,StartTime,EndTime,DiffTime,ID,Length,GenTime\n')
+
+    # frame data at the input and output AXIS is joined by tid as it happens
+    # the warm-up time counts from the start of the traffic, right after reset
+    scoreboard = Scoreboard(f_out, tb.log, warmup_frames=warmup_frames,
+        warmup_until=get_sim_steps(int(get_sim_time('ns')) + warmup_cycles, 'ns') if warmup_cycles else 0,
+        drain_from=profile_io.count_frames(bench_file) - drain_frames if drain_frames else None,
+        batch_means=BatchMeans(batch_size, precision) if precision else None)
+    recorder = IngressRecorder(scoreboard, capacity=recorder_size, quiet=quiet, log=tb.log)
+
+    # payloads sliced from a shared pattern and one-hot tdest tables
+    frames = FrameFactory(tb.radix, USER_WIDTH, tx_complete=recorder.record)
+
+    def check_frame(tid, rx_frame, test_frame):
+        # every difference is reported, the run goes on and fails at the end
+        reasons = []
+        if len(bytes(rx_frame)) != len(bytes(test_frame)):
+            reasons.append(f'received {len(bytes(rx_frame))} bytes, sent {len(bytes(test_frame))}')
+        elif rx_frame.tdata != test_frame.tdata:
+            reasons.append('payload differs')
+
+        if(USER_ENABLE) and rx_frame.tuser != test_frame.tuser:
+            reasons.append(f'tuser {rx_frame.tuser}, sent {test_frame.tuser}')
+        if(ID_ENABLE) and rx_frame.tid != test_frame.tid:
+            reasons.append(f'tid {rx_frame.tid}, sent {test_frame.tid}')
+        if(DEST_ENABLE) and rx_frame.tdest != test_frame.tdest:
+            reasons.append(f'tdest {rx_frame.tdest}, sent {test_frame.tdest}')
+        if reasons:
+            scoreboard.mismatch(tid, ', '.join(reasons))
+
+    # FIFO pointers are probed while the traffic runs
+    if occupancy_interval:
+        sampler = OccupancySampler(dut, dut.clk, architecture, tb.radix, int(os.getenv("PARAM_VC_COUNT", "1")),
+            occupancy_interval, tb.log)
+        sampling = cocotb.start_soon(sampler.run())
+
+    if arbiters:
+        # the OQ crossbar runs on the speedup clock
+        speedup = architecture == "oq"
+        monitor = ArbiterMonitor(dut, dut.clk_su if speedup else dut.clk, architecture, tb.radix, starvation,
+            1/tb.radix if speedup else 1.0, tb.log)
+        monitoring = cocotb.start_soon(monitor.run())
+
+    if links_interval:
+        links = LinkMonitors(dut, dut.clk, tb.radix, dut.rst, links_interval, tb.log)
+        links.start()
+
+    # frames sent and not yet received, by tid
+    in_flight = {}
+    # inputs still reading frames from the profile
+    producers = [tb.radix]
+    finished = Event()
+    # with a window, a slot per frame in flight
+    slots = Queue(maxsize=window) if window else None
+
+    # a monitor per output retires every received frame as soon as it arrives
+    async def retire(output):
+        while True:
+            rx_frame = await tb.sink[output].recv()
+            if precision:
+                # the convergence estimate needs the ingress events as they happen
+                recorder.flush()
+            tid = rx_frame.tid & id_mask
+            test_frame = in_flight.pop(tid, None)
+            if test_frame is None:
+                # duplicated or corrupted tid, nothing to compare with
+                scoreboard.mismatch(tid, f'frame received on output {output} was not in flight')
+                continue
+            scoreboard.egress(tid, output, rx_frame.sim_time_end)
+            check_frame(tid, rx_frame, test_frame)
+            if slots is not None:
+                slots.get_nowait()
+            if not producers[0] and not in_flight:
+                finished.set()
+
+    consumers = [cocotb.start_soon(retire(output)) for output in range(tb.radix)]
+
+    if window:
+        # Streaming: a producer per input reads its frames lazily from the
+        # profile, with at most 'window' frames in flight, so memory does not
+        # grow with the profile. The runs of frames of every input are found
+        # in a single pass, so each producer only reads its own frames
+        runs = profile_io.input_runs(bench_file, tb.radix)
+
+        async def produce(input, start):
+            frame_id = 1
+            for _, output, length, frame_time in profile_io.iter_runs(bench_file, runs[input]):
+                # the latency estimate is stable, the rest of the profile is not needed
+                if scoreboard.converged:
+                    break
+                await slots.put(None)
+                test_frame = frames.build(output, length, frame_id | (input << src_shift))
+                frame_id = (frame_id + 1) % max_count
+                in_flight[test_frame.tid] = test_frame
+
+                if frame_time is None:
+                    scoreboard.generate(test_frame.tid, input, output, length, get_sim_time())
+                    await tb.source[input].send(test_frame)
+                else:
+                    cycle = -(-frame_time*8 // int(data_width))
+                    delay = cycle - int(get_sim_time('ns') - start)
+                    if delay > 0:
+                        await ClockCycles(dut.clk, delay)
+                    # a full window delays the injection, but not the arrival time
+                    scoreboard.generate(test_frame.tid, input, output, length, get_sim_steps(start + cycle, 'ns'), timed=True)
+                    tb.source[input].send_nowait(test_frame)
+
+            producers[0] -= 1
+            if not producers[0] and not in_flight:
+                finished.set()
+
+        if profiler:
+            profiler.phase('send')
+        start = get_sim_time('ns')
+        senders = [cocotb.start_soon(produce(input, start)) for input in range(tb.radix)]
+
+    else:
+        if profiler:
+            profiler.phase('load')
+        # Load frames
+        # frames with and without an arrival time, per input port
+        test_frames_timed = [list() for x in range(tb.radix)]
+        test_frames_untimed = [list() for x in range(tb.radix)]
+
+        # CSV or memory-mapped binary traffic profile, with optional arrival time
+        # of the frames in bytes at line rate
+        for input, output, length, frame_time in profile_io.iter_frames(bench_file):
+            test_frame = frames.build(output, length, cur_id | (input << src_shift))
+
+            in_flight[test_frame.tid] = test_frame
+
+            if frame_time is None:
+                test_frames_untimed[input].append((output, length, test_frame))
+            else:
+                cycle = -(-frame_time*8 // int(data_width))
+                test_frames_timed[input].append((cycle, output, length, test_frame))
 
             cur_id = (cur_id + 1) % max_count
 
-            line = f.readline().strip('\n')
-
-    f_gen.close()
+        def drop(pending_frames):
+            # the latency estimate is stable, frames not sent yet are not needed
+            for *_, test_frame in pending_frames:
+                in_flight.pop(test_frame.tid)
+            if not in_flight:
+                finished.set()
+
+        # inject every timed frame at its arrival cycle
+        async def inject(input, timed_frames, start):
+            timed_frames.sort(key=lambda x: x[0])
+            for k, (cycle, output, length, test_frame) in enumerate(timed_frames):
+                if scoreboard.converged:
+                    drop(timed_frames[k:])
+                    return
+                delay = cycle - int(get_sim_time('ns') - start)
+                if delay > 0:
+                    await ClockCycles(dut.clk, delay)
+                scoreboard.generate(test_frame.tid, input, output, length, get_sim_time(), timed=True)
+                tb.source[input].send_nowait(test_frame)
+
+        # queue the frames without an arrival time back-to-back; when the run
+        # can stop early, only a few at a time, so that it can stop sending
+        async def feed(input, untimed_frames):
+            if precision:
+                tb.source[input].queue_occupancy_limit_frames = 2
+            for k, (output, length, test_frame) in enumerate(untimed_frames):
+                if scoreboard.converged:
+                    drop(untimed_frames[k:])
+                    return
+                scoreboard.generate(test_frame.tid, input, output, length, get_sim_time())
+                await tb.source[input].send(test_frame)
+
+        if profiler:
+            profiler.phase('send')
+        start = get_sim_time('ns')
+        senders = [cocotb.start_soon(inject(input, timed_frames, start))
+            for input, timed_frames in enumerate(test_frames_timed) if timed_frames]
+        senders += [cocotb.start_soon(feed(input, untimed_frames))
+            for input, untimed_frames in enumerate(test_frames_untimed) if untimed_frames]
+
+        producers[0] = 0
+        if not in_flight:
+            finished.set()
+
+    if profiler:
+        # frames still in flight once every frame has been handed to the sources
+        async def sent():
+            for sender in senders:
+                await sender
+            if not finished.is_set():
+                profiler.phase('receive')
+        cocotb.start_soon(sent())
 
     # Benchmarking
-
-    # check if configuration already available
-    try:
-        # create files
-        Path(output_file).touch(exist_ok=False)
-
-        Path(tmp_out).touch(exist_ok=True)
-        f = open(tmp_out, "a")
-
-        # input port loop
-        for input in test_frames:
-            # while there are test frames to be received for that input port
-            while any(input):
-                # advance for next output
-                lst_clean = [x for x in input if x]
-
-                # identify the output port
-                output = bin(lst_clean[0][0].tdest)[2:][::-1].index('1')
-                rx_frame = await tb.sink[output].recv()
-                
-                f.write(f'{output},{rx_frame.sim_time_start},{rx_frame.sim_time_end},{rx_frame.tid}\n')
-
-                test_frame = None
-
-                for input_a in test_frames:
-                    for output_a in input_a:
-                        if output_a and output_a[0].tid == (rx_frame.tid & id_mask):
-                            test_frame = output_a.pop(0)
-                            break
-                
-                # Assertions
-                assert test_frame is not None
-
-                assert len(bytes(rx_frame)) == len(bytes(test_frame))
-                assert rx_frame.tdata == test_frame.tdata
-                assert bytes(test_frame) == bytes(rx_frame)
-
-                if(USER_ENABLE):
-                    assert rx_frame.tuser == test_frame.tuser
-                if(ID_ENABLE):
-                    assert rx_frame.tid == test_frame.tid
-                if(DEST_ENABLE):
-                    assert rx_frame.tdest == test_frame.tdest
-        f.close()
-        
-        assert all(sink.empty() for sink in tb.sink)
-
-        # Altenative with events: read all send events
-        # for input in test_frames_timed:
-        #     for test_frame in input:
-        #         await test_frame.tx_complete.wait()
-        #         print(test_frame.tx_complete.data.sim_time_start)
-
-        # Prepare results
-        f = open(output_file, "a")
-        f.write(f'Architecture,{architecture},TrafficProfile,{bench_file}\n')
-        f.write(f'Input,Output,StartTime,EndTime,DiffTime,ID\n')
-
-        tid_pos_or = 3
-        with open(tmp_in) as f_in, open(tmp_out) as f_out, open(tmp_gen) as f_gen: 
-            # read files
-            tmp_in_data = f_in.readlines()
-            tmp_out_data = f_out.readlines()
-            tmp_gen_data = f_gen.readlines()
-            # sort files by tid
-            tmp_in_list = sorted([[int(y) for y in x.strip('\n').split(",")] for x in tmp_in_data], key=lambda x: x[3])
-            tmp_out_list = sorted([[int(y) for y in x.strip('\n').split(",")] for x in tmp_out_data], key=lambda x: x[3])
-            tmp_gen_list = sorted([[int(y) for y in x.strip('\n').split(",")] for x in tmp_gen_data], key=lambda x: x[2])
-
-            # write output file and perform some checks
-            for line_in, line_out, line_gen in zip (tmp_in_list, tmp_out_list, tmp_gen_list):
-                # check tid and output
-                if((line_in[3] == line_out[3] and line_in[3] == line_gen[2]) and (line_in[0] == line_out[0] and line_in[0] == line_gen[1])):
-                    f.write(f'{line_gen[0]},{line_in[0]},{int(line_in[1]/1000)},{int(line_out[2]/1000)},{int((line_out[2]-line_in[1])/1000)},{line_in[3]}\n')
-                else:
-                    print("Something went wrong: input and output files do not match")
-                    break
-
-        # delete temporal files
-        os.remove(tmp_in)
-        os.remove(tmp_out)
-        os.remove(tmp_gen)
-
-        f.close()
-
-    except FileExistsError:
-        print(f'Results already exists for {architecture} switch architecture with {bench_file} traffic profile.')
-        return
-
-def tx_complete_source(frame):
-    print("Test")
-    print(frame.sim_time_start)
-    print(frame.tid[0])
-    print(frame.tdest)
-    # prepare folder and file
-    dir_file = f'latency/results'
-    Path(dir_file).mkdir(parents=True, exist_ok=True)
-    tmp_in = f'{dir_file}/tmp_in.txt'
-    Path(tmp_in).touch(exist_ok=True)
-
-    output = bin(frame.tdest[0])[2:][::-1].index('1')
-
-    f = open(tmp_in, "a")
-    f.write(f'{output},{frame.sim_time_start},{frame.sim_time_end},{frame.tid[0]}\n')
-    f.close()
+    await finished.wait()
+    if profiler:
+        profiler.phase('post-process')
+    for consumer in consumers:
+        consumer.kill()
+    if occupancy_interval:
+        sampling.kill()
+    if arbiters:
+        monitoring.kill()
+    if links_interval:
+        links.stop()
+
+    # frames still in the sinks after a drop or convergence are not checked,
+    # the scoreboard reports missing and mismatched frames
+    recorder.flush()
+    matched = scoreboard.close()
+    f_out.close()
+
+    # simulation speed, the clock period is 1 ns
+    wall_time = time.perf_counter() - wall_start
+    sim_cycles = int(get_sim_time('ns'))
+    summary = {
+        'simulator': str(os.getenv("SIM", "icarus")),
+        'wall_time': wall_time,
+        'sim_cycles': sim_cycles,
+        'cycles_per_second': sim_cycles/wall_time,
+        'frames': scoreboard.completed,
+        'discarded': scoreboard.discarded,
+        'converged': scoreboard.converged,
+    }
+
+    # occupancy time series next to the results, peaks and buffer size in the summary
+    metrics = []
+    if occupancy_interval:
+        sampler.write(f'{output_file}.occupancy.csv')
+        queues = sampler.stats()
+        depth, saturated = sampler.recommend()
+        summary['occupancy'] = {'interval': occupancy_interval, 'fifo_depth_cycles': depth, 'saturated': saturated, 'queues': queues}
+        metrics = [('occupancy_max', k, queue['max']) for k, queue in enumerate(queues)]
+        metrics += [('occupancy_p99', k, queue['p99']) for k, queue in enumerate(queues)]
+        metrics += [('fifo_depth_cycles', None, depth)]
+        if saturated:
+            tb.log.warning("A queue was full, FIFO_DEPTH_CYCLES has to be above %d to avoid backpressure", depth-1)
+        else:
+            tb.log.info("Peak queue occupancy %d words, FIFO_DEPTH_CYCLES of at least %d avoids backpressure", depth-1, depth)
+
+    if arbiters:
+        outputs = monitor.stats()
+        summary['fairness'] = {'threshold': starvation, 'outputs': outputs}
+        metrics += [('jain_grants', output['output'], output['jain_grants']) for output in outputs]
+        metrics += [('hoq_wait_max', output['output'], max(output['max_wait'])) for output in outputs]
+        metrics += [('starved', output['output'], sum(output['starved'])) for output in outputs]
+        tb.log.info("Lowest Jain's index of the grants %.3f, longest head-of-queue wait %.1f cycles, %d starved frames",
+            min(output['jain_grants'] for output in outputs), max(max(output['max_wait']) for output in outputs),
+            sum(sum(output['starved']) for output in outputs))
+
+    # utilization time series next to the results, counters per port in the summary
+    if links_interval:
+        links.write(f'{output_file}.links.csv')
+        ports = links.stats()
+        summary['links'] = {'interval': links_interval, 'ports': ports, **links.summary()}
+        metrics += links.metrics()
+        tb.log.info("Egress utilization %.3f, bus efficiency %.3f, payload %.3f of the bus capacity",
+            summary['links']['egress_utilization'], summary['links']['egress_efficiency'], summary['links']['egress_goodput'])
+
+    # the results database insertion is left out of the profile
+    if profiler:
+        profiler.stop()
+        profiler.write(f'{output_file}.prof')
+        summary['profile'] = profiler.stats(scoreboard.completed)
+        metrics += [('frames_per_second', None, summary['profile']['frames_per_second'])]
+        metrics += [('python_time', None, summary['profile']['python_time']), ('gpi_time', None, summary['profile']['gpi_time'])]
+        tb.log.info("%.0f frames/s, %.0f cycles/s: %.1f s in Python, %.1f s in the GPI, %.1f s in the simulator",
+            summary['profile']['frames_per_second'], summary['profile']['cycles_per_second'], summary['profile']['python_time'],
+            summary['profile']['gpi_time'], summary['profile']['simulator_time'])
+
+    with open(f'{output_file}.json', "w") as f:
+        json.dump(summary, f, indent=4)
+
+    profile_metadata, columns, offset = profile_io.read_header(bench_file)
+    run_id = results_db.store_latency(output_file, architecture, tb.radix, int(data_width), bench_file,
+        simulator=str(os.getenv("SIM", "icarus")), seed=cocotb.RANDOM_SEED, wall_time=wall_time, sim_cycles=sim_cycles,
+        profile_metadata=dict(zip(profile_metadata[0::2], profile_metadata[1::2])), window=window,
+        mismatches=len(scoreboard.mismatches), warmup_frames=warmup_frames, warmup_cycles=warmup_cycles,
+        drain_frames=drain_frames, precision=precision, discarded=scoreboard.discarded, converged=scoreboard.converged,
+        occupancy_interval=occupancy_interval, arbiters=arbiters, starvation=starvation,
+        links_interval=links_interval, profile=bool(profiler), metrics=metrics)
+    tb.log.info("Run %d stored in %s", run_id, results_db.db_file)
+
+    assert matched, f'{len(scoreboard.mismatches)} frames did not match'
 
 def cycle_pause():
     return itertools.cycle([1, 0, 1, 1, 0])
@@ -0,0 +1,231 @@
+#!/usr/bin/env python
+"""
+
+Copyright (c) 2023 Corundum organization
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+import math
+import os
+import random
+import time
+from pathlib import Path
+
+import numpy as np
+
+import cocotb
+from cocotb.triggers import ClockCycles
+from cocotb.regression import TestFactory
+from cocotb.utils import get_sim_time
+
+from bench_switch_latency import TB
+import results_db
+
+from frame_factory import FrameFactory
+from occupancy import OccupancySampler
+from fairness import ArbiterMonitor, output_fairness
+from links import LinkMonitors
+
+# frames waiting at a source above which new arrivals are dropped, so the
+# backlog does not grow for the whole measurement above saturation
+source_queue_limit = 4
+
+
+async def throughput_test(dut):
+
+    wall_start = time.perf_counter()
+
+    tb = TB(dut)
+
+    # retrieve environment simulation parameters
+    architecture = str(os.getenv("ARCHITECTURE"))
+    data_width = int(os.getenv("DATA_WIDTH"))
+    load = float(os.getenv("OFFERED_LOAD"))
+    length = int(os.getenv("FRAME_LENGTH"))
+    warmup = int(os.getenv("WARMUP_CYCLES"))
+    cycles = int(os.getenv("MEASURE_CYCLES"))
+    output_file = str(os.getenv("THROUGHPUT_FILE"))
+    # cycles between queue occupancy samples (0 does not sample)
+    occupancy_interval = int(os.getenv("OCCUPANCY_INTERVAL", "0"))
+    # head-of-queue wait in cycles above which an input counts as starved (0 does not monitor the arbiters)
+    starvation = int(os.getenv("STARVATION_THRESHOLD", "0"))
+    # cycles per utilization sample of the ports (0 does not monitor them)
+    links_interval = int(os.getenv("LINK_INTERVAL", "0"))
+
+    USER_WIDTH = int(os.getenv("PARAM_AXIS_USER_WIDTH"))
+    ID_WIDTH = int(os.getenv("PARAM_AXIS_ID_WIDTH"))
+
+    # a frame occupies whole beats of the data bus
+    beats = math.ceil(length*8/data_width)
+    # per cycle probability of a new frame at each input (Bernoulli arrivals)
+    p = min(load/beats, 1.0)
+
+    src_width = (len(tb.source)-1).bit_length()
+    src_shift = ID_WIDTH-src_width
+    max_count = 2**src_shift
+
+    frames = FrameFactory(tb.radix, USER_WIDTH)
+
+    # accepted beats per input and output port within the measurement window
+    accepted_in = [0]*tb.radix
+    accepted_out = [0]*tb.radix
+    # frames offered within the window that found the source queue full
+    dropped = [0]*tb.radix
+    window = [None, None]
+    # frames offered and accepted, and bytes accepted, per output (rows) and input (columns) within the window
+    offered = np.zeros((tb.radix, tb.radix), dtype=np.int64)
+    granted = np.zeros((tb.radix, tb.radix), dtype=np.int64)
+    sent = np.zeros((tb.radix, tb.radix), dtype=np.int64)
+
+    def in_window(sim_time):
+        return window[0] is not None and window[0] <= sim_time and (window[1] is None or sim_time < window[1])
+
+    def tx_complete(input):
+        def count(frame):
+            if in_window(frame.sim_time_end):
+                accepted_in[input] += beats
+        return count
+
+    async def generate(input):
+        cur_id = 1
+        callback = tx_complete(input)
+        while True:
+            # geometric gaps between Bernoulli arrivals
+            if p < 1.0:
+                gap = int(math.log(1.0-random.random())/math.log(1.0-p)) + 1
+            else:
+                gap = beats
+            await ClockCycles(dut.clk, gap)
+
+            output = random.randrange(tb.radix)
+            if in_window(get_sim_time()):
+                offered[output, input] += 1
+            if tb.source[input].queue_occupancy_frames >= source_queue_limit:
+                # offered but not accepted: the input cannot keep up
+                if in_window(get_sim_time()):
+                    dropped[input] += 1
+                continue
+            test_frame = frames.build(output, length, cur_id | (input << src_shift))
+            test_frame.tx_complete = callback
+            tb.source[input].send_nowait(test_frame)
+
+            cur_id = (cur_id + 1) % max_count
+
+    async def receive(output):
+        while True:
+            rx_frame = await tb.sink[output].recv()
+            if in_window(rx_frame.sim_time_end):
+                accepted_out[output] += math.ceil(len(rx_frame.tdata)*8/data_width)
+                input = rx_frame.tid >> src_shift
+                granted[output, input] += 1
+                sent[output, input] += len(rx_frame.tdata)
+
+    await tb.reset()
+
+    for k in range(tb.radix):
+        cocotb.start_soon(generate(k))
+        cocotb.start_soon(receive(k))
+
+    # let the queues fill up before measuring
+    await ClockCycles(dut.clk, warmup)
+    window[0] = get_sim_time()
+    if occupancy_interval:
+        sampler = OccupancySampler(dut, dut.clk, architecture, tb.radix, int(os.getenv("PARAM_VC_COUNT", "1")),
+            occupancy_interval, tb.log)
+        sampling = cocotb.start_soon(sampler.run())
+    if starvation:
+        # the OQ crossbar runs on the speedup clock
+        speedup = architecture == "oq"
+        monitor = ArbiterMonitor(dut, dut.clk_su if speedup else dut.clk, architecture, tb.radix, starvation,
+            1/tb.radix if speedup else 1.0, tb.log)
+        monitoring = cocotb.start_soon(monitor.run())
+    if links_interval:
+        links = LinkMonitors(dut, dut.clk, tb.radix, dut.rst, links_interval, tb.log)
+        links.start()
+    await ClockCycles(dut.clk, cycles)
+    window[1] = get_sim_time()
+
+    # results are fractions of the line rate (one beat per cycle and port)
+    input_load = [x/cycles for x in accepted_in]
+    output_load = [x/cycles for x in accepted_out]
+
+    tb.log.info("Offered load %.3f: accepted %.3f at the inputs, %.3f at the outputs, %d frames dropped at the sources", load,
+        sum(input_load)/tb.radix, sum(output_load)/tb.radix, sum(dropped))
+
+    Path(output_file).parent.mkdir(parents=True, exist_ok=True)
+    new_file = not Path(output_file).exists()
+    with open(output_file, "a") as f:
+        if new_file:
+            f.write(f'Architecture,{architecture},Radix,{tb.radix},DataWidth,{data_width},Length,{length}\n')
+            f.write(f'OfferedLoad,Port,InputLoad,OutputLoad\n')
+        for k in range(tb.radix):
+            f.write(f'{load},{k},{input_load[k]:.6f},{output_load[k]:.6f}\n')
+        f.write(f'{load},all,{sum(input_load)/tb.radix:.6f},{sum(output_load)/tb.radix:.6f}\n')
+
+    metrics = [('input_load', k, x) for k, x in enumerate(input_load)] + [('output_load', k, x) for k, x in enumerate(output_load)]
+    metrics += [('input_load', None, sum(input_load)/tb.radix), ('output_load', None, sum(output_load)/tb.radix)]
+    metrics += [('dropped', k, x) for k, x in enumerate(dropped)] + [('dropped', None, sum(dropped))]
+
+    # inputs that offered frames to an output contend for it
+    fairness = output_fairness(granted, sent, offered)
+    metrics += [('jain_grants', output['output'], output['jain_grants']) for output in fairness]
+    metrics += [('jain_bytes', output['output'], output['jain_bytes']) for output in fairness]
+    tb.log.info("Lowest Jain's index over contending inputs: %.3f of the frames, %.3f of the bytes",
+        min(output['jain_grants'] for output in fairness), min(output['jain_bytes'] for output in fairness))
+
+    if starvation:
+        monitoring.kill()
+        outputs = monitor.stats()
+        metrics += [('hoq_wait_max', output['output'], max(output['max_wait'])) for output in outputs]
+        metrics += [('starved', output['output'], sum(output['starved'])) for output in outputs]
+        tb.log.info("Longest head-of-queue wait %.1f cycles, %d starved frames",
+            max(max(output['max_wait']) for output in outputs), sum(sum(output['starved']) for output in outputs))
+
+    if occupancy_interval:
+        sampling.kill()
+        queues = sampler.stats()
+        depth, saturated = sampler.recommend()
+        metrics += [('occupancy_max', k, queue['max']) for k, queue in enumerate(queues)]
+        metrics += [('occupancy_p99', k, queue['p99']) for k, queue in enumerate(queues)]
+        metrics += [('fifo_depth_cycles', None, depth)]
+        if saturated:
+            tb.log.warning("A queue was full, FIFO_DEPTH_CYCLES has to be above %d to avoid backpressure", depth-1)
+        else:
+            tb.log.info("Peak queue occupancy %d words, FIFO_DEPTH_CYCLES of at least %d avoids backpressure", depth-1, depth)
+    if links_interval:
+        links.stop()
+        links.write(f'{Path(output_file).with_suffix("")}-{load}.links.csv')
+        utilization = links.summary()
+        metrics += links.metrics()
+        tb.log.info("Egress utilization %.3f, bus efficiency %.3f, payload %.3f of the bus capacity",
+            utilization['egress_utilization'], utilization['egress_efficiency'], utilization['egress_goodput'])
+    run_id = results_db.store_metrics('throughput', architecture, metrics, radix=tb.radix, data_width=data_width,
+        simulator=str(os.getenv("SIM", "icarus")), seed=cocotb.RANDOM_SEED, wall_time=time.perf_counter()-wall_start,
+        sim_cycles=int(get_sim_time('ns')), offered_load=load, frame_length=length, warmup_cycles=warmup,
+        measure_cycles=cycles, occupancy_interval=occupancy_interval, starvation=starvation,
+        links_interval=links_interval)
+    tb.log.info("Run %d stored in %s", run_id, results_db.db_file)
+
+# things to do within each run
+if cocotb.SIM_NAME:
+
+    factory = TestFactory(throughput_test)
+    factory.generate_tests()
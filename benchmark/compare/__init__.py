@@ -0,0 +1 @@
+from .command import compare
\ No newline at end of file
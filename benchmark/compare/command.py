@@ -0,0 +1,104 @@
+"""
+
+Copyright (c) 2023 Corundum organization
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+import click
+import os
+from pathlib import Path
+
+import results_db
+from types_arg import SwitchSuffix
+from compare.report import collect_files, collect_db, select, latency_groups, throughput_groups, render
+
+@click.command()
+@click.option('-a', multiple=True, type=SwitchSuffix(), help='Architecture to compare (repeatable)  [default: all]')
+@click.option('-r', default=None, type=int, help='Only results of this radix')
+@click.option('-d', default=None, type=int, help='Only results of this data width')
+@click.option('-f', default=None, help='Only latency results of this traffic profile (file name)')
+@click.option('--db', is_flag=False, flag_value=results_db.db_file, default=None,
+    help='Also compare the newest runs of the results database  [default path: $RESULTS_DB or results.db]')
+@click.option('-o', '--output', default='compare/results/report.html', show_default=True, type=click.Path(dir_okay=False, writable=True),
+    help='HTML report')
+@click.option('--tolerance', default=0.02, show_default=True, help='Offered minus accepted load above which an input counts as saturated')
+@click.argument('results', nargs=-1)
+def compare(a:tuple, r:int, d:int, f:str, db:str, output:str, tolerance:float, results:tuple):
+    """
+    Comparison of switch architectures.
+
+    RESULTS are latency and throughput results files or folders searched
+    recursively, such as a sweep folder (by default latency/results and
+    throughput/results). Results are grouped by traffic profile, radix and data
+    width (latency) or radix, data width and frame length (throughput), and
+    the architectures of each group are compared side by side. Besides the
+    tables printed, a self-contained HTML report is written with latency
+    CDFs, per-port latency heat maps and throughput bars, which can be opened
+    offline.
+
+    """
+    for path in results:
+        if not os.path.exists(path):
+            raise click.BadParameter(f'{path!r} does not exist.', param_hint='RESULTS')
+    paths = list(results) or ([] if db else [path for path in ['latency/results', 'throughput/results'] if os.path.isdir(path)])
+
+    latency, throughput = collect_files(paths)
+    if db:
+        if not os.path.exists(db):
+            raise click.BadParameter(f'There is no results database in {db}.', param_hint='--db')
+        db_latency, db_throughput = collect_db(db)
+        latency += db_latency
+        throughput += db_throughput
+
+    latency = select(latency, a, r, d, f)
+    throughput = select(throughput, a, r, d) if f is None else []
+    if not latency and not throughput:
+        print('No results to compare.')
+        return
+
+    latency = latency_groups(latency)
+    throughput = throughput_groups(throughput, tolerance)
+
+    for (profile, radix, data_width), group in latency:
+        print(f'Latency, {profile}: radix {radix}, {data_width} bit data bus')
+        print(f'  {"Architecture":24} {"Frames":>8} {"Mean":>10} {"p50":>10} {"p99":>10} {"p99.9":>10} {"Max":>8}')
+        for row in group['rows']:
+            if row['frames']:
+                print(f'  {row["label"]:24} {row["frames"]:8} {row["mean"]:10.2f} {row["p50"]:10.2f} {row["p99"]:10.2f} '
+                    f'{row["p99.9"]:10.2f} {row["max"]:8}')
+            else:
+                print(f'  {row["label"]:24} {0:8}')
+
+    for (radix, data_width, length), group in throughput:
+        print(f'Throughput: radix {radix}, {data_width} bit data bus, {length} byte frames')
+        print(f'  {"Architecture":24} {"Offered":>8} {"Accepted":>9} {"Output":>8} {"Saturation":>11} {"Throughput":>11}')
+        for row in group['rows']:
+            if row['loads']:
+                point = f'{row["saturation_point"]:.3f}' if row['saturation_point'] is not None else 'none'
+                print(f'  {row["label"]:24} {row["offered"]:8.3f} {row["accepted"]:9.3f} {row["output"]:8.3f} '
+                    f'{point:>11} {row["saturation_throughput"]:11.3f}')
+            else:
+                print(f'  {row["label"]:24} {"-":>8}')
+
+    Path(output).parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w') as file:
+        file.write(render(latency, throughput))
+    print(f'Report written to {output}')
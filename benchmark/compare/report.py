@@ -0,0 +1,483 @@
+"""
+
+Copyright (c) 2023 Corundum organization
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+import html
+import os
+import re
+import time
+from pathlib import Path
+
+import numpy as np
+from jinja2 import Environment
+from markupsafe import Markup
+
+import profile_io
+import results_db
+from stats.analysis import load_results, summary, port_matrix, cdf
+from throughput.command import read_throughput, saturation
+from types_arg import switch_suffixes
+
+# every architecture keeps its colour across the whole report
+colours = {'iq': '#1f77b4', 'iq_voq': '#ff7f0e', 'oq': '#2ca02c', 'cicq': '#d62728'}
+extra_colours = ['#9467bd', '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf']
+# points of each CDF curve, enough for a smooth plot in a small file
+cdf_points = 400
+
+
+def colour(label:str):
+    architecture = label.split(' ')[0]
+    if architecture in colours:
+        return colours[architecture]
+    return extra_colours[sum(map(ord, architecture)) % len(extra_colours)]
+
+
+def architecture_order(entry:dict):
+    architecture = entry['architecture']
+    return (switch_suffixes.index(architecture) if architecture in switch_suffixes else len(switch_suffixes), architecture, entry['source'])
+
+
+def file_kind(output_file:str):
+    """'latency' or 'throughput' for benchmark results files, None for anything else."""
+    try:
+        with open(output_file) as f:
+            f.readline()
+            columns = f.readline()
+    except (OSError, UnicodeDecodeError):
+        return None
+    if columns.startswith('Input,Output,StartTime,EndTime,DiffTime'):
+        return 'latency'
+    if columns.startswith('OfferedLoad,Port,InputLoad,OutputLoad'):
+        return 'throughput'
+    return None
+
+
+def latency_entry(output_file:str, data_width:int = None):
+    """Latency results file as a report entry."""
+    data = load_results(output_file)
+    metadata = data['metadata']
+    architecture = metadata.get('Architecture', '')
+    profile = metadata.get('TrafficProfile', '')
+
+    # results files are named <architecture>-<data width>-<profile>
+    if data_width is None:
+        match = re.match(rf'{re.escape(architecture)}-(\d+)-', os.path.basename(output_file))
+        data_width = int(match.group(1)) if match else None
+    try:
+        radix = int(profile_io.read_header(profile)[0][3])
+    except (OSError, IndexError, ValueError):
+        radix = int(max(data['Input'].max(), data['Output'].max())) + 1 if data['Input'].size else None
+
+    return {
+        'architecture': architecture,
+        'radix': radix,
+        'data_width': data_width,
+        'profile': Path(profile).name,
+        'source': output_file,
+        'origin': Path(output_file).parent.name,
+        'input': data['Input'],
+        'output': data['Output'],
+        'latency': data['DiffTime'],
+    }
+
+
+def throughput_entry(output_file:str):
+    """Throughput results file as a report entry."""
+    metadata_list, aggregate, ports = read_throughput(output_file)
+    metadata = dict(zip(metadata_list[0::2], metadata_list[1::2]))
+    return {
+        'architecture': metadata['Architecture'],
+        'radix': int(metadata['Radix']),
+        'data_width': int(metadata['DataWidth']),
+        'length': int(metadata['Length']),
+        'source': output_file,
+        'origin': Path(output_file).parent.name,
+        'aggregate': aggregate,
+        'ports': ports,
+    }
+
+
+def collect_files(paths):
+    """Latency and throughput entries of the results files given, searching directories recursively."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(str(p) for p in Path(path).rglob('*.txt'))
+        else:
+            files.append(path)
+
+    latency, throughput = [], []
+    for output_file in files:
+        kind = file_kind(output_file)
+        if kind == 'latency':
+            latency.append(latency_entry(output_file))
+        elif kind == 'throughput':
+            throughput.append(throughput_entry(output_file))
+    return latency, throughput
+
+
+def collect_db(path:str = None):
+    """
+    Latency and throughput entries of the newest runs in the results database.
+
+    Every offered load of a throughput curve is a run of its own, the newest
+    run of each offered load is taken.
+
+    """
+    conn = results_db.connect(path)
+    try:
+        latency = []
+        for run in results_db.find_runs(conn, benchmark='latency', latest=True):
+            rows = np.array(results_db.frames(conn, run['id'], ['input', 'output', 'diff_time']), dtype=np.int64).reshape(-1, 3)
+            latency.append({
+                'architecture': run['architecture'],
+                'radix': run['radix'],
+                'data_width': run['data_width'],
+                'profile': Path(run['profile'] or '').name,
+                'source': f'run {run["id"]} ({run["simulator"]})',
+                'origin': f'run {run["id"]}, {run["simulator"]}',
+                'input': rows[:, 0],
+                'output': rows[:, 1],
+                'latency': rows[:, 2],
+            })
+
+        curves = {}
+        for run in results_db.find_runs(conn, benchmark='throughput'):
+            parameters = run['parameters']
+            key = (run['architecture'], run['radix'], run['data_width'], parameters.get('frame_length'), run['simulator'])
+            entry = curves.setdefault(key, {
+                'architecture': run['architecture'],
+                'radix': run['radix'],
+                'data_width': run['data_width'],
+                'length': parameters.get('frame_length'),
+                'source': f'{run["simulator"]} runs',
+                'origin': f'{run["simulator"]} runs',
+                'aggregate': {},
+                'ports': {},
+            })
+            offered = float(parameters.get('offered_load', 0))
+            loads = {}
+            for name, port, value in results_db.metrics(conn, run['id']):
+                loads[(name, port)] = value
+            entry['aggregate'][offered] = (loads.get(('input_load', None), 0.0), loads.get(('output_load', None), 0.0))
+            entry['ports'][offered] = [(k, loads.get(('input_load', k), 0.0), loads.get(('output_load', k), 0.0))
+                for k in range(run['radix'] or 0)]
+        return latency, list(curves.values())
+    finally:
+        conn.close()
+
+
+def select(entries, architectures=(), radix:int = None, data_width:int = None, profile:str = None):
+    """Entries matching the given architectures, radix, data width and profile file name."""
+    return [entry for entry in entries
+        if (not architectures or entry['architecture'] in architectures)
+        and (radix is None or entry['radix'] == radix)
+        and (data_width is None or entry['data_width'] == data_width)
+        and (profile is None or entry.get('profile') == Path(profile).name)]
+
+
+def group(entries, fields):
+    """Entries grouped by the given fields, architectures in a fixed order and labelled uniquely within each group."""
+    groups = {}
+    for entry in entries:
+        groups.setdefault(tuple(entry[field] for field in fields), []).append(entry)
+
+    for members in groups.values():
+        members.sort(key=architecture_order)
+        count = {}
+        for entry in members:
+            count[entry['architecture']] = count.get(entry['architecture'], 0) + 1
+        for entry in members:
+            # the same architecture from several sources, e.g. icarus and verilator results
+            entry['label'] = entry['architecture'] if count[entry['architecture']] == 1 else f'{entry["architecture"]} ({entry["origin"]})'
+    return dict(sorted(groups.items(), key=lambda item: tuple(str(x) for x in item[0])))
+
+
+def latency_row(entry:dict):
+    stats = summary(entry['latency'])
+    return {'label': entry['label'], 'source': entry['source'], **stats}
+
+
+def throughput_row(entry:dict, tolerance:float):
+    aggregate = entry['aggregate']
+    if not aggregate:
+        return {'label': entry['label'], 'source': entry['source'], 'loads': 0}
+    saturation_point, saturation_throughput = saturation(aggregate, tolerance)
+    highest = max(aggregate)
+    return {
+        'label': entry['label'],
+        'source': entry['source'],
+        'loads': len(aggregate),
+        'offered': highest,
+        'accepted': aggregate[highest][0],
+        'output': aggregate[highest][1],
+        'saturation_point': saturation_point,
+        'saturation_throughput': saturation_throughput,
+    }
+
+
+def ticks(upper:float, count:int = 5):
+    """Round tick values from 0 to at least upper."""
+    if upper <= 0:
+        return [0, 1]
+    step = upper/count
+    magnitude = 10**np.floor(np.log10(step))
+    step = next(m*magnitude for m in (1, 2, 2.5, 5, 10) if m*magnitude >= step)
+    return [k*step for k in range(int(np.ceil(upper/step - 1e-9)) + 1)]
+
+
+def axes(width:int, height:int, margin:tuple, x_ticks, y_ticks, x_label:str, y_label:str, x_text=None):
+    """SVG axes with grid lines, tick labels and axis titles."""
+    left, right, top, bottom = margin
+    plot_w, plot_h = width-left-right, height-top-bottom
+    parts = []
+    for y in y_ticks:
+        py = top + plot_h - plot_h*y/y_ticks[-1]
+        parts.append(f'<line x1="{left}" y1="{py:.1f}" x2="{left+plot_w}" y2="{py:.1f}" class="grid"/>')
+        parts.append(f'<text x="{left-6}" y="{py+4:.1f}" text-anchor="end">{y:g}</text>')
+    if x_text is None:
+        for x in x_ticks:
+            px = left + plot_w*x/x_ticks[-1]
+            parts.append(f'<line x1="{px:.1f}" y1="{top}" x2="{px:.1f}" y2="{top+plot_h}" class="grid"/>')
+            parts.append(f'<text x="{px:.1f}" y="{top+plot_h+16}" text-anchor="middle">{x:g}</text>')
+    else:
+        for px, text in x_text:
+            parts.append(f'<text x="{px:.1f}" y="{top+plot_h+16}" text-anchor="middle">{html.escape(text)}</text>')
+    parts.append(f'<rect x="{left}" y="{top}" width="{plot_w}" height="{plot_h}" class="frame"/>')
+    parts.append(f'<text x="{left+plot_w/2:.1f}" y="{height-6}" text-anchor="middle">{html.escape(x_label)}</text>')
+    parts.append(f'<text transform="translate(14,{top+plot_h/2:.1f}) rotate(-90)" text-anchor="middle">{html.escape(y_label)}</text>')
+    return parts
+
+
+def legend(labels, x:int, y:int):
+    parts = []
+    for k, label in enumerate(labels):
+        parts.append(f'<rect x="{x}" y="{y+16*k-9}" width="10" height="10" fill="{colour(label)}"/>')
+        parts.append(f'<text x="{x+15}" y="{y+16*k}">{html.escape(label)}</text>')
+    return parts
+
+
+def cdf_svg(entries, width:int = 640, height:int = 320):
+    """Latency CDF of every entry as an inline SVG line chart."""
+    margin = (60, 170, 12, 40)
+    left, right, top, bottom = margin
+    plot_w, plot_h = width-left-right, height-top-bottom
+
+    curves = [(entry['label'], *cdf(entry['latency'])) for entry in entries if entry['latency'].size]
+    if not curves:
+        return Markup('')
+    x_ticks = ticks(max(float(values[-1]) for label, values, fraction in curves))
+    parts = axes(width, height, margin, x_ticks, [0, 0.25, 0.5, 0.75, 1], 'Latency', 'Fraction of frames')
+
+    for label, values, fraction in curves:
+        if values.size > cdf_points:
+            keep = np.unique(np.linspace(0, values.size-1, cdf_points).astype(int))
+            values, fraction = values[keep], fraction[keep]
+        # a step from 0 up to the first latency
+        xs = np.concatenate(([values[0]], values))
+        ys = np.concatenate(([0.0], fraction))
+        points = ' '.join(f'{left + plot_w*x/x_ticks[-1]:.1f},{top + plot_h*(1-y):.1f}' for x, y in zip(xs, ys))
+        parts.append(f'<polyline points="{points}" fill="none" stroke="{colour(label)}" stroke-width="1.5"/>')
+
+    parts += legend([label for label, values, fraction in curves], width-right+15, top+12)
+    return Markup(f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" class="chart">{"".join(parts)}</svg>')
+
+
+def heat_colour(value:float, lower:float, upper:float):
+    # light yellow for the lowest latency, dark red for the highest
+    t = 0.0 if upper <= lower else (value-lower)/(upper-lower)
+    low, high = (255, 247, 188), (179, 0, 0)
+    return '#' + ''.join(f'{int(round(a + (b-a)*t)):02x}' for a, b in zip(low, high))
+
+
+def heatmap_svg(entry:dict, lower:float, upper:float, cell:int = None):
+    """Mean latency per (input, output) pair of an entry as an inline SVG heat map."""
+    radix = entry['radix'] or 1
+    count, mean = port_matrix(entry['input'], entry['output'], entry['latency'], radix)
+    cell = cell or max(12, min(36, 288//radix))
+    left, top = 44, 34
+    width, height = left + cell*radix + 8, top + cell*radix + 8
+
+    parts = [f'<text x="{left}" y="14" class="title">{html.escape(entry["label"])}</text>']
+    for k in range(radix):
+        parts.append(f'<text x="{left + cell*k + cell/2:.1f}" y="{top-5}" text-anchor="middle" class="small">{k}</text>')
+        parts.append(f'<text x="{left-5}" y="{top + cell*k + cell/2 + 4:.1f}" text-anchor="end" class="small">{k}</text>')
+    for i in range(radix):
+        for j in range(radix):
+            if count[i, j]:
+                fill = heat_colour(mean[i, j], lower, upper)
+                tip = f'input {i}, output {j}: {count[i, j]} frames, mean latency {mean[i, j]:.2f}'
+            else:
+                fill = '#e8e8e8'
+                tip = f'input {i}, output {j}: no frames'
+            parts.append(f'<rect x="{left + cell*j}" y="{top + cell*i}" width="{cell}" height="{cell}" fill="{fill}" '
+                f'stroke="#ffffff"><title>{tip}</title></rect>')
+    return Markup(f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" class="chart">{"".join(parts)}</svg>')
+
+
+def heatmap_range(entries):
+    """Common latency scale of the heat maps of a group, so that architectures can be compared."""
+    means = []
+    for entry in entries:
+        count, mean = port_matrix(entry['input'], entry['output'], entry['latency'], entry['radix'] or 1)
+        means.append(mean[count > 0])
+    means = np.concatenate(means) if means else np.zeros(0)
+    return (float(means.min()), float(means.max())) if means.size else (0.0, 0.0)
+
+
+def bars_svg(entries, width:int = 640, height:int = 300):
+    """Accepted output load per port at the highest offered load of every entry as an inline SVG bar chart."""
+    margin = (60, 170, 12, 40)
+    left, right, top, bottom = margin
+    plot_w, plot_h = width-left-right, height-top-bottom
+
+    series = []
+    for entry in entries:
+        if not entry['aggregate']:
+            continue
+        highest = max(entry['aggregate'])
+        loads = [o for port, i, o in sorted(entry['ports'].get(highest, []))] + [entry['aggregate'][highest][1]]
+        series.append((entry['label'], loads))
+    if not series:
+        return Markup('')
+
+    slots = max(len(loads) for label, loads in series)
+    y_ticks = ticks(max(1.0, max(max(loads) for label, loads in series)))
+    slot_w = plot_w/slots
+    bar_w = slot_w*0.8/len(series)
+    names = [str(k) for k in range(slots-1)] + ['all']
+    x_text = [(left + slot_w*(k+0.5), name) for k, name in enumerate(names)]
+    parts = axes(width, height, margin, None, y_ticks, 'Output port', 'Accepted load', x_text)
+
+    for s, (label, loads) in enumerate(series):
+        for k, load in enumerate(loads):
+            x = left + slot_w*k + slot_w*0.1 + bar_w*s
+            h = plot_h*load/y_ticks[-1]
+            parts.append(f'<rect x="{x:.1f}" y="{top+plot_h-h:.1f}" width="{bar_w:.1f}" height="{h:.1f}" fill="{colour(label)}">'
+                f'<title>{html.escape(label)}, port {names[k]}: {load:.3f}</title></rect>')
+
+    parts += legend([label for label, loads in series], width-right+15, top+12)
+    return Markup(f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" class="chart">{"".join(parts)}</svg>')
+
+
+template = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>Switch architecture comparison</title>
+<style>
+body { font-family: sans-serif; margin: 2em; color: #222; }
+h2 { border-bottom: 1px solid #ccc; padding-bottom: 0.2em; }
+table { border-collapse: collapse; margin: 1em 0; }
+th, td { border: 1px solid #ccc; padding: 0.25em 0.6em; text-align: right; }
+th:first-child, td:first-child, td.source { text-align: left; }
+td.source { color: #777; font-size: 0.85em; }
+.swatch { display: inline-block; width: 0.8em; height: 0.8em; margin-right: 0.4em; }
+.chart text { font-size: 12px; fill: #222; }
+.chart text.small { font-size: 10px; }
+.chart text.title { font-weight: bold; }
+.chart .grid { stroke: #e4e4e4; }
+.chart .frame { fill: none; stroke: #999; }
+.heatmaps { display: flex; flex-wrap: wrap; gap: 1.5em; align-items: flex-start; }
+.note { color: #555; font-size: 0.9em; }
+</style>
+</head>
+<body>
+<h1>Switch architecture comparison</h1>
+<p class="note">Generated {{ created }}. Latencies are in the units of the latency results files, loads are fractions of the line rate.</p>
+
+{% if latency %}
+<h2>Latency</h2>
+{% for (profile, radix, data_width), group in latency %}
+<h3>{{ profile }}: radix {{ radix }}, {{ data_width }} bit data bus</h3>
+<table>
+<tr><th>Architecture</th><th>Frames</th><th>Mean</th><th>p50</th><th>p99</th><th>p99.9</th><th>Max</th><th>Source</th></tr>
+{% for row in group.rows %}
+<tr><td><span class="swatch" style="background: {{ colour(row.label) }}"></span>{{ row.label }}</td><td>{{ row.frames }}</td>
+{% if row.frames %}<td>{{ '%.2f' % row.mean }}</td><td>{{ '%.2f' % row.p50 }}</td><td>{{ '%.2f' % row.p99 }}</td><td>{{ '%.2f' % row['p99.9'] }}</td><td>{{ row.max }}</td>
+{% else %}<td></td><td></td><td></td><td></td><td></td>{% endif %}
+<td class="source">{{ row.source }}</td></tr>
+{% endfor %}
+</table>
+{{ group.cdf }}
+<p class="note">Mean latency per input (rows) and output (columns), from {{ '%.2f' % group.lower }} (light) to {{ '%.2f' % group.upper }} (dark).</p>
+<div class="heatmaps">
+{% for heatmap in group.heatmaps %}{{ heatmap }}
+{% endfor %}</div>
+{% endfor %}
+{% endif %}
+
+{% if throughput %}
+<h2>Throughput</h2>
+{% for (radix, data_width, length), group in throughput %}
+<h3>Radix {{ radix }}, {{ data_width }} bit data bus, {{ length }} byte frames</h3>
+<table>
+<tr><th>Architecture</th><th>Offered loads</th><th>Highest offered</th><th>Accepted</th><th>Output</th><th>Saturation point</th><th>Saturation throughput</th><th>Source</th></tr>
+{% for row in group.rows %}
+<tr><td><span class="swatch" style="background: {{ colour(row.label) }}"></span>{{ row.label }}</td><td>{{ row.loads }}</td>
+{% if row.loads %}<td>{{ '%.3f' % row.offered }}</td><td>{{ '%.3f' % row.accepted }}</td><td>{{ '%.3f' % row.output }}</td>
+<td>{{ '%.3f' % row.saturation_point if row.saturation_point is not none else 'none' }}</td><td>{{ '%.3f' % row.saturation_throughput }}</td>
+{% else %}<td></td><td></td><td></td><td></td><td></td>{% endif %}
+<td class="source">{{ row.source }}</td></tr>
+{% endfor %}
+</table>
+<p class="note">Accepted load per output port at the highest offered load of each architecture.</p>
+{{ group.bars }}
+{% endfor %}
+{% endif %}
+</body>
+</html>
+"""
+
+
+def latency_groups(entries):
+    """Table rows, CDF plot and heat maps of every (profile, radix, data width) group."""
+    groups = []
+    for key, members in group(entries, ('profile', 'radix', 'data_width')).items():
+        lower, upper = heatmap_range(members)
+        groups.append((key, {
+            'rows': [latency_row(entry) for entry in members],
+            'cdf': cdf_svg(members),
+            'lower': lower,
+            'upper': upper,
+            'heatmaps': [heatmap_svg(entry, lower, upper) for entry in members if entry['latency'].size],
+        }))
+    return groups
+
+
+def throughput_groups(entries, tolerance:float):
+    """Table rows and bar chart of every (radix, data width, frame length) group."""
+    groups = []
+    for key, members in group(entries, ('radix', 'data_width', 'length')).items():
+        groups.append((key, {
+            'rows': [throughput_row(entry, tolerance) for entry in members],
+            'bars': bars_svg(members),
+        }))
+    return groups
+
+
+def render(latency, throughput):
+    """Self-contained HTML report, without external scripts, styles or fonts."""
+    environment = Environment(autoescape=True, trim_blocks=True, lstrip_blocks=True)
+    return environment.from_string(template).render(latency=latency, throughput=throughput, colour=colour,
+        created=time.strftime('%Y-%m-%d %H:%M:%S'))
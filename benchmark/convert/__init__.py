@@ -0,0 +1 @@
+from .command import convert
\ No newline at end of file
@@ -0,0 +1,61 @@
+"""
+
+Copyright (c) 2023 Corundum organization
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+import click
+import os
+import time
+
+from pathlib import Path
+import profile_io
+
+@click.command()
+@click.option('-o', '--output', default=None, help='Converted traffic profile  [default: same name with the other extension]')
+@click.argument('profile')
+def convert(profile:str, output:str):
+    """
+    Traffic profile conversion.
+
+    Converts a CSV (.txt) traffic profile into the compact binary format
+    (.bin) or back. PROFILE is a path or the name of a file in
+    traffic/profiles. Binary profiles keep the metadata and header lines of the
+    CSV ones followed by the frames as packed records, which the latency
+    benchmark memory-maps instead of parsing.
+
+    """
+    file_path = profile if os.path.isfile(profile) else f'traffic/profiles/{profile}'
+    if not os.path.isfile(file_path):
+        raise click.BadParameter(f'{profile!r} is not a traffic profile.', param_hint='PROFILE')
+    if output is None:
+        output = str(Path(file_path).with_suffix('.txt' if profile_io.is_binary(file_path) else profile_io.binary_suffix))
+    if os.path.exists(output):
+        print(f'{output} already exists')
+        return
+
+    start = time.time()
+    try:
+        frames = profile_io.convert(file_path, output)
+    except (KeyError, ValueError) as e:
+        raise click.BadParameter(f'{file_path} is not a valid traffic profile: {e}', param_hint='PROFILE')
+    print(f'{frames} frames converted to {output} in {time.time()-start:.2f} s '
+        f'({os.path.getsize(file_path)} -> {os.path.getsize(output)} bytes)')
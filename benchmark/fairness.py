@@ -0,0 +1,173 @@
+"""
+
+Copyright (c) 2023 Corundum organization
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+import logging
+
+import numpy as np
+
+from cocotb.triggers import RisingEdge
+
+from occupancy import resolve
+
+# output arbiter of every architecture below the wrapper, bit k of its
+# s_axis_* vectors comes from input k
+arbiter_paths = {
+    'iq': 'switch_inst.switch_crossbar_inst.arbiters[{n}].axis_arb_mux_inst',
+    'iq_voq': 'switch_inst.switch_crossbar_inst.arbiters[{n}].axis_arb_mux_inst',
+    'oq': 'switch_inst.switch_crossbar_inst.arbiters[{n}].axis_arb_mux_inst',
+    'cicq': 'switch_inst.switch_crossbar_inst.input_ports[{n}].axis_arb_mux_output_inst',
+}
+
+
+def jain(values):
+    """Jain's fairness index, from 1/n (one takes everything) to 1 (equal shares)."""
+    x = np.asarray(values, dtype=float)
+    if x.size == 0 or not x.any():
+        return 1.0
+    return float(x.sum()**2/(x.size*(x*x).sum()))
+
+
+def port_shares(input:np.ndarray, output:np.ndarray, length:np.ndarray, radix:int):
+    """RADIX x RADIX matrices of frames and bytes sent to each output (rows) by each input (columns)."""
+    pair = output*radix + input
+    grants = np.bincount(pair, minlength=radix*radix).reshape(radix, radix)
+    sent = np.bincount(pair, weights=length, minlength=radix*radix).reshape(radix, radix)
+    return grants, sent
+
+
+def output_fairness(grants:np.ndarray, sent:np.ndarray, demand:np.ndarray = None):
+    """
+    Share of the grants and bytes of every output taken by each input, and
+    Jain's index of both over the inputs contending for that output: those
+    with some 'demand' (frames offered to it), by default those granted.
+
+    """
+    if demand is None:
+        demand = grants
+    result = []
+    for k in range(grants.shape[0]):
+        total_grants = grants[k].sum()
+        total_bytes = sent[k].sum()
+        contenders = demand[k] > 0
+        result.append({
+            'output': k,
+            'grant_share': [float(x) for x in (grants[k]/total_grants if total_grants else grants[k])],
+            'byte_share': [float(x) for x in (sent[k]/total_bytes if total_bytes else sent[k])],
+            'jain_grants': jain(grants[k][contenders]),
+            'jain_bytes': jain(sent[k][contenders]),
+        })
+    return result
+
+
+class ArbiterMonitor:
+    """
+    Grants and head-of-queue waits at the output arbiters.
+
+    Every cycle the request (tvalid) and grant (tready) vectors of each
+    output arbiter are read. A frame is at the head of its queue from the
+    first cycle it requests the output until its first word is transferred;
+    that wait is recorded per (output, input) pair and a frame waiting longer
+    than 'threshold' cycles is reported as starved. 'period' is the arbiter
+    clock period in switch clock cycles (the OQ crossbar runs faster), waits
+    are given in switch clock cycles.
+
+    Reading the arbiters every cycle slows the simulation down, so the
+    monitor is only started on request.
+
+    """
+
+    def __init__(self, dut, clock, architecture:str, radix:int, threshold:int = 1000, period:float = 1.0, log=None):
+        self.clock = clock
+        self.radix = radix
+        self.threshold = threshold
+        self.period = period
+        self.log = log or logging.getLogger("cocotb.tb")
+
+        self.arbiters = [resolve(dut, arbiter_paths[architecture].format(n=n)) for n in range(radix)]
+        shape = (radix, radix)
+        self.grants = np.zeros(shape, dtype=np.int64)
+        self.beats = np.zeros(shape, dtype=np.int64)
+        self.max_wait = np.zeros(shape, dtype=np.int64)
+        self.total_wait = np.zeros(shape, dtype=np.int64)
+        self.starved = np.zeros(shape, dtype=np.int64)
+
+    async def run(self):
+        radix = self.radix
+        # cycle a head-of-queue frame started waiting (None if none) and whether it is being transferred
+        head = [[None]*radix for _ in range(radix)]
+        busy = [[False]*radix for _ in range(radix)]
+        flagged = [[False]*radix for _ in range(radix)]
+        edge = RisingEdge(self.clock)
+        cycle = 0
+
+        while True:
+            await edge
+            cycle += 1
+            for n, arbiter in enumerate(self.arbiters):
+                valid = arbiter.s_axis_tvalid.value.integer
+                if not valid:
+                    continue
+                ready = arbiter.s_axis_tready.value.integer
+                last = arbiter.s_axis_tlast.value.integer
+                k = 0
+                while valid >> k:
+                    bit = 1 << k
+                    if valid & bit:
+                        if not busy[n][k]:
+                            if head[n][k] is None:
+                                head[n][k] = cycle
+                            wait = cycle - head[n][k]
+                            if ready & bit:
+                                # granted: the first word of the frame goes through
+                                busy[n][k] = True
+                                self.grants[n, k] += 1
+                                self.total_wait[n, k] += wait
+                                if wait > self.max_wait[n, k]:
+                                    self.max_wait[n, k] = wait
+                                flagged[n][k] = False
+                            elif wait*self.period > self.threshold and not flagged[n][k]:
+                                flagged[n][k] = True
+                                self.starved[n, k] += 1
+                                self.log.warning("Input %d starved at output %d: head-of-queue frame waiting for more than %d cycles",
+                                    k, n, self.threshold)
+                        if busy[n][k] and ready & bit:
+                            self.beats[n, k] += 1
+                            if last & bit:
+                                busy[n][k] = False
+                                head[n][k] = None
+                    k += 1
+
+    def stats(self):
+        """Per output: grant and beat shares, Jain's indexes and head-of-queue waits of every input."""
+        # inputs starved of an output contend for it even if they were never granted
+        result = output_fairness(self.grants, self.beats, self.grants + self.starved)
+        for n, output in enumerate(result):
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean_wait = np.where(self.grants[n] > 0, self.total_wait[n]/self.grants[n], 0.0)
+            output['beat_share'] = output.pop('byte_share')
+            output['jain_beats'] = output.pop('jain_bytes')
+            output['max_wait'] = [float(x*self.period) for x in self.max_wait[n]]
+            output['mean_wait'] = [float(x*self.period) for x in mean_wait]
+            output['starved'] = [int(x) for x in self.starved[n]]
+        return result
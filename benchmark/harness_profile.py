@@ -0,0 +1,111 @@
+"""
+
+Copyright (c) 2023 Corundum organization
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+import cProfile
+import pstats
+import time
+from pathlib import Path
+
+from cocotb.utils import get_sim_time
+
+
+def function_name(key):
+    """Readable name of a pstats function key (file, line, name)."""
+    file, line, name = key
+    # built-in functions have no file
+    return name if file == '~' else f'{Path(file).name}:{line}({name})'
+
+
+def is_gpi(key):
+    """Whether a function is a call into the simulator through the cocotb GPI."""
+    return key[0] == '~' and 'cocotb.simulator' in key[2]
+
+
+class HarnessProfiler:
+    """
+    Where the wall time of a benchmark goes.
+
+    The run is split in phases, each with its wall time and the simulated
+    cycles it covers, and the Python code of the bench (and of cocotb and
+    cocotbext-axi) is profiled with cProfile at the same time. Time spent in
+    the functions reading and writing signals through the cocotb GPI is told
+    apart from the rest of the Python code, and the wall time left is spent
+    in the simulator itself. Python times include the overhead of cProfile,
+    so runs are slower while profiling.
+
+    """
+
+    def __init__(self):
+        self.phases = []
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+        self.current = None
+        self.phase('setup')
+
+    def phase(self, name:str):
+        """End the current phase and start phase 'name'."""
+        now = time.perf_counter(), get_sim_time('ns')
+        if self.current is not None:
+            current, wall_start, sim_start = self.current
+            self.phases.append({'phase': current, 'wall_time': now[0] - wall_start, 'sim_cycles': int(now[1] - sim_start)})
+        self.current = (name, *now)
+
+    def stop(self):
+        self.phase(None)
+        self.profile.disable()
+        self.current = None
+
+    def stats(self, frames:int, top:int = 20):
+        """
+        Wall time and simulated cycles per phase, frames and cycles per
+        second, the split of the wall time between Python, GPI and simulator
+        and the 'top' functions by own time.
+
+        """
+        for phase in self.phases:
+            phase['cycles_per_second'] = phase['sim_cycles']/phase['wall_time'] if phase['wall_time'] else 0.0
+
+        stats = pstats.Stats(self.profile).stats
+        gpi_time = sum(value[2] for key, value in stats.items() if is_gpi(key))
+        python_time = sum(value[2] for value in stats.values()) - gpi_time
+        wall_time = sum(phase['wall_time'] for phase in self.phases)
+        sim_cycles = sum(phase['sim_cycles'] for phase in self.phases)
+        hot = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:top]
+
+        return {
+            'wall_time': wall_time,
+            'sim_cycles': sim_cycles,
+            'cycles_per_second': sim_cycles/wall_time if wall_time else 0.0,
+            'frames_per_second': frames/wall_time if wall_time else 0.0,
+            'python_time': python_time,
+            'gpi_time': gpi_time,
+            'simulator_time': max(wall_time - python_time - gpi_time, 0.0),
+            'phases': self.phases,
+            'hot_functions': [{'function': function_name(key), 'calls': value[1], 'own_time': value[2],
+                'cumulative_time': value[3]} for key, value in hot],
+        }
+
+    def write(self, path:str):
+        """cProfile statistics, e.g. for 'python -m pstats' or snakeviz."""
+        self.profile.dump_stats(path)
@@ -23,23 +23,86 @@ THE SOFTWARE.
 """
 
 import click
+import json
 import os
 import random
 from pathlib import Path
 from subprocess import call
 from types_arg import SwitchSuffix
 
+import profile_io
+import results_db
+import simcache
+
+simulators = ['icarus', 'verilator']
+
 @click.command()
 @click.option('-r', default=4, show_default=True, help='Radix of the switch')
 @click.option('-d', default=8, show_default=True, help='Width of the data bus in bits')
 @click.option('-f', default="newest", show_default=True, help='File name for benchmarking')
+@click.option('-v', '--verbose', is_flag=True, help='Log every frame entering the switch')
+@click.option('--cache/--no-cache', default=True, show_default=True, help='Reuse compiled simulations with the same sources and parameters')
+@click.option('--cache-size', default=4096, show_default=True, help='Size limit of the compiled simulation cache in MB')
+@click.option('--sim', default='icarus', show_default=True, type=click.Choice(simulators), help='Simulator')
+@click.option('--threads', default=1, show_default=True, help='Number of threads of the Verilator model')
+@click.option('--waves', is_flag=True, help='Dump the waveforms of the simulation')
+@click.option('--compare', is_flag=True, help='Also run with icarus and check that the results are identical')
+@click.option('--window', default=0, show_default=True, type=click.IntRange(0), help='Stream the profile with at most this many frames in flight (0 loads the whole profile)')
+@click.option('--warmup', default=0, show_default=True, type=click.IntRange(0), help='Frames entering the switch first (over all inputs) left out of the results')
+@click.option('--warmup-cycles', default=0, show_default=True, type=click.IntRange(0), help='Cycles at the start of the run whose frames are left out of the results')
+@click.option('--drain', default=0, show_default=True, type=click.IntRange(0), help='Frames entering the switch last (over all inputs) left out of the results')
+@click.option('--converge', default=0.0, show_default=True, type=click.FloatRange(0, 1), help='Stop once the mean latency is known within this relative precision (0 runs the whole profile)')
+@click.option('--batch-size', default=1000, show_default=True, type=click.IntRange(1), help='Initial number of frames per batch of the convergence estimate')
+@click.option('--occupancy', default=0, show_default=True, type=click.IntRange(0), help='Sample the occupancy of every queue each this many cycles (0 does not sample)')
+@click.option('--arbiters', is_flag=True, help='Monitor the grants and head-of-queue waits of the output arbiters every cycle')
+@click.option('--starvation', default=1000, show_default=True, type=click.IntRange(1), help='Head-of-queue wait in cycles above which an input counts as starved')
+@click.option('--links', default=0, show_default=True, type=click.IntRange(0), help='Monitor every port and sample its utilization each this many cycles (0 does not monitor)')
+@click.option('--profile', is_flag=True, help='Profile the bench: wall time and simulated cycles per phase and Python hot spots')
 @click.argument('architecture', type=SwitchSuffix())
-def latency(architecture:str, r:int, d: int, f:str):
+def latency(architecture:str, r:int, d: int, f:str, verbose:bool, cache:bool, cache_size:int, sim:str, threads:int, waves:bool, compare:bool, window:int,
+        warmup:int, warmup_cycles:int, drain:int, converge:float, batch_size:int, occupancy:int,
+        arbiters:bool, starvation:int, links:int, profile:bool):
     """
     Latency benchmarking.
 
     The suffix of the architecture to be tested must be specified: 'iq' for
     Inputed Queued switch and 'iq_voq' for Input Queued with Virtual Output Queues switch.
+
+    With a 'window', frames are read from the profile as they are needed and
+    retired as they are received, with at most 'window' frames in flight, so
+    memory stays constant however long the profile is.
+
+    Only the steady state is measured when a warm-up (in frames or cycles)
+    and a drain (in frames) are given: the first and last frames to enter the
+    switch, over all inputs, and those arriving in the first cycles (entering
+    the switch, for frames without arrival times) are simulated to fill and
+    empty the queues, but left out of the results. With 'converge', latencies
+    are grouped in batches and the run stops sending frames as soon as the
+    95% confidence interval of the mean latency (batch means method) is within
+    the given relative precision, e.g. 0.02 for +/-2%.
+
+    With 'occupancy', the FIFO pointers of every queue are sampled during the
+    run: the time series is written next to the results and the peak and
+    percentile occupancies give the smallest FIFO_DEPTH_CYCLES that would
+    have avoided backpressure with this traffic profile.
+
+    With 'arbiters', the output arbiters are monitored every cycle: the share
+    of the grants each input gets, Jain's fairness index over the inputs
+    contending for every output and the longest head-of-queue wait are
+    reported, and inputs waiting more than 'starvation' cycles are flagged.
+
+    With 'links', every ingress and egress port is monitored: valid, ready
+    and stall cycles, frames and payload bytes are counted, giving the link
+    utilization and the bus efficiency (payload against the bytes of the
+    beats transferred), and a utilization time series is written next to
+    the results.
+
+    With 'profile', the bench profiles itself to tell whether a slow run is
+    spent in the simulator, in the cocotb GPI or in Python: the wall time and
+    simulated cycles of every phase (setup, load, send, receive and
+    post-process), frames and cycles per second and the Python functions
+    taking most time are reported, and the cProfile statistics are written
+    next to the results.
     
     The provision of the rest of parameters is encouraged.
 
@@ -48,34 +111,205 @@ def latency(architecture:str, r:int, d: int, f:str):
     # Prepare environment variables
     # checks:
     # if 'f' is  not a valid file name take the newest file as default
-    dir_file = "traffic/profiles"
-
     try:
-        files = os.listdir(dir_file)
-        if f not in files:
-            paths = [os.path.join(dir_file, basename) for basename in files]
-            file_path = max(paths, key=os.path.getctime)
-        else:
-            file_path = f'{dir_file}/{f}'
-
-        with open(file_path) as file:
-            metadata = file.readline().strip('\n')
-            metadata_list = metadata.split(",")    
-            file.close()
+        file_path = find_profile(f)
+        profile_r = profile_radix(file_path)
 
         # if radix of the traffic profile does not match the radix of the experiment
-        if(int(metadata_list[3]) == r):
-            os.environ['BENCH_FILE'] = file_path
-            os.environ['ARCHITECTURE'] = architecture
-            os.environ['DATA_WIDTH'] = str(d)
+        if(profile_r == r):
             print(f'Selected traffic profile: {file_path}')
             print('Starting latency benchmark.')
-            call(f'make clean SUFFIX={architecture} DATA_WIDTH={d} RADIX={r}', shell=True)
-            call(f'make WAVES=1 SUFFIX={architecture} DATA_WIDTH={d} RADIX={r} MODULE={"bench_switch_latency"}', shell=True)
-            # call(f'make WAVES=1 SUFFIX={architecture} DATA_WIDTH={d} RADIX={r} MODULE={"bench_switch_latency"}', shell=True)
+            results_dir = sim_results_dir(sim)
+            run_latency(architecture, r, d, file_path, results_dir=results_dir, waves=waves, verbose=verbose,
+                cache=cache, cache_size=cache_size, sim=sim, threads=threads, window=window, warmup=warmup,
+                warmup_cycles=warmup_cycles, drain=drain, converge=converge, batch_size=batch_size, occupancy=occupancy,
+                arbiters=arbiters, starvation=starvation, links=links, profile=profile)
             print('Finished latency benchmark.')
+
+            speed = read_speed(results_file(architecture, d, file_path, results_dir))
+            if speed:
+                print(f'{sim}: {speed["sim_cycles"]} cycles simulated in {speed["wall_time"]:.1f} s ({speed["cycles_per_second"]:.0f} cycles/s)')
+                if 'occupancy' in speed:
+                    print_occupancy(speed['occupancy'], results_file(architecture, d, file_path, results_dir))
+                if 'fairness' in speed:
+                    print_fairness(speed['fairness'])
+                if 'links' in speed:
+                    print_links(speed['links'], results_file(architecture, d, file_path, results_dir))
+                if 'profile' in speed:
+                    print_profile(speed['profile'], results_file(architecture, d, file_path, results_dir))
+
+            if compare and sim != 'icarus':
+                print('Starting reference latency benchmark with icarus.')
+                run_latency(architecture, r, d, file_path, verbose=verbose, cache=cache, cache_size=cache_size, window=window,
+                    warmup=warmup, warmup_cycles=warmup_cycles, drain=drain, converge=converge, batch_size=batch_size)
+                compare_results(results_file(architecture, d, file_path), results_file(architecture, d, file_path, results_dir), sim)
         else:
-            print(f'Radix {r} does not match radix {metadata_list[3]} in {file_path} traffic profile')
+            print(f'Radix {r} does not match radix {profile_r} in {file_path} traffic profile')
     
     except FileNotFoundError:
-        print("There is no traffic pattern file available.")
\ No newline at end of file
+        print("There is no traffic pattern file available.")
+
+def find_profile(f:str, dir_file:str = "traffic/profiles"):
+    """Path of traffic profile 'f', or of the newest traffic profile if there is no such file."""
+    files = os.listdir(dir_file)
+    if f not in files:
+        paths = [os.path.join(dir_file, basename) for basename in files]
+        return max(paths, key=os.path.getctime)
+    return f'{dir_file}/{f}'
+
+def profile_radix(file_path:str):
+    """Radix stored in the metadata of a traffic profile."""
+    metadata_list, columns, offset = profile_io.read_header(file_path)
+    return int(metadata_list[3])
+
+def results_file(architecture:str, d:int, file_path:str, results_dir:str = 'latency/results'):
+    """Path of the results of a latency benchmark, as written by bench_switch_latency."""
+    return f'{results_dir}/{architecture}-{d}-{profile_io.results_name(file_path)}'
+
+def sim_results_dir(sim:str, results_dir:str = 'latency/results'):
+    """Results of simulators other than icarus are kept apart, so they can be compared."""
+    return results_dir if sim == 'icarus' else f'{results_dir}/{sim}'
+
+def read_speed(output_file:str):
+    """Simulation speed stored next to the results of a latency benchmark."""
+    try:
+        with open(f'{output_file}.json') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+def print_occupancy(occupancy:dict, output_file:str, top:int = 8):
+    """Fullest queues of a latency benchmark and the FIFO depth that would have avoided backpressure."""
+    queues = sorted(occupancy['queues'], key=lambda queue: queue['max'], reverse=True)
+    print(f'Queue occupancy in words, sampled every {occupancy["interval"]} cycles ({len(queues)} queues, series in {output_file}.occupancy.csv):')
+    print(f'{"Queue":72} {"Capacity":>8} {"Max":>6} {"Mean":>8} {"p50":>8} {"p99":>8} {"p99.9":>8} {"Full":>6}')
+    for queue in queues[:top]:
+        print(f'{queue["queue"]:72} {queue["capacity"]:8} {queue["max"]:6} {queue["mean"]:8.2f} {queue["p50"]:8.1f} '
+            f'{queue["p99"]:8.1f} {queue["p99.9"]:8.1f} {queue["full"]:6}')
+    if occupancy['saturated']:
+        print(f'Some queues were full: FIFO_DEPTH_CYCLES has to be above {occupancy["fifo_depth_cycles"]-1} '
+            f'to avoid backpressure, run again with deeper FIFOs to find the actual peak.')
+    else:
+        print(f'Recommended FIFO_DEPTH_CYCLES: {occupancy["fifo_depth_cycles"]} (smallest that would have avoided backpressure)')
+
+def print_fairness(fairness:dict):
+    """Grant shares, Jain's index and head-of-queue waits at every output arbiter of a latency benchmark."""
+    radix = len(fairness['outputs'])
+    print(f'Output arbiters (share of the grants per input, Jain\'s index over contending inputs, waits in cycles):')
+    print(f'{"Output":>7} ' + ' '.join(f'{"in"+str(k):>6}' for k in range(radix)) + f' {"Jain":>6} {"Max wait":>9} {"Mean wait":>10} {"Starved":>8}')
+    for output in fairness['outputs']:
+        shares = ' '.join(f'{x:6.3f}' for x in output['grant_share'])
+        print(f'{output["output"]:7} {shares} {output["jain_grants"]:6.3f} {max(output["max_wait"]):9.1f} '
+            f'{max(output["mean_wait"]):10.1f} {sum(output["starved"]):8}')
+    starved = sum(sum(output['starved']) for output in fairness['outputs'])
+    if starved:
+        print(f'{starved} head-of-queue frames waited more than {fairness["threshold"]} cycles')
+
+def print_links(links:dict, output_file:str):
+    """Utilization, bus efficiency and stalls of every port of a latency benchmark."""
+    print(f'Port utilization (series every {links["interval"]} cycles in {output_file}.links.csv):')
+    print(f'{"Port":9} {"Frames":>8} {"Bytes":>10} {"Utilization":>11} {"Efficiency":>10} {"Goodput":>8} {"Stalls":>8}')
+    for port in links['ports']:
+        print(f'{port["port"]:9} {port["frames"]:8} {port["bytes"]:10} {port["utilization"]:11.3f} {port["efficiency"]:10.3f} '
+            f'{port["goodput"]:8.3f} {port["stall_ratio"]:8.3f}')
+    print(f'Egress: utilization {links["egress_utilization"]:.3f}, bus efficiency {links["egress_efficiency"]:.3f}, '
+        f'payload {links["egress_goodput"]:.3f} of the bus capacity')
+
+def print_profile(profile:dict, output_file:str, top:int = 10):
+    """Phases, split of the wall time and Python hot spots of a profiled latency benchmark."""
+    print(f'{profile["frames_per_second"]:.0f} frames/s, {profile["cycles_per_second"]:.0f} cycles/s; wall time '
+        f'{profile["wall_time"]:.1f} s: Python {profile["python_time"]:.1f} s, GPI {profile["gpi_time"]:.1f} s, '
+        f'simulator {profile["simulator_time"]:.1f} s')
+    print(f'{"Phase":14} {"Wall time":>10} {"Cycles":>10} {"Cycles/s":>10}')
+    for phase in profile['phases']:
+        print(f'{phase["phase"]:14} {phase["wall_time"]:10.2f} {phase["sim_cycles"]:10} {phase["cycles_per_second"]:10.0f}')
+    print(f'Python hot spots (cProfile statistics in {output_file}.prof):')
+    print(f'{"Own time":>9} {"Cumulative":>10} {"Calls":>10}  Function')
+    for function in profile['hot_functions'][:top]:
+        print(f'{function["own_time"]:9.2f} {function["cumulative_time"]:10.2f} {function["calls"]:10}  {function["function"]}')
+
+def read_results(output_file:str):
+    """Rows of a latency results file indexed by tid."""
+    with open(output_file) as file:
+        file.readline()
+        file.readline()
+        return {row[5]: row for row in (line.strip('\n').split(",") for line in file if line.strip())}
+
+def compare_results(reference_file:str, output_file:str, sim:str):
+    """Check that two latency benchmarks produced the same frame timings and report their relative speed."""
+    reference = read_results(reference_file)
+    results = read_results(output_file)
+
+    differences = [tid for tid in reference.keys() | results.keys() if reference.get(tid) != results.get(tid)]
+    if differences:
+        print(f'{sim} and icarus results differ for {len(differences)} of {len(reference)} frames, e.g. frame {sorted(differences)[0]}')
+    else:
+        print(f'{sim} and icarus results are identical ({len(reference)} frames)')
+
+    reference_speed = read_speed(reference_file)
+    speed = read_speed(output_file)
+    if reference_speed and speed:
+        print(f'{sim} speedup over icarus: {speed["cycles_per_second"]/reference_speed["cycles_per_second"]:.2f}x '
+            f'({speed["cycles_per_second"]:.0f} vs {reference_speed["cycles_per_second"]:.0f} cycles/s)')
+
+def run_latency(architecture:str, r:int, d:int, file_path:str, sim_build:str = 'sim_build',
+        results_dir:str = 'latency/results', waves:bool = False, clean:bool = True, verbose:bool = False, log=None,
+        cache:bool = False, cache_size:int = 4096, sim:str = 'icarus', threads:int = 1, window:int = 0,
+        warmup:int = 0, warmup_cycles:int = 0, drain:int = 0, converge:float = 0.0, batch_size:int = 1000, occupancy:int = 0,
+        arbiters:bool = False, starvation:int = 1000, links:int = 0, profile:bool = False):
+    """
+    Run bench_switch_latency for one configuration.
+
+    Every configuration can use its own simulation build and results directories,
+    so that several of them can run at the same time from the benchmark folder.
+    With 'cache', the compiled simulation is taken from (or added to) the
+    content-addressed cache instead, and 'sim_build' and 'clean' are ignored.
+    The output of make goes to 'log' if given, and the waveforms are dumped
+    only with 'waves'. A non-zero 'window' streams the traffic profile with
+    that many frames in flight at most. 'warmup',
+    'warmup_cycles', 'drain' and 'converge' set the measurement window and a
+    non-zero 'occupancy' samples the queues every that many cycles. 'arbiters'
+    monitors the output arbiters, flagging waits above 'starvation' cycles,
+    and a non-zero 'links' monitors every port, sampling every that many cycles.
+    With 'profile', the bench profiles itself.
+
+    """
+    env = dict(os.environ)
+    env['BENCH_FILE'] = file_path
+    env['ARCHITECTURE'] = architecture
+    env['DATA_WIDTH'] = str(d)
+    env['BENCH_VERBOSE'] = str(int(verbose))
+    env['RESULTS_DIR'] = results_dir
+    env['SIM'] = sim
+    env['BENCH_WINDOW'] = str(window)
+    env['BENCH_WARMUP'] = str(warmup)
+    env['BENCH_WARMUP_CYCLES'] = str(warmup_cycles)
+    env['BENCH_DRAIN'] = str(drain)
+    env['BENCH_PRECISION'] = str(converge)
+    env['BENCH_BATCH_SIZE'] = str(batch_size)
+    env['BENCH_OCCUPANCY'] = str(occupancy)
+    env['BENCH_ARBITERS'] = str(int(arbiters))
+    env['BENCH_STARVATION'] = str(starvation)
+    env['BENCH_LINKS'] = str(links)
+    env['BENCH_PROFILE'] = str(int(profile))
+    env['RESULTS_DB'] = os.path.abspath(results_db.db_file)
+
+    config_args = f'SIM={sim} THREADS={threads} WAVES={int(waves)} SUFFIX={architecture} DATA_WIDTH={d} RADIX={r}'
+
+    if not cache:
+        if clean:
+            call(f'make clean {config_args} SIM_BUILD={sim_build}', shell=True, env=env, stdout=log, stderr=log)
+        return run_make(config_args, sim_build, results_dir, env, log)
+
+    sim_build = simcache.entry(simcache.key(config_args, env, r))
+    build = lambda: call(f'make build {config_args} SIM_BUILD={sim_build}', shell=True, env=env, stdout=log, stderr=log)
+    # the entry is held until the simulation ends, so concurrent runs cannot evict it
+    with simcache.checkout(sim_build, sim, build, log):
+        simcache.evict(cache_size*1024*1024, keep=sim_build)
+        return run_make(config_args, sim_build, results_dir, env, log)
+
+def run_make(config_args:str, sim_build:str, results_dir:str, env:dict, log=None):
+    """Run bench_switch_latency from the simulation build 'sim_build'."""
+    Path(results_dir).mkdir(parents=True, exist_ok=True)
+    make_args = f'{config_args} SIM_BUILD={sim_build} COCOTB_RESULTS_FILE={results_dir}/results.xml'
+    return call(f'make {make_args} MODULE={"bench_switch_latency"}', shell=True, env=env, stdout=log, stderr=log)
@@ -0,0 +1,180 @@
+"""
+
+Copyright (c) 2023 Corundum organization
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+import logging
+from array import array
+
+import cocotb
+from cocotb.triggers import RisingEdge
+from cocotbext.axi import AxiStreamBus, AxiStreamMonitor
+
+
+class LinkMonitor:
+    """
+    Utilization of an AXI stream port.
+
+    A passive AxiStreamMonitor collects the frames crossing the port while
+    tvalid and tready are sampled every cycle: cycles with a word offered
+    (valid), accepted (ready) and transferred (beats) are counted, and a
+    valid word that is not accepted is a stall. The payload of the frames
+    (bytes with tkeep set) against the bytes the beats could carry is the
+    bus efficiency, low with small frames on a wide bus. Beats and payload
+    are also accumulated every 'interval' cycles as a time series.
+
+    """
+
+    def __init__(self, dut, prefix:str, clock, reset=None, interval:int = 1000):
+        self.name = prefix
+        self.interval = interval
+        self.bus = AxiStreamBus.from_prefix(dut, prefix)
+        self.clock = clock
+        self.monitor = AxiStreamMonitor(self.bus, clock, reset)
+        self.byte_lanes = self.monitor.byte_lanes
+
+        self.cycles = 0
+        self.valid = 0
+        self.ready = 0
+        self.beats = 0
+        self.stalls = 0
+        self.frames = 0
+        self.payload = 0
+        # beats and payload bytes of every interval
+        self.beat_series = array('I')
+        self.payload_series = array('Q')
+
+    async def run(self):
+        tvalid = self.bus.tvalid
+        tready = self.bus.tready
+        monitor = self.monitor
+        edge = RisingEdge(self.clock)
+        beats = 0
+        payload = 0
+        count = 0
+
+        while True:
+            await edge
+            self.cycles += 1
+            valid = tvalid.value.integer
+            ready = tready.value.integer
+            self.valid += valid
+            self.ready += ready
+            if valid:
+                if ready:
+                    self.beats += 1
+                    beats += 1
+                else:
+                    self.stalls += 1
+            # frames are compacted on reception, only the bytes with tkeep set are left
+            while not monitor.empty():
+                length = len(monitor.recv_nowait().tdata)
+                self.frames += 1
+                self.payload += length
+                payload += length
+
+            count += 1
+            if count == self.interval:
+                self.beat_series.append(beats)
+                self.payload_series.append(payload)
+                beats = payload = count = 0
+
+    def stats(self):
+        """Counters of the port, its utilization, bus efficiency and stall ratio."""
+        capacity = self.cycles*self.byte_lanes
+        return {
+            'port': self.name,
+            'cycles': self.cycles,
+            'valid': self.valid,
+            'ready': self.ready,
+            'beats': self.beats,
+            'stalls': self.stalls,
+            'frames': self.frames,
+            'bytes': self.payload,
+            # fraction of the cycles a word was transferred
+            'utilization': self.beats/self.cycles if self.cycles else 0.0,
+            # payload against the bytes the transferred beats could carry
+            'efficiency': self.payload/(self.beats*self.byte_lanes) if self.beats else 0.0,
+            # payload against the capacity of the bus
+            'goodput': self.payload/capacity if capacity else 0.0,
+            'stall_ratio': self.stalls/self.valid if self.valid else 0.0,
+        }
+
+
+class LinkMonitors:
+    """
+    LinkMonitor on every s*_axis (ingress) and m*_axis (egress) port of the
+    wrapper. Sampling every port every cycle slows the simulation down, the
+    monitors are only started on request.
+
+    """
+
+    def __init__(self, dut, clock, radix:int, reset=None, interval:int = 1000, log=None):
+        self.interval = interval
+        self.log = log or logging.getLogger("cocotb.tb")
+        self.links = [LinkMonitor(dut, f"{direction}{k:02d}_axis", clock, reset, interval)
+            for direction in ['s', 'm'] for k in range(radix)]
+        self.tasks = []
+
+    def start(self):
+        self.tasks = [cocotb.start_soon(link.run()) for link in self.links]
+
+    def stop(self):
+        for task in self.tasks:
+            task.kill()
+
+    def stats(self):
+        return [link.stats() for link in self.links]
+
+    def summary(self):
+        """Mean utilization, efficiency and goodput of the ingress and egress ports."""
+        result = {}
+        for direction, name in [('s', 'ingress'), ('m', 'egress')]:
+            stats = [link.stats() for link in self.links if link.name.startswith(direction)]
+            for key in ['utilization', 'efficiency', 'goodput', 'stall_ratio']:
+                result[f'{name}_{key}'] = sum(x[key] for x in stats)/len(stats)
+        return result
+
+    def metrics(self):
+        """(name, port, value) metrics of every port, as stored in the results database."""
+        result = []
+        for link in self.links:
+            direction = 'ingress' if link.name.startswith('s') else 'egress'
+            stats = link.stats()
+            result += [(f'{direction}_{key}', int(link.name[1:3]), stats[key])
+                for key in ['utilization', 'efficiency', 'goodput', 'stall_ratio']]
+        return result
+
+    def write(self, path:str):
+        """
+        Time series as CSV, times in cycles since the monitors started: the
+        utilization of every port and, in the .payload columns, its payload
+        against the capacity of the bus.
+
+        """
+        with open(path, 'w') as f:
+            f.write('Time,' + ','.join(link.name for link in self.links) + ','
+                + ','.join(f'{link.name}.payload' for link in self.links) + '\n')
+            for k in range(min(len(link.beat_series) for link in self.links)):
+                utilization = [f'{link.beat_series[k]/self.interval:.4f}' for link in self.links]
+                payload = [f'{link.payload_series[k]/(self.interval*link.byte_lanes):.4f}' for link in self.links]
+                f.write(f'{(k+1)*self.interval},{",".join(utilization + payload)}\n')
@@ -0,0 +1 @@
+from .command import loadcurve
\ No newline at end of file
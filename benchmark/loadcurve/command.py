@@ -0,0 +1,178 @@
+"""
+
+Copyright (c) 2023 Corundum organization
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+import click
+import os
+from pathlib import Path
+from types_arg import SwitchSuffix, TrafficType, ArrivalProcess, TrafficPattern
+
+import numpy as np
+
+from latency.command import results_file, run_latency
+from stats.analysis import load_results, summary, units_per_cycle
+from traffic import traffic
+
+metrics = ['mean', 'p99']
+
+@click.command()
+@click.option('-r', default=4, show_default=True, help='Radix of the switch')
+@click.option('-d', default=64, show_default=True, help='Width of the data bus in bits')
+@click.option('-t', '--test', default='custom', show_default=True, type=TrafficType(), help="Frame sizes of the traffic, as in the traffic command (all but 'pcap')")
+@click.option('-n', default=1000, show_default=True, help='Number of frames to send per port at every load')
+@click.option('-l', default=64, show_default=True, help='Lower (exact) size limit of the payload in bytes')
+@click.option('-u', default=1514, show_default=True, help='Upper size limit of the payload in bytes')
+@click.option('-p', '--pattern', default='uniform', show_default=True, type=TrafficPattern(), help='Destination pattern, as in the traffic command')
+@click.option('--arrival', default='bernoulli', show_default=True, type=ArrivalProcess(), help="Arrival process of the frames (all but 'none')")
+@click.option('--seed', default=None, type=int, help='Seed of the traffic profiles  [default: random]')
+@click.option('--min-load', default=0.1, show_default=True, type=click.FloatRange(0, 1, min_open=True), help='Lowest offered load, its latency is the zero-load reference')
+@click.option('--max-load', default=1.0, show_default=True, type=click.FloatRange(0, 1, min_open=True), help='Highest offered load')
+@click.option('--points', default=3, show_default=True, type=click.IntRange(0), help='Evenly spaced loads simulated between the lowest and highest load before bisecting')
+@click.option('--resolution', default=0.02, show_default=True, type=click.FloatRange(0.001, 1), help='Width of the load interval the knee is narrowed down to')
+@click.option('--metric', default='mean', show_default=True, type=click.Choice(metrics), help='Latency that diverges at the knee')
+@click.option('--factor', default=10.0, show_default=True, type=click.FloatRange(1, min_open=True), help='Latency (times the zero-load latency) above which it has diverged')
+@click.option('--tolerance', default=0.02, show_default=True, help='Offered minus accepted load above which the switch has saturated')
+@click.option('--warmup', default=0, show_default=True, type=click.IntRange(0), help='Frames at the start of every run left out of the results')
+@click.option('--drain', default=0, show_default=True, type=click.IntRange(0), help='Frames at the end of every run left out of the results')
+@click.argument('architecture', type=SwitchSuffix())
+@click.pass_context
+def loadcurve(ctx:click.Context, architecture:str, r:int, d:int, test:str, n:int, l:int, u:int, pattern:str, arrival:str, seed:int,
+        min_load:float, max_load:float, points:int, resolution:float, metric:str, factor:float, tolerance:float, warmup:int, drain:int):
+    """
+    Latency against offered load and saturation knee search.
+
+    Traffic profiles of 'n' frames per port are generated at every offered
+    load simulated, all with the same sizes, pattern, arrival process and
+    seed. After the lowest and highest load and a few evenly spaced 'points'
+    between them, the knee (the load at which the 'metric' latency grows
+    above 'factor' times its zero-load value, or the switch no longer keeps
+    up with the offered load) is bisected down to the 'resolution', so most
+    simulations sample the curve around the knee and few are needed in all.
+
+    Latency is measured from the arrival time of each frame, as with
+    'stats --sojourn'. The curve (offered and accepted load, mean and p99
+    latency) is printed
+    and written to loadcurve/results together with the knee and the
+    saturation throughput, the highest accepted load measured. Every run is
+    kept in the results database as well.
+
+    """
+    if test == 'pcap' or arrival == 'none':
+        raise click.BadParameter('the offered load needs generated traffic with an arrival process', param_hint='--test/--arrival')
+    if min_load >= max_load:
+        raise click.BadParameter(f'the lowest load {min_load:g} is not below the highest one {max_load:g}', param_hint='--min-load')
+
+    dir_file = 'loadcurve/results'
+    Path(dir_file).mkdir(parents=True, exist_ok=True)
+    log_file = f'{dir_file}/sim.log'
+    # the same seed at every load, so that only the load changes between runs
+    seed = seed if seed is not None else int.from_bytes(os.urandom(4), 'little')
+
+    curve = {}
+
+    def measure(load:float):
+        load = round(load, 3)
+        if load not in curve:
+            profile = ctx.invoke(traffic, test=test, r=r, n=n, l=l, u=u, load=load, arrival=arrival, pattern=pattern, seed=seed)
+            print(f'Offered load {load:g}: simulating {profile}')
+            with open(log_file, 'a') as log:
+                status = run_latency(architecture, r, d, profile, results_dir=dir_file, waves=False, log=log, cache=True,
+                    warmup=warmup, drain=drain)
+            point = measure_point(results_file(architecture, d, profile, dir_file), d) if status == 0 else None
+            if point is None:
+                raise click.ClickException(f'The latency benchmark at offered load {load:g} failed, see {log_file}.')
+            curve[load] = point
+        return curve[load]
+
+    def diverged(load:float):
+        point = measure(load)
+        return point[metric] > factor*reference or load - point['accepted'] > tolerance
+
+    reference = measure(min_load)[metric]
+    lo, hi = min_load, max_load
+    if not diverged(max_load):
+        lo = hi = None
+    else:
+        # coarse points bracket the knee, bisection narrows it down
+        for k in range(1, points+1):
+            load = min_load + (max_load - min_load)*k/(points+1)
+            if load > lo and load < hi:
+                if diverged(load):
+                    hi = load
+                else:
+                    lo = load
+        while hi - lo > resolution:
+            load = (lo + hi)/2
+            if diverged(load):
+                hi = load
+            else:
+                lo = load
+
+    output_file = f'{dir_file}/{architecture}-{d}-{r}x{r}-{test}-{pattern}-{arrival}.csv'
+    saturation_throughput = max(point['accepted'] for point in curve.values())
+    with open(output_file, 'w') as f:
+        f.write(f'Architecture,{architecture},Radix,{r},DataWidth,{d},Test,{test},Pattern,{pattern},Arrival,{arrival},Seed,{seed},'
+            f'Metric,{metric},Factor,{factor:g},Knee,{"" if hi is None else round(hi, 3)},SaturationThroughput,{saturation_throughput:.6f}\n')
+        f.write('OfferedLoad,AcceptedLoad,Frames,MeanLatency,P99Latency,Diverged\n')
+        for load in sorted(curve):
+            point = curve[load]
+            f.write(f'{load},{point["accepted"]:.6f},{point["frames"]},{point["mean"]:.3f},{point["p99"]:.3f},{int(diverged(load))}\n')
+
+    print(f'Architecture {architecture}, radix {r}, {d} bit data bus, {test} frames, {pattern} pattern, {arrival} arrivals')
+    print(f'{"Offered":>8} {"Accepted":>9} {"Frames":>8} {"Mean":>10} {"p99":>10}')
+    for load in sorted(curve):
+        point = curve[load]
+        mark = '  diverged' if diverged(load) else ''
+        print(f'{load:8.3f} {point["accepted"]:9.3f} {point["frames"]:8} {point["mean"]:10.2f} {point["p99"]:10.2f}{mark}')
+    if hi is None:
+        print(f'No knee up to offered load {max_load:g}: {metric} latency within {factor:g} times {reference:.2f}')
+    else:
+        print(f'Knee between offered load {round(lo, 3):g} and {round(hi, 3):g} ({len(curve)} simulations), '
+            f'saturation throughput {saturation_throughput:.3f} of the line rate')
+    print(f'Curve written to {output_file}')
+
+def measure_point(output_file:str, data_width:int):
+    """
+    Frames, mean and p99 latency and accepted load (beats per cycle and input,
+    from the first arrival to the last departure) of a latency results file,
+    None if it has no frames. Latency counts from the arrival of each frame:
+    once the input queues are full, frames wait at the source instead.
+
+    The offered load is that of every input sending traffic, and patterns
+    such as incast leave some inputs idle, so the accepted load is divided
+    among the inputs found in the results rather than among all ports.
+
+    """
+    try:
+        data = load_results(output_file)
+    except FileNotFoundError:
+        return None
+    latency = summary(data['EndTime'] - data['GenTime'])
+    if latency['frames'] == 0:
+        return None
+
+    beats = np.ceil(data['Length']*8/data_width).sum()
+    span = (data['EndTime'].max() - data['GenTime'].min())/units_per_cycle
+    inputs = np.unique(data['Input']).size
+    return {'frames': latency['frames'], 'mean': latency['mean'], 'p99': latency['p99'],
+        'accepted': float(beats/(inputs*span)) if span > 0 else 0.0}
@@ -0,0 +1,66 @@
+"""
+
+Copyright (c) 2023 Corundum organization
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+import pytest
+
+from loadcurve.command import measure_point
+from stats.analysis import units_per_cycle
+
+
+def incast_results(path, load, frames=100, length=100, sources=(1, 2, 3), target=0):
+    """
+    Results of an incast on a 4x4 switch with an 8 bit data bus: every source
+    offers 'load' with frames of 'length' bytes and the target sends them out
+    back-to-back in arrival order.
+
+    """
+    gap = round(length/load)
+    arrivals = sorted((k*gap + n*length, source)
+        for k in range(frames) for n, source in enumerate(sources))
+    with open(path, 'w') as f:
+        f.write('Architecture,iq,TrafficProfile,incast\n')
+        f.write('Input,Output,StartTime,EndTime,DiffTime,ID,Length,GenTime\n')
+        end = 0
+        for tid, (arrival, source) in enumerate(arrivals):
+            end = max(end, arrival) + length
+            start, end_time = arrival*units_per_cycle, end*units_per_cycle
+            f.write(f'{source},{target},{start},{end_time},{end_time - start},{tid},{length},{start}\n')
+    return str(path)
+
+
+def test_incast_below_saturation(tmp_path):
+    # three inputs at 0.2 load only fill 60% of the target, nothing saturates:
+    # divided among all four ports, the accepted load would look like 0.15
+    point = measure_point(incast_results(tmp_path / 'results.txt', 0.2), 8)
+    assert point['frames'] == 300
+    assert point['accepted'] == pytest.approx(0.2, rel=0.01)
+    assert point['mean'] == 100*units_per_cycle
+
+
+def test_incast_above_saturation(tmp_path):
+    # the target sends one beat per cycle, a third of it for each input
+    point = measure_point(incast_results(tmp_path / 'results.txt', 0.5), 8)
+    assert point['accepted'] == pytest.approx(1/3, rel=0.01)
+    assert point['p99'] > point['mean'] > 100*units_per_cycle
+
@@ -0,0 +1 @@
+from .command import model
\ No newline at end of file
@@ -0,0 +1,214 @@
+"""
+
+Copyright (c) 2023 Corundum organization
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+import click
+import json
+import math
+import os
+import time
+from pathlib import Path
+from types_arg import SwitchSuffix
+
+import numpy as np
+
+import profile_io
+import results_db
+from latency.command import find_profile, profile_radix, results_file
+from stats.analysis import load_results, summary, units_per_cycle
+from .engine import Frame, build, default_timing
+
+def parse_timing(ctx, param, value):
+    timing = dict(default_timing)
+    for item in value:
+        name, _, cycles = item.partition('=')
+        if name not in timing:
+            raise click.BadParameter(f'{name!r} is not one of {", ".join(timing)}')
+        try:
+            timing[name] = float(cycles)
+        except ValueError:
+            raise click.BadParameter(f'{cycles!r} is not a number of cycles')
+    return timing
+
+@click.command()
+@click.option('-r', default=4, show_default=True, help='Radix of the switch')
+@click.option('-d', default=8, show_default=True, help='Width of the data bus in bits')
+@click.option('-f', default="newest", show_default=True, help='File name for benchmarking')
+@click.option('--vc-count', default=8, show_default=True, help='Number of virtual channels of the CICQ switch (a power of two)')
+@click.option('--fifo-depth', default=None, type=click.IntRange(1), help='FIFO_DEPTH_CYCLES of the queues  [default: as in rtl/]')
+@click.option('--timing', multiple=True, callback=parse_timing, help=f'Cycles of a pipeline stage as NAME=CYCLES (repeatable), names and defaults: {", ".join(f"{k}={v}" for k, v in default_timing.items())}')
+@click.option('--calibrate', is_flag=True, help='Check the latencies against those of the RTL latency benchmark of the same configuration')
+@click.option('--rtl', default=None, type=click.Path(exists=True, dir_okay=False), help='Latency results of the RTL to calibrate against  [default: latency/results of the configuration]')
+@click.option('--tolerance', default=0.1, show_default=True, type=click.FloatRange(0, min_open=True), help='Relative error of the mean and p99 latency allowed by the calibration')
+@click.argument('architecture', type=SwitchSuffix())
+@click.pass_context
+def model(ctx:click.Context, architecture:str, r:int, d:int, f:str, vc_count:int, fifo_depth:int, timing:dict, calibrate:bool, rtl:str,
+        tolerance:float):
+    """
+    Transaction-level performance model.
+
+    Frames of a traffic profile go through a model of the queues and
+    axis_arb_mux arbiters of the architecture as built in rtl/: the input
+    FIFOs of 'iq', the virtual output queues of 'iq_voq', the input frame
+    FIFOs, crossbar with a speedup of the radix and output FIFOs of 'oq' and
+    the virtual channels and crosspoint buffers of 'cicq', all arbitrated
+    round robin. Whole frames are moved between queues in an event-driven
+    simulation, which takes seconds where the RTL simulation takes hours, to
+    pre-screen configurations (e.g. other FIFO depths) before simulating
+    them. Results have the format of the latency benchmark, they are written
+    to latency/results/model and kept in the results database.
+
+    With 'calibrate', the latency of every frame is compared with that of
+    the RTL latency benchmark of the same configuration and profile, which
+    has to be within 'tolerance' for the mean and the p99 latency. The
+    pipeline latencies of the model can be adjusted with 'timing'.
+
+    """
+    if vc_count & (vc_count-1):
+        raise click.BadParameter(f'{vc_count} is not a power of two', param_hint='--vc-count')
+    try:
+        file_path = find_profile(f)
+    except FileNotFoundError:
+        print("There is no traffic pattern file available.")
+        return
+    profile_r = profile_radix(file_path)
+    if profile_r != r:
+        print(f'Radix {r} does not match radix {profile_r} in {file_path} traffic profile')
+        return
+
+    print(f'Selected traffic profile: {file_path}')
+    results_dir = 'latency/results/model'
+    output_file = results_file(architecture, d, file_path, results_dir)
+    speed = run_model(architecture, r, d, file_path, output_file, timing, fifo_depth, vc_count)
+    print(f'model: {speed["frames"]} frames, {speed["sim_cycles"]} cycles modelled in {speed["wall_time"]:.1f} s '
+        f'({speed["cycles_per_second"]:.0f} cycles/s), results in {output_file}')
+
+    if calibrate:
+        rtl = rtl or results_file(architecture, d, file_path)
+        if not os.path.isfile(rtl):
+            raise click.BadParameter(f'there are no RTL results in {rtl}, run the latency benchmark first', param_hint='--rtl')
+        if not report_calibration(compare(output_file, rtl), tolerance):
+            ctx.exit(1)
+
+def run_model(architecture:str, r:int, d:int, file_path:str, output_file:str, timing:dict = default_timing,
+        fifo_depth:int = None, vc_count:int = 8):
+    """
+    Model a latency benchmark and write its results, its speed next to them
+    and the run to the results database. Returns the speed.
+
+    """
+    wall_start = time.perf_counter()
+    switch, route = build(architecture, r, timing, fifo_depth, vc_count)
+
+    # tids as given by bench_switch_latency, the source port in the upper bits
+    src_width = (r-1).bit_length()
+    src_shift = 64-src_width
+    max_count = 2**src_shift
+    bytes_per_beat = d//8
+    # the CICQ virtual channel is taken from tuser, the frame length masked to its width
+    vc_mask = vc_count-1
+
+    frames = [list() for x in range(r)]
+    cur_id = 1
+    for input, output, length, frame_time in profile_io.iter_frames(file_path):
+        arrival = 0 if frame_time is None else -(-frame_time*8 // d)
+        queues, muxes = route(input, output, length & vc_mask)
+        frames[input].append(Frame(cur_id | (input << src_shift), input, output, length, -(-length // bytes_per_beat),
+            arrival, queues, muxes))
+        cur_id = (cur_id + 1) % max_count
+    for input_frames in frames:
+        input_frames.sort(key=lambda frame: frame.arrival)
+        for frame in input_frames:
+            switch.inject(frame)
+
+    delivered = switch.run()
+    delivered.sort(key=lambda frame: frame.end)
+
+    Path(output_file).parent.mkdir(parents=True, exist_ok=True)
+    with open(output_file, 'w') as f:
+        f.write(f'Architecture,{architecture},TrafficProfile,{file_path}\n')
+        f.write(f'Input,Output,StartTime,EndTime,DiffTime,ID,Length,GenTime\n')
+        for frame in delivered:
+            start, end = round(frame.start*units_per_cycle), round(frame.end*units_per_cycle)
+            f.write(f'{frame.input},{frame.output},{start},{end},{end-start},{frame.tid},{frame.length},'
+                f'{round(frame.arrival*units_per_cycle)}\n')
+
+    wall_time = time.perf_counter() - wall_start
+    sim_cycles = math.ceil(delivered[-1].end) if delivered else 0
+    speed = {'simulator': 'model', 'wall_time': wall_time, 'sim_cycles': sim_cycles,
+        'cycles_per_second': sim_cycles/wall_time, 'frames': len(delivered), 'timing': timing}
+    with open(f'{output_file}.json', 'w') as f:
+        json.dump(speed, f, indent=4)
+
+    results_db.store_latency(output_file, architecture, r, d, file_path, simulator='model', wall_time=wall_time,
+        sim_cycles=sim_cycles, timing=timing, fifo_depth=fifo_depth, vc_count=vc_count)
+    return speed
+
+def compare(model_file:str, rtl_file:str):
+    """
+    Latency of the model against that of the RTL, in cycles: summaries of
+    both and the error per frame (model minus RTL) of the frames in both,
+    matched by tid. If no tids match (e.g. the RTL ran with a window), only
+    the summaries are compared.
+
+    """
+    model = load_results(model_file)
+    rtl = load_results(rtl_file)
+    _, k_model, k_rtl = np.intersect1d(model['ID'], rtl['ID'], return_indices=True)
+    model_latency = model['DiffTime']/units_per_cycle
+    rtl_latency = rtl['DiffTime']/units_per_cycle
+    if k_model.size:
+        model_latency, rtl_latency = model_latency[k_model], rtl_latency[k_rtl]
+        error = model_latency - rtl_latency
+    else:
+        error = np.zeros(0)
+    return {
+        'matched': int(k_model.size),
+        'model': summary(model_latency),
+        'rtl': summary(rtl_latency),
+        'bias': float(error.mean()) if error.size else None,
+        'mae': float(np.abs(error).mean()) if error.size else None,
+        'p99_error': float(np.percentile(np.abs(error), 99)) if error.size else None,
+    }
+
+def report_calibration(comparison:dict, tolerance:float):
+    """Print a comparison and whether the mean and p99 latency are within the tolerance."""
+    model, rtl = comparison['model'], comparison['rtl']
+    if rtl['frames'] == 0 or model['frames'] == 0:
+        print('Calibration failed: no frames to compare.')
+        return False
+
+    print(f'{"":8} {"Frames":>8} {"Mean":>10} {"p50":>10} {"p99":>10} {"Max":>8}  (cycles)')
+    for name, stats in [('RTL', rtl), ('Model', model)]:
+        print(f'{name:8} {stats["frames"]:8} {stats["mean"]:10.2f} {stats["p50"]:10.2f} {stats["p99"]:10.2f} {stats["max"]:8.0f}')
+    if comparison['matched']:
+        print(f'{comparison["matched"]} frames matched: error (model minus RTL) mean {comparison["bias"]:.2f}, '
+            f'mean absolute {comparison["mae"]:.2f}, p99 absolute {comparison["p99_error"]:.2f} cycles')
+
+    errors = {key: (model[key] - rtl[key])/rtl[key] if rtl[key] else 0.0 for key in ['mean', 'p99']}
+    passed = all(abs(error) <= tolerance for error in errors.values())
+    print(f'Calibration {"passed" if passed else "failed"}: mean latency {errors["mean"]:+.1%}, '
+        f'p99 latency {errors["p99"]:+.1%} (tolerance {tolerance:.0%})')
+    if not passed and comparison['bias'] is not None:
+        print(f'The model is off by {comparison["bias"]:+.1f} cycles per frame on average, see --timing.')
+    return passed
@@ -0,0 +1,312 @@
+"""
+
+Copyright (c) 2023 Corundum organization
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+import heapq
+import math
+from collections import deque
+
+# FIFO_DEPTH_CYCLES of the queues of every architecture in rtl/
+fifo_depths = {'iq': 100, 'iq_voq': 100, 'oq': 2000, 'cicq': 100}
+# cycles of the pipeline stages: through a FIFO (first word written to first
+# word readable), an asynchronous FIFO (clock domain crossing included), an
+# axis_arb_mux (request to first word out) and into the sink, and idle cycles
+# of an arbiter between two frames
+default_timing = {'fifo': 2, 'async_fifo': 5, 'arbiter': 2, 'sink': 1, 'gap': 0}
+
+
+class Frame:
+    """A frame and the queues it goes through, each left by the mux of the same hop."""
+
+    __slots__ = ['tid', 'input', 'output', 'length', 'beats', 'arrival', 'start', 'end', 'ready', 'hop', 'queues', 'muxes']
+
+    def __init__(self, tid, input, output, length, beats, arrival, queues, muxes):
+        self.tid = tid
+        self.input = input
+        self.output = output
+        self.length = length
+        self.beats = beats
+        self.arrival = arrival
+        self.start = None
+        self.end = None
+        # cycle its first word can be read from its current queue
+        self.ready = arrival
+        self.hop = 0
+        self.queues = queues
+        self.muxes = muxes
+
+
+class Queue:
+    """
+    A FIFO with a single read port.
+
+    Capacity is in words, as FIFO_DEPTH_CYCLES rounded up to a power of two
+    by the verilog-axis FIFOs. Space is reserved for a whole frame when it
+    starts to be written and freed when it has been read, a frame larger
+    than the FIFO only gets in when it is empty. With 'store_and_forward'
+    (frame FIFOs), a frame can only be read once it has been fully written.
+
+    """
+
+    def __init__(self, name:str, capacity:float = math.inf, latency:float = 0, store_and_forward:bool = False):
+        self.name = name
+        self.capacity = capacity
+        self.latency = latency
+        self.store_and_forward = store_and_forward
+        self.frames = deque()
+        self.used = 0
+        # the read port is busy until then
+        self.read_free = 0
+        # muxes writing to the queue, woken when space is freed
+        self.writers = []
+
+    def room(self, frame:Frame):
+        return self.used + frame.beats <= self.capacity or self.used == 0
+
+
+class Mux:
+    """
+    An axis_arb_mux: moves whole frames from its input queues to the next
+    queue of each frame (or out of the switch) at 'rate' words per cycle.
+
+    Inputs are groups of queues; the groups are arbitrated round robin (or
+    by fixed priority, lowest index first) and so are the queues within a
+    group, e.g. the virtual channels of a crosspoint. A frame is granted
+    once its first word is readable and its next queue has room for it.
+
+    """
+
+    def __init__(self, name:str, groups:list, rate:float = 1.0, latency:float = 0, gap:float = 0, round_robin:bool = True):
+        self.name = name
+        self.groups = groups
+        self.rate = rate
+        self.latency = latency
+        self.gap = gap
+        self.round_robin = round_robin
+        self.busy_until = 0
+        self.last_group = -1
+        self.last = [-1]*len(groups)
+        self.id = None
+
+    def order(self, count:int, last:int):
+        start = last + 1 if self.round_robin else 0
+        return [(start + k) % count for k in range(count)]
+
+    def arbitrate(self, t:float):
+        """The (group, index, queue) granted at 't', or the cycle to try again (None to wait for space)."""
+        retry = None
+        for g in self.order(len(self.groups), self.last_group):
+            group = self.groups[g]
+            for k in self.order(len(group), self.last[g]):
+                queue = group[k]
+                if not queue.frames:
+                    continue
+                frame = queue.frames[0]
+                if frame.muxes[frame.hop] is not self:
+                    continue
+                available = max(frame.ready, queue.read_free)
+                if available > t:
+                    retry = available if retry is None else min(retry, available)
+                    continue
+                if frame.hop + 1 < len(frame.queues) and not frame.queues[frame.hop + 1].room(frame):
+                    continue
+                return (g, k, queue), None
+        return None, retry
+
+
+class Model:
+    """
+    Event-driven transaction-level model of a switch.
+
+    Frames are moved between queues by muxes, both built by one of the
+    architecture functions below. Whenever something changes for a mux (it
+    becomes idle, a frame reaches the head of one of its queues or space is
+    freed in a queue it writes to), it is woken to arbitrate. Events at the
+    same cycle are all applied before any mux arbitrates, as in the RTL.
+
+    """
+
+    def __init__(self, timing:dict):
+        self.timing = timing
+        self.muxes = []
+        self.events = []
+        self.seq = 0
+        self.delivered = []
+
+    def add_mux(self, mux:Mux):
+        mux.id = len(self.muxes)
+        self.muxes.append(mux)
+        return mux
+
+    def schedule(self, t:float, kind:int, item):
+        # releases (kind 0) go before arbitration (kind 1) at the same cycle
+        self.seq += 1
+        heapq.heappush(self.events, (t, kind, self.seq, item))
+
+    def wake(self, mux:Mux, t:float):
+        self.schedule(max(t, mux.busy_until), 1, mux)
+
+    def head_changed(self, queue:Queue):
+        if queue.frames:
+            frame = queue.frames[0]
+            self.wake(frame.muxes[frame.hop], max(frame.ready, queue.read_free))
+
+    def inject(self, frame:Frame):
+        """Queue a frame at its source, to be sent once it has arrived."""
+        source = frame.queues[0]
+        source.frames.append(frame)
+        if len(source.frames) == 1:
+            self.head_changed(source)
+
+    def move(self, mux:Mux, queue:Queue, t:float):
+        frame = queue.frames.popleft()
+        duration = frame.beats/mux.rate
+        if frame.hop == 0:
+            frame.start = t
+
+        queue.read_free = t + duration
+        if queue.capacity != math.inf:
+            self.schedule(t + duration, 0, (queue, frame.beats))
+        self.head_changed(queue)
+
+        mux.busy_until = t + duration + mux.gap
+        self.wake(mux, mux.busy_until)
+
+        frame.hop += 1
+        if frame.hop < len(frame.queues):
+            following = frame.queues[frame.hop]
+            following.used += frame.beats
+            frame.ready = t + mux.latency + following.latency + (duration if following.store_and_forward else 0)
+            following.frames.append(frame)
+            if len(following.frames) == 1:
+                self.head_changed(following)
+        else:
+            # the sink samples the last word
+            frame.end = t + duration - 1 + mux.latency + self.timing['sink']
+            self.delivered.append(frame)
+
+    def run(self):
+        """Simulate until every injected frame has been delivered."""
+        events = self.events
+        while events:
+            t = events[0][0]
+            woken = {}
+            while events and events[0][0] == t:
+                _, kind, _, item = heapq.heappop(events)
+                if kind == 0:
+                    queue, beats = item
+                    queue.used -= beats
+                    for writer in queue.writers:
+                        woken[writer.id] = writer
+                else:
+                    woken[item.id] = item
+
+            for mux in sorted(woken.values(), key=lambda mux: mux.id):
+                if mux.busy_until > t:
+                    continue
+                granted, retry = mux.arbitrate(t)
+                if granted:
+                    g, k, queue = granted
+                    mux.last_group = g
+                    mux.last[g] = k
+                    self.move(mux, queue, t)
+                elif retry is not None:
+                    self.schedule(retry, 1, mux)
+        return self.delivered
+
+
+def fifo_capacity(depth_cycles:int):
+    # verilog-axis FIFOs round their depth in words up to a power of two
+    return 2**math.ceil(math.log2(depth_cycles))
+
+
+def build(architecture:str, radix:int, timing:dict, fifo_depth:int = None, vc_count:int = 8):
+    """
+    Model of an architecture and a function giving the queues and muxes a
+    frame from 'input' to 'output' on virtual channel 'vc' goes through.
+
+    """
+    if architecture not in fifo_depths:
+        raise ValueError(f'{architecture!r} is not a modelled switch architecture')
+
+    model = Model(timing)
+    capacity = fifo_capacity(fifo_depth or fifo_depths[architecture])
+    fifo, arbiter, gap = timing['fifo'], timing['arbiter'], timing['gap']
+
+    # the AXI stream source of every input sends frames back to back
+    profiles = [Queue(f'profile{k}') for k in range(radix)]
+    sources = [model.add_mux(Mux(f'source{k}', [[profiles[k]]])) for k in range(radix)]
+
+    if architecture == 'iq':
+        # a FIFO per input, head-of-line blocking
+        inputs = [Queue(f'queues[{k}]', capacity, fifo) for k in range(radix)]
+        outputs = [model.add_mux(Mux(f'arbiters[{n}]', [[queue] for queue in inputs], latency=arbiter, gap=gap))
+            for n in range(radix)]
+        for k in range(radix):
+            inputs[k].writers.append(sources[k])
+        route = lambda input, output, vc: ([profiles[input], inputs[input]], [sources[input], outputs[output]])
+
+    elif architecture == 'iq_voq':
+        # a virtual output queue per input and output
+        voqs = [[Queue(f'input_ports[{k}].virtual_queues[{n}]', capacity, fifo) for n in range(radix)] for k in range(radix)]
+        outputs = [model.add_mux(Mux(f'arbiters[{n}]', [[voqs[k][n]] for k in range(radix)], latency=arbiter, gap=gap))
+            for n in range(radix)]
+        for k in range(radix):
+            for n in range(radix):
+                voqs[k][n].writers.append(sources[k])
+        route = lambda input, output, vc: ([profiles[input], voqs[input][output]], [sources[input], outputs[output]])
+
+    elif architecture == 'oq':
+        # input frame FIFOs, a crossbar 'radix' times faster and output FIFOs
+        async_fifo = timing['async_fifo']
+        inputs = [Queue(f'input_queues[{k}]', capacity, async_fifo, store_and_forward=True) for k in range(radix)]
+        queues = [Queue(f'output_queues[{n}]', capacity, async_fifo) for n in range(radix)]
+        crossbar = [model.add_mux(Mux(f'arbiters[{n}]', [[queue] for queue in inputs], rate=radix, latency=arbiter/radix,
+            gap=gap/radix)) for n in range(radix)]
+        links = [model.add_mux(Mux(f'output_ports[{n}]', [[queues[n]]])) for n in range(radix)]
+        for k in range(radix):
+            inputs[k].writers.append(sources[k])
+        for n in range(radix):
+            queues[n].writers.append(crossbar[n])
+        route = lambda input, output, vc: ([profiles[input], inputs[input], queues[output]],
+            [sources[input], crossbar[output], links[output]])
+
+    elif architecture == 'cicq':
+        # virtual channels per input, crosspoint buffers per input, output and
+        # virtual channel, arbitrated per input and then per virtual channel
+        channels = [[Queue(f'input_ports[{k}].virtual_channels[{v}]', capacity, fifo) for v in range(vc_count)] for k in range(radix)]
+        crosspoints = [[[Queue(f'input_ports[{k}].output_ports[{n}].virtual_channels[{v}]', capacity, fifo)
+            for v in range(vc_count)] for n in range(radix)] for k in range(radix)]
+        vc_arbiters = [model.add_mux(Mux(f'input_ports[{k}].axis_arb_mux_vc_inst', [[queue] for queue in channels[k]],
+            latency=arbiter, gap=gap)) for k in range(radix)]
+        outputs = [model.add_mux(Mux(f'input_ports[{n}].axis_arb_mux_output_inst', [crosspoints[k][n] for k in range(radix)],
+            latency=2*arbiter, gap=gap)) for n in range(radix)]
+        for k in range(radix):
+            for v in range(vc_count):
+                channels[k][v].writers.append(sources[k])
+                for n in range(radix):
+                    crosspoints[k][n][v].writers.append(vc_arbiters[k])
+        route = lambda input, output, vc: ([profiles[input], channels[input][vc], crosspoints[input][output][vc]],
+            [sources[input], vc_arbiters[input], outputs[output]])
+
+    return model, route
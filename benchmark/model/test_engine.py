@@ -0,0 +1,161 @@
+"""
+
+Copyright (c) 2023 Corundum organization
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+import pytest
+
+from model.engine import Frame, Queue, Mux, Model, build, default_timing, fifo_capacity, fifo_depths
+
+
+def send(architecture, frames, radix=4, timing=default_timing, **kwargs):
+    """Delivered frames by tid, given (input, output, beats, arrival) per frame in arrival order."""
+    model, route = build(architecture, radix, dict(timing), **kwargs)
+    for tid, (input, output, beats, arrival) in enumerate(frames):
+        queues, muxes = route(input, output, 0)
+        model.inject(Frame(tid, input, output, 8*beats, beats, arrival, queues, muxes))
+    return {frame.tid: frame for frame in model.run()}
+
+
+@pytest.mark.parametrize("architecture", list(fifo_depths))
+def test_every_frame_delivered(architecture):
+    frames = [(k % 4, (3*k) % 4, 1 + k % 7, k) for k in range(200)]
+    delivered = send(architecture, frames)
+    assert sorted(delivered) == list(range(len(frames)))
+    for tid, frame in delivered.items():
+        assert frame.arrival <= frame.start < frame.end
+
+
+@pytest.mark.parametrize("architecture", list(fifo_depths))
+def test_order_per_input_and_output(architecture):
+    frames = [(k % 2, 3, 4, 0) for k in range(40)]
+    delivered = send(architecture, frames)
+    for input in range(2):
+        ends = [delivered[tid].end for tid in range(input, 40, 2)]
+        assert ends == sorted(ends)
+
+
+@pytest.mark.parametrize("beats", [1, 8])
+def test_zero_load_latency_iq(beats):
+    frame = send('iq', [(0, 1, beats, 0)])[0]
+    timing = default_timing
+    # through the input FIFO and the output arbiter, the sink samples the last word
+    assert frame.start == 0
+    assert frame.end == timing['fifo'] + beats - 1 + timing['arbiter'] + timing['sink']
+
+
+def test_timing_override():
+    slow = dict(default_timing, fifo=10)
+    assert send('iq', [(0, 1, 1, 0)], timing=slow)[0].end - send('iq', [(0, 1, 1, 0)])[0].end == 8
+
+
+def test_round_robin_output():
+    # two inputs saturating one output are granted in turns
+    frames = [(input, 0, 4, 0) for k in range(10) for input in range(2)]
+    delivered = sorted(send('iq_voq', frames).values(), key=lambda frame: frame.end)
+    inputs = [frame.input for frame in delivered]
+    assert all(a != b for a, b in zip(inputs, inputs[1:]))
+    # one frame after the other at line rate
+    ends = [frame.end for frame in delivered]
+    assert all(b - a == 4 for a, b in zip(ends, ends[1:]))
+
+
+def test_fixed_priority():
+    queues = [Queue(f'q{k}') for k in range(3)]
+    mux = Mux('mux', [[queue] for queue in queues], round_robin=False)
+    mux.last_group = 0
+    assert mux.order(3, mux.last_group) == [0, 1, 2]
+    mux.round_robin = True
+    assert mux.order(3, mux.last_group) == [1, 2, 0]
+
+
+def test_head_of_line_blocking():
+    # input 0 queues a frame to the busy output 0 and then one to the idle output 1
+    frames = [(1, 0, 64, 0), (0, 0, 1, 1), (0, 1, 1, 2)]
+    iq = send('iq', frames)
+    voq = send('iq_voq', frames)
+    # behind the blocked head in the IQ switch, not with virtual output queues
+    assert iq[2].end > iq[0].end
+    assert voq[2].end < voq[0].end
+
+
+def test_queue_room():
+    queue = Queue('q', capacity=8)
+    frame = Frame(0, 0, 0, 64, 6, 0, [], [])
+    assert queue.room(frame)
+    queue.used = 4
+    assert not queue.room(frame)
+    # a frame larger than the FIFO only gets in when it is empty
+    large = Frame(1, 0, 0, 128, 16, 0, [], [])
+    assert not queue.room(large)
+    queue.used = 0
+    assert queue.room(large)
+
+
+def test_backpressure():
+    # small FIFOs fill up, no frame is lost and the switch does not deadlock
+    frames = [(k % 4, 0, 16, 0) for k in range(64)]
+    delivered = send('iq', frames, fifo_depth=16)
+    assert len(delivered) == 64
+    ends = sorted(frame.end for frame in delivered.values())
+    assert ends[-1] - ends[0] == 63*16
+
+
+def test_queues_never_overflow():
+    model = Model(dict(default_timing))
+    source = Queue('profile')
+    fifo = Queue('fifo', capacity=8, latency=2)
+    used = []
+    feed = model.add_mux(Mux('source', [[source]]))
+    drain = model.add_mux(Mux('sink', [[fifo]], rate=0.5))
+    fifo.writers.append(feed)
+    original = model.move
+
+    def move(mux, queue, t):
+        original(mux, queue, t)
+        used.append(fifo.used)
+    model.move = move
+
+    for tid in range(20):
+        model.inject(Frame(tid, 0, 0, 32, 4, 0, [source, fifo], [feed, drain]))
+    assert len(model.run()) == 20
+    assert max(used) <= fifo.capacity
+
+
+def test_oq_speedup():
+    # the crossbar is 'radix' times faster than the links, so frames from
+    # every input reach the output FIFO at about the same time
+    frames = [(input, 0, 8, 0) for input in range(4)]
+    delivered = sorted(send('oq', frames).values(), key=lambda frame: frame.end)
+    ends = [frame.end for frame in delivered]
+    assert all(b - a == 8 for a, b in zip(ends, ends[1:]))
+
+
+def test_fifo_capacity():
+    assert fifo_capacity(100) == 128
+    assert fifo_capacity(128) == 128
+    assert fifo_capacity(2000) == 2048
+
+
+def test_unknown_architecture():
+    with pytest.raises(ValueError):
+        build('crossbar', 4, dict(default_timing))
@@ -0,0 +1,148 @@
+"""
+
+Copyright (c) 2023 Corundum organization
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+import logging
+import re
+from array import array
+
+import numpy as np
+
+from cocotb.triggers import ClockCycles
+
+# FIFOs of every architecture below the wrapper, {n} and {m} range over the
+# ports and {v} over the virtual channels
+queue_paths = {
+    'iq': ['switch_inst.queues[{n}].axis_fifo_inst'],
+    'iq_voq': ['switch_inst.input_ports[{n}].virtual_queues[{m}].axis_fifo_inst'],
+    'oq': ['switch_inst.input_queues[{n}].axis_async_fifo_inst', 'switch_inst.output_queues[{n}].axis_async_fifo_inst'],
+    'cicq': ['switch_inst.input_ports[{n}].virtual_channels[{v}].axis_fifo_inst',
+        'switch_inst.switch_crossbar_inst.input_ports[{n}].output_ports[{m}].virtual_channels[{v}].axis_fifo_inst'],
+}
+percentiles = [50, 99, 99.9]
+
+
+def resolve(dut, path:str):
+    """Simulation handle of a hierarchical path such as 'a.b[2].c'."""
+    handle = dut
+    for part in path.split('.'):
+        name, index = re.fullmatch(r'(\w+)(?:\[(\d+)\])?', part).groups()
+        handle = getattr(handle, name)
+        if index is not None:
+            handle = handle[int(index)]
+    return handle
+
+
+def queue_names(architecture:str, radix:int, vc_count:int = 1):
+    """Hierarchical paths of the FIFOs of an architecture."""
+    names = []
+    for path in queue_paths[architecture]:
+        ns = range(radix)
+        ms = range(radix) if '{m}' in path else [0]
+        vs = range(vc_count) if '{v}' in path else [0]
+        names += [path.format(n=n, m=m, v=v) for n in ns for m in ms for v in vs]
+    return names
+
+
+class QueueProbe:
+    """Occupancy probe of a FIFO, from its write and read pointers."""
+
+    def __init__(self, name, fifo):
+        self.name = name
+        # frame FIFOs keep the committed write pointer apart from the current one
+        try:
+            self.wr_ptr = fifo.wr_ptr_cur_reg
+        except AttributeError:
+            self.wr_ptr = fifo.wr_ptr_reg
+        self.rd_ptr = fifo.rd_ptr_reg
+        # pointers have an extra bit to tell a full FIFO from an empty one
+        width = len(self.rd_ptr)
+        self.mask = 2**width - 1
+        self.capacity = 2**(width-1)
+
+    def occupancy(self):
+        return (int(self.wr_ptr.value) - int(self.rd_ptr.value)) & self.mask
+
+
+class OccupancySampler:
+    """
+    Queue occupancy sampled every 'interval' cycles.
+
+    The FIFOs of the architecture are probed through their write and read
+    pointers, so the RTL is left untouched. Occupancy is in words, one word
+    per cycle of the data bus, the unit of FIFO_DEPTH_CYCLES. Peaks shorter
+    than the interval can be missed, an interval of 1 samples every cycle.
+
+    """
+
+    def __init__(self, dut, clock, architecture:str, radix:int, vc_count:int = 1, interval:int = 100, log=None):
+        self.clock = clock
+        self.interval = interval
+        self.log = log or logging.getLogger("cocotb.tb")
+
+        prefix = 'switch_inst.'
+        self.queues = [QueueProbe(name[len(prefix):].rsplit('.', 1)[0], resolve(dut, name))
+            for name in queue_names(architecture, radix, vc_count)]
+        self.times = array('Q')
+        self.samples = [array('I') for queue in self.queues]
+
+    async def run(self):
+        while True:
+            await ClockCycles(self.clock, self.interval)
+            self.sample()
+
+    def sample(self):
+        self.times.append((len(self.times) + 1)*self.interval)
+        for queue, series in zip(self.queues, self.samples):
+            series.append(queue.occupancy())
+
+    def stats(self):
+        """Peak, mean and percentiles of the occupancy of every queue and the samples it was full."""
+        result = []
+        for queue, series in zip(self.queues, self.samples):
+            data = np.frombuffer(series, dtype=np.uint32) if len(series) else np.zeros(1, dtype=np.uint32)
+            stats = {'queue': queue.name, 'capacity': queue.capacity, 'max': int(data.max()), 'mean': float(data.mean()),
+                'full': int((data >= queue.capacity).sum())}
+            for p, value in zip(percentiles, np.percentile(data, percentiles)):
+                stats[f'p{p:g}'] = float(value)
+            result.append(stats)
+        return result
+
+    def recommend(self):
+        """
+        Smallest FIFO_DEPTH_CYCLES that would have held the peak occupancy of
+        every queue without backpressure, and whether any queue was full (then
+        the true peak is unknown and the value is only a lower bound).
+
+        """
+        stats = self.stats()
+        peak = max((queue['max'] for queue in stats), default=0)
+        # a FIFO holding its whole capacity is full and stops accepting words
+        return peak + 1, any(queue['full'] for queue in stats)
+
+    def write(self, path:str):
+        """Occupancy time series as CSV, a column per queue, times in cycles since sampling started."""
+        with open(path, 'w') as f:
+            f.write(f'Time,{",".join(queue.name for queue in self.queues)}\n')
+            for k, time in enumerate(self.times):
+                f.write(f'{time},{",".join(str(series[k]) for series in self.samples)}\n')
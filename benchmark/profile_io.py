@@ -0,0 +1,253 @@
+"""
+
+Copyright (c) 2023 Corundum organization
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+import numpy as np
+from array import array
+from pathlib import Path
+
+# binary profiles keep the two text lines of the CSV profiles (metadata and
+# header, with the type of each column) followed by the frames as packed
+# little-endian records
+binary_suffix = '.bin'
+column_types = {'Input': '<u2', 'Output': '<u2', 'Length': '<u4', 'Time': '<u8'}
+alignment = 64
+chunk_size = 65536
+
+
+def is_binary(path:str):
+    return Path(path).suffix == binary_suffix
+
+
+def read_header(path:str):
+    """Metadata list, columns and data offset of a CSV or binary traffic profile."""
+    with open(path, 'rb') as f:
+        metadata = f.readline().decode().strip().split(",")
+        columns = [column.split(":")[0] for column in f.readline().decode().strip().split(",")]
+        return metadata, columns, f.tell()
+
+
+def frames_dtype(columns:list):
+    return np.dtype([(column, column_types[column]) for column in columns])
+
+
+def binary_dtype(path:str):
+    """Record type of a binary traffic profile, from its header line."""
+    with open(path, 'rb') as f:
+        f.readline()
+        columns = [column.split(":") for column in f.readline().decode().strip().split(",")]
+    return np.dtype([(name, f'<{kind}') for name, kind in columns])
+
+
+def smallest_dtype(frames):
+    """Record type with the smallest unsigned integer type holding each column."""
+    types = []
+    for name in frames.dtype.names:
+        top = int(frames[name].max()) if len(frames) else 0
+        types.append((name, next(f'<u{size}' for size in [1, 2, 4, 8] if top < 2**(8*size))))
+    return np.dtype(types)
+
+
+def load_frames(path:str):
+    """
+    Frames of a traffic profile as a structured array.
+
+    Binary profiles are memory-mapped, so nothing is read until it is used;
+    CSV profiles are parsed in full.
+
+    """
+    metadata, columns, offset = read_header(path)
+    dtype = binary_dtype(path) if is_binary(path) else frames_dtype(columns)
+    if is_binary(path):
+        if Path(path).stat().st_size == offset:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode='r', offset=offset)
+    return np.loadtxt(path, dtype=dtype, delimiter=",", skiprows=2, ndmin=1)
+
+
+def iter_frames(path:str, input:int = None):
+    """
+    Input, output, length and arrival time (None if not timed) of every frame
+    of a traffic profile (or only of those from 'input'), in file order.
+
+    Binary profiles are converted to Python integers one chunk at a time
+    straight from the memory map; CSV profiles are read line by line.
+
+    """
+    metadata, columns, offset = read_header(path)
+    time_pos = columns.index('Time') if 'Time' in columns else None
+
+    if is_binary(path):
+        frames = load_frames(path)
+        names = ['Input', 'Output', 'Length']
+        for k in range(0, len(frames), chunk_size):
+            chunk = frames[k:k+chunk_size]
+            if input is not None:
+                chunk = chunk[chunk['Input'] == input]
+            times = chunk['Time'].tolist() if time_pos is not None else [None]*len(chunk)
+            yield from zip(*(chunk[name].tolist() for name in names), times)
+        return
+
+    prefix = f'{input},' if input is not None else ''
+    with open(path) as f:
+        f.readline()
+        f.readline()
+        for line in f:
+            if not line.strip() or not line.startswith(prefix):
+                continue
+            line_list = line.split(",")
+            yield (int(line_list[0]), int(line_list[1]), int(line_list[2]),
+                int(line_list[time_pos]) if time_pos is not None else None)
+
+
+def input_changes(path:str):
+    """
+    Position and input of every frame whose input differs from the previous
+    one, in records for binary profiles and in bytes for CSV ones, followed
+    by the end of the frames and None.
+
+    """
+    current = None
+    if is_binary(path):
+        frames = load_frames(path)
+        for k in range(0, len(frames), chunk_size):
+            inputs = frames['Input'][k:k+chunk_size]
+            for pos in [0, *(np.flatnonzero(inputs[1:] != inputs[:-1]) + 1).tolist()]:
+                if inputs[pos] != current:
+                    current = int(inputs[pos])
+                    yield k + pos, current
+        yield len(frames), None
+        return
+
+    metadata, columns, offset = read_header(path)
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        position = offset
+        for line in f:
+            if line.strip():
+                input = int(line[:line.index(b',')])
+                if input != current:
+                    current = input
+                    yield position, current
+            position += len(line)
+        yield position, None
+
+
+def input_runs(path:str, radix:int):
+    """
+    Runs of consecutive frames from each input of a traffic profile, found in
+    a single pass: start and end positions (as in input_changes) of every run,
+    one flat array per input. Generated profiles are written one input at a
+    time, so each input usually has a single run.
+
+    """
+    runs = [array('Q') for input in range(radix)]
+    current, start = None, 0
+    for position, input in input_changes(path):
+        if current is not None and current < radix:
+            runs[current].extend((start, position))
+        current, start = input, position
+    return runs
+
+
+def iter_runs(path:str, runs):
+    """
+    Frames of some runs of input_runs, as in iter_frames: only the frames of
+    the runs are read, so each input can read its own frames without going
+    through those of the others.
+
+    """
+    metadata, columns, offset = read_header(path)
+    time_pos = columns.index('Time') if 'Time' in columns else None
+
+    if is_binary(path):
+        frames = load_frames(path)
+        names = ['Input', 'Output', 'Length']
+        for start, end in zip(runs[0::2], runs[1::2]):
+            for k in range(start, end, chunk_size):
+                chunk = frames[k:min(k+chunk_size, end)]
+                times = chunk['Time'].tolist() if time_pos is not None else [None]*len(chunk)
+                yield from zip(*(chunk[name].tolist() for name in names), times)
+        return
+
+    with open(path, 'rb') as f:
+        for start, end in zip(runs[0::2], runs[1::2]):
+            f.seek(start)
+            position = start
+            while position < end:
+                line = f.readline()
+                position += len(line)
+                if not line.strip():
+                    continue
+                line_list = line.split(b",")
+                yield (int(line_list[0]), int(line_list[1]), int(line_list[2]),
+                    int(line_list[time_pos]) if time_pos is not None else None)
+
+
+def count_frames(path:str):
+    """Number of frames of a traffic profile, without parsing them."""
+    metadata, columns, offset = read_header(path)
+    if is_binary(path):
+        return (Path(path).stat().st_size - offset)//binary_dtype(path).itemsize
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        return sum(1 for line in f if line.strip())
+
+
+def write_binary(path:str, metadata:list, frames):
+    """Write a structured array of frames as a binary traffic profile."""
+    dtype = smallest_dtype(frames)
+    header = ','.join(f'{name}:{dtype[name].str[1:]}' for name in dtype.names)
+    with open(path, 'wb') as f:
+        f.write(f'{",".join(metadata)}\n'.encode())
+        # pad the header line so that the records start aligned
+        padding = -(f.tell() + len(header) + 1) % alignment
+        f.write(f'{header}{" "*padding}\n'.encode())
+        f.write(frames.astype(dtype).tobytes())
+
+
+def write_csv(path:str, metadata:list, frames):
+    """Write a structured array of frames as a CSV traffic profile."""
+    with open(path, 'w') as f:
+        f.write(f'{",".join(metadata)}\n')
+        f.write(f'{",".join(frames.dtype.names)}\n')
+        for k in range(0, len(frames), chunk_size):
+            chunk = frames[k:k+chunk_size]
+            f.writelines(f'{",".join(map(str, row))}\n' for row in chunk.tolist())
+
+
+def convert(source:str, destination:str):
+    """Convert a traffic profile between the CSV and the binary formats."""
+    metadata, columns, offset = read_header(source)
+    frames = load_frames(source)
+    if is_binary(destination):
+        write_binary(destination, metadata, frames)
+    else:
+        write_csv(destination, metadata, frames)
+    return len(frames)
+
+
+def results_name(path:str):
+    """File name of the latency results of a traffic profile (always CSV)."""
+    name = Path(path).name
+    return f'{Path(path).stem}.txt' if is_binary(path) else name
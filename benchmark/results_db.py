@@ -0,0 +1,220 @@
+"""
+
+Copyright (c) 2023 Corundum organization
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+import json
+import os
+import sqlite3
+import subprocess
+import time
+
+# every benchmark run is appended to a single local SQLite database
+db_file = os.getenv("RESULTS_DB", "results.db")
+batch_size = 10000
+
+schema = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    benchmark TEXT NOT NULL,
+    architecture TEXT NOT NULL,
+    radix INTEGER,
+    data_width INTEGER,
+    profile TEXT,
+    simulator TEXT,
+    seed INTEGER,
+    git_revision TEXT,
+    created TEXT NOT NULL,
+    wall_time REAL,
+    sim_cycles INTEGER,
+    parameters TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_config ON runs (benchmark, architecture, radix, data_width, profile);
+
+CREATE TABLE IF NOT EXISTS frames (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    input INTEGER NOT NULL,
+    output INTEGER NOT NULL,
+    start_time INTEGER NOT NULL,
+    end_time INTEGER NOT NULL,
+    diff_time INTEGER NOT NULL,
+    tid INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    gen_time INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS frames_run ON frames (run_id, input, output);
+
+CREATE TABLE IF NOT EXISTS metrics (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    name TEXT NOT NULL,
+    port INTEGER,
+    value REAL
+);
+CREATE INDEX IF NOT EXISTS metrics_run ON metrics (run_id, name);
+"""
+
+run_columns = ['id', 'benchmark', 'architecture', 'radix', 'data_width', 'profile', 'simulator', 'seed',
+    'git_revision', 'created', 'wall_time', 'sim_cycles', 'parameters']
+
+
+def connect(path:str = None):
+    """Open (and create if needed) the results database."""
+    conn = sqlite3.connect(path or db_file, timeout=60)
+    conn.executescript(schema)
+    return conn
+
+
+def git_revision():
+    """Revision of the working tree, marked dirty if it has local changes."""
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True, text=True,
+            check=True).stdout.strip() or None
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def to_signed(tid:int):
+    # tids use all 64 bits, SQLite integers are signed
+    return tid - 2**64 if tid >= 2**63 else tid
+
+
+def to_unsigned(tid:int):
+    return tid + 2**64 if tid < 0 else tid
+
+
+def add_run(conn, benchmark:str, architecture:str, radix:int = None, data_width:int = None, profile:str = None,
+        simulator:str = None, seed:int = None, wall_time:float = None, sim_cycles:int = None, **parameters):
+    """Append a run and return its id; extra keyword arguments are stored as JSON parameters."""
+    cursor = conn.execute('INSERT INTO runs (benchmark, architecture, radix, data_width, profile, simulator, seed, '
+        'git_revision, created, wall_time, sim_cycles, parameters) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        (benchmark, architecture, radix, data_width, profile, simulator, seed, git_revision(),
+        time.strftime('%Y-%m-%dT%H:%M:%S'), wall_time, sim_cycles, json.dumps(parameters)))
+    return cursor.lastrowid
+
+
+def add_frames(conn, run_id:int, rows):
+    """
+    Append the frames of a run in batches.
+
+    Rows hold the columns of a latency results file: input, output, start
+    time, end time, latency, tid, length and generation time.
+
+    """
+    batch = []
+    for row in rows:
+        input, output, start_time, end_time, diff_time, tid, length, gen_time = row
+        batch.append((run_id, input, output, start_time, end_time, diff_time, to_signed(tid), length, gen_time))
+        if len(batch) == batch_size:
+            conn.executemany('INSERT INTO frames VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', batch)
+            batch = []
+    if batch:
+        conn.executemany('INSERT INTO frames VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', batch)
+
+
+def add_metrics(conn, run_id:int, metrics):
+    """Append (name, port, value) metrics of a run; port is None for metrics of the whole switch."""
+    conn.executemany('INSERT INTO metrics VALUES (?, ?, ?, ?)', [(run_id, name, port, value) for name, port, value in metrics])
+
+
+def read_results(results_file:str):
+    """Rows of a latency results file as integers."""
+    with open(results_file) as f:
+        f.readline()
+        f.readline()
+        for line in f:
+            if line.strip():
+                yield [int(x) for x in line.split(",")]
+
+
+def store_latency(results_file:str, architecture:str, radix:int, data_width:int, profile:str, path:str = None,
+        metrics=(), **run):
+    """Append a latency run with all of its frames and its metrics (if any) in a single transaction."""
+    conn = connect(path)
+    try:
+        with conn:
+            run_id = add_run(conn, 'latency', architecture, radix, data_width, profile, **run)
+            add_frames(conn, run_id, read_results(results_file))
+            add_metrics(conn, run_id, metrics)
+        return run_id
+    finally:
+        conn.close()
+
+
+def store_metrics(benchmark:str, architecture:str, metrics, path:str = None, **run):
+    """Append a run with its metrics in a single transaction."""
+    conn = connect(path)
+    try:
+        with conn:
+            run_id = add_run(conn, benchmark, architecture, **run)
+            add_metrics(conn, run_id, metrics)
+        return run_id
+    finally:
+        conn.close()
+
+
+def find_runs(conn, benchmark:str = None, architecture:str = None, radix:int = None, data_width:int = None,
+        profile:str = None, latest:bool = False):
+    """
+    Runs matching the given fields as dicts, oldest first.
+
+    With 'latest', only the newest run of every configuration (including the
+    simulator) is returned.
+
+    """
+    filters = {'benchmark': benchmark, 'architecture': architecture, 'radix': radix, 'data_width': data_width}
+    where = ' AND '.join([f'{name} = ?' for name, value in filters.items() if value is not None] or ['1'])
+    values = [value for value in filters.values() if value is not None]
+    if profile is not None:
+        # profiles are stored as given to the benchmark, match their file name too
+        where += " AND (profile = ? OR profile LIKE ?)"
+        values += [profile, f'%/{profile}']
+    if latest:
+        where += (' AND id IN (SELECT MAX(id) FROM runs GROUP BY benchmark, architecture, radix, data_width, '
+            'profile, simulator)')
+    rows = conn.execute(f'SELECT {", ".join(run_columns)} FROM runs WHERE {where} ORDER BY id', values).fetchall()
+    runs = [dict(zip(run_columns, row)) for row in rows]
+    for run in runs:
+        run['parameters'] = json.loads(run['parameters'] or '{}')
+    return runs
+
+
+def latency_summary(conn, run_ids:list):
+    """Number of frames and mean, minimum and maximum latency of every run, by run id."""
+    placeholders = ', '.join('?'*len(run_ids))
+    rows = conn.execute('SELECT run_id, COUNT(*), AVG(diff_time), MIN(diff_time), MAX(diff_time) FROM frames '
+        f'WHERE run_id IN ({placeholders}) GROUP BY run_id', list(run_ids)).fetchall()
+    return {row[0]: dict(zip(['frames', 'mean', 'min', 'max'], row[1:])) for row in rows}
+
+
+def frames(conn, run_id:int, columns:list = None):
+    """Columns (all by default) of the frames of a run, in the order they were recorded."""
+    columns = columns or ['input', 'output', 'start_time', 'end_time', 'diff_time', 'tid', 'length', 'gen_time']
+    rows = conn.execute(f'SELECT {", ".join(columns)} FROM frames WHERE run_id = ? ORDER BY rowid', (run_id,)).fetchall()
+    if 'tid' in columns:
+        k = columns.index('tid')
+        rows = [row[:k] + (to_unsigned(row[k]),) + row[k+1:] for row in rows]
+    return rows
+
+
+def metrics(conn, run_id:int):
+    """(name, port, value) metrics of a run."""
+    return conn.execute('SELECT name, port, value FROM metrics WHERE run_id = ? ORDER BY rowid', (run_id,)).fetchall()
@@ -0,0 +1 @@
+from .command import runs
\ No newline at end of file
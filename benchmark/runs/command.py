@@ -0,0 +1,97 @@
+"""
+
+Copyright (c) 2023 Corundum organization
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+import click
+import os
+from pathlib import Path
+
+import results_db
+from types_arg import SwitchSuffix
+
+@click.command()
+@click.option('-b', '--benchmark', type=click.Choice(['latency', 'throughput']), help='Benchmark of the runs')
+@click.option('-a', default=None, type=SwitchSuffix(), help='Switch architecture of the runs')
+@click.option('-r', default=None, type=int, help='Radix of the runs')
+@click.option('-d', default=None, type=int, help='Data width of the runs')
+@click.option('-f', default=None, help='Traffic profile (path or file name) of the runs')
+@click.option('--latest', is_flag=True, help='Only the newest run of every configuration')
+@click.option('--export', default=None, type=int, help='Write the frames of this latency run as a latency results file')
+@click.option('--db', default=None, help='Results database  [default: $RESULTS_DB or results.db]')
+def runs(benchmark:str, a:str, r:int, d:int, f:str, latest:bool, export:int, db:str):
+    """
+    Benchmark runs stored in the results database.
+
+    Every latency and throughput run is appended to the results database with
+    its configuration, simulator, seeds, git revision and wall time. Runs are
+    listed with their latency summary (latency runs) or accepted load
+    (throughput runs), filtered by the given options.
+
+    """
+    path = db or results_db.db_file
+    if not os.path.exists(path):
+        print(f'There is no results database in {path}.')
+        return
+
+    conn = results_db.connect(path)
+    try:
+        if export is not None:
+            export_run(conn, export)
+            return
+
+        selected = results_db.find_runs(conn, benchmark, a, r, d, f, latest)
+        if not selected:
+            print('No runs found.')
+            return
+        summary = results_db.latency_summary(conn, [run['id'] for run in selected])
+
+        print(f'{"ID":>5} {"Created":19} {"Benchmark":10} {"Arch":6} {"Radix":>5} {"Width":>5} {"Sim":9} {"Revision":12} {"Result":32} Profile')
+        for run in selected:
+            if run['benchmark'] == 'latency':
+                stats = summary.get(run['id'])
+                result = f'{stats["frames"]} frames, mean {stats["mean"]:.1f} max {stats["max"]}' if stats else 'no frames'
+            else:
+                accepted = [value for name, port, value in results_db.metrics(conn, run['id']) if name == 'input_load' and port is None]
+                result = f'offered {run["parameters"].get("offered_load", 0):.2f} accepted {accepted[0]:.3f}' if accepted else ''
+            profile = Path(run['profile']).name if run['profile'] else ''
+            print(f'{run["id"]:>5} {run["created"]:19} {run["benchmark"]:10} {run["architecture"]:6} {run["radix"] or "":>5} '
+                f'{run["data_width"] or "":>5} {run["simulator"] or "":9} {run["git_revision"] or "":12} {result:32} {profile}')
+    finally:
+        conn.close()
+
+def export_run(conn, run_id:int):
+    """Write the frames of a latency run in the format of the latency results files."""
+    selected = [run for run in results_db.find_runs(conn, benchmark='latency') if run['id'] == run_id]
+    if not selected:
+        print(f'There is no latency run {run_id}.')
+        return
+
+    dir_file = 'latency/results'
+    Path(dir_file).mkdir(parents=True, exist_ok=True)
+    output_file = f'{dir_file}/run-{run_id}.txt'
+    with open(output_file, 'w') as file:
+        file.write(f'Architecture,{selected[0]["architecture"]},TrafficProfile,{selected[0]["profile"]}\n')
+        file.write(f'Input,Output,StartTime,EndTime,DiffTime,ID,Length,GenTime\n')
+        for row in results_db.frames(conn, run_id):
+            file.write(f'{",".join(map(str, row))}\n')
+    print(f'Run {run_id} written to {output_file}')
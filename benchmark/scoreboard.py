@@ -0,0 +1,272 @@
+"""
+
+Copyright (c) 2023 Corundum organization
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+import logging
+import math
+from array import array
+from statistics import NormalDist
+
+
+class LatencyRecord:
+    """Timestamps collected for a single frame."""
+
+    __slots__ = ('input', 'output', 'length', 'gen_time', 'timed', 'entered', 'in_output', 'start_time', 'out_output', 'end_time')
+
+    def __init__(self, input, output, length, gen_time, timed=False):
+        self.input = input
+        self.output = output
+        self.length = length
+        self.gen_time = gen_time
+        self.timed = timed
+        self.entered = None
+        self.in_output = None
+        self.start_time = None
+        self.out_output = None
+        self.end_time = None
+
+
+class BatchMeans:
+    """
+    Batch means estimate of the mean latency and its confidence interval.
+
+    Latencies of consecutive frames are grouped in batches, whose means are
+    close to independent when the batches are long enough: while the lag 1
+    autocorrelation of the batch means is above 'max_correlation', adjacent
+    batches are merged, doubling the batch size. The estimate has converged
+    once there are at least 'min_batches' batches and the half width of the
+    confidence interval is within 'precision' of the mean.
+
+    """
+
+    def __init__(self, batch_size=1000, precision=0.05, confidence=0.95, min_batches=20, max_correlation=0.2):
+        self.batch_size = batch_size
+        self.precision = precision
+        self.min_batches = min_batches
+        self.max_correlation = max_correlation
+        # normal approximation of the t quantile, close enough with min_batches or more
+        self.z = NormalDist().inv_cdf(0.5 + confidence/2)
+
+        self.means = []
+        self.total = 0
+        self.count = 0
+
+    def add(self, latency):
+        self.total += latency
+        self.count += 1
+        if self.count == self.batch_size:
+            self.means.append(self.total/self.count)
+            self.total = 0
+            self.count = 0
+            if len(self.means) >= 2*self.min_batches and self.correlation() > self.max_correlation:
+                # a trailing odd batch is dropped, it is only a fraction of the data
+                self.means = [(a + b)/2 for a, b in zip(self.means[0::2], self.means[1::2])]
+                self.batch_size *= 2
+
+    def mean(self):
+        return sum(self.means)/len(self.means) if self.means else 0.0
+
+    def half_width(self):
+        k = len(self.means)
+        if k < 2:
+            return math.inf
+        mean = self.mean()
+        variance = sum((x - mean)**2 for x in self.means)/(k - 1)
+        return self.z*math.sqrt(variance/k)
+
+    def correlation(self):
+        """Lag 1 autocorrelation of the batch means."""
+        mean = self.mean()
+        deviations = [x - mean for x in self.means]
+        variance = sum(d*d for d in deviations)
+        if variance == 0:
+            return 0.0
+        return sum(a*b for a, b in zip(deviations, deviations[1:]))/variance
+
+    def converged(self):
+        if len(self.means) < self.min_batches:
+            return False
+        return self.half_width() <= self.precision*abs(self.mean())
+
+
+class Scoreboard:
+    """
+    In-memory latency scoreboard indexed by tid.
+
+    Generation, ingress and egress events are joined as they happen and every
+    finished record is written straight away to the results file, so no
+    intermediate files or sorting are needed. Frames that do not match are
+    reported individually instead of aborting the whole run.
+
+    Only frames within the measurement window are written: the first
+    'warmup_frames' frames to enter the switch (over all inputs) and those
+    arriving before 'warmup_until' (in simulation steps; the arrival time of
+    timed frames, the ingress time of the rest) fill the queues, and the
+    frames entering from the 'drain_from'-th on empty them, so they are
+    counted as discarded. With 'batch_means', the window is closed as soon as
+    the latency estimate converges, which the producers can poll to stop
+    early. The estimate only advances as frames complete, so ingress events
+    have to be handed over as they happen.
+
+    """
+
+    def __init__(self, results, log=None, warmup_frames=0, warmup_until=0, drain_from=None, batch_means=None):
+        self.results = results
+        self.log = log or logging.getLogger("cocotb.tb")
+        self.warmup_frames = warmup_frames
+        self.warmup_until = warmup_until
+        self.drain_from = drain_from
+        self.batch_means = batch_means
+
+        self.records = {}
+        self.mismatches = []
+        self.generated = 0
+        self.entered = 0
+        self.completed = 0
+        self.discarded = 0
+        self.converged = False
+
+    def generate(self, tid, input, output, length, sim_time=0, timed=False):
+        if tid in self.records:
+            self.mismatch(tid, 'tid reused while a frame with the same tid is still in flight')
+        self.records[tid] = LatencyRecord(input, output, length, sim_time, timed)
+        self.generated += 1
+
+    def ingress(self, tid, output, start_time):
+        record = self.records.get(tid)
+        if record is None:
+            self.mismatch(tid, f'ingress on output {output} for an unknown frame')
+            return
+        record.in_output = output
+        record.start_time = start_time
+        record.entered = self.entered
+        self.entered += 1
+        if record.end_time is not None:
+            self.complete(tid, record)
+
+    def egress(self, tid, output, end_time):
+        record = self.records.get(tid)
+        if record is None:
+            self.mismatch(tid, f'egress on output {output} for an unknown frame')
+            return
+        record.out_output = output
+        record.end_time = end_time
+        if record.start_time is not None:
+            self.complete(tid, record)
+
+    def measured(self, record):
+        """Whether a frame is within the measurement window."""
+        if record.entered < self.warmup_frames:
+            return False
+        # untimed frames are all generated at the start, before they can be sent
+        if (record.gen_time if record.timed else record.start_time) < self.warmup_until:
+            return False
+        return self.drain_from is None or record.entered < self.drain_from
+
+    def complete(self, tid, record):
+        del self.records[tid]
+
+        if record.in_output != record.output or record.out_output != record.output:
+            self.mismatch(tid, f'frame from input {record.input} generated for output {record.output}, '
+                f'sent to output {record.in_output} and received on output {record.out_output}')
+            return
+
+        if not self.measured(record):
+            self.discarded += 1
+            return
+
+        diff_time = int((record.end_time-record.start_time)/1000)
+        self.results.write(f'{record.input},{record.output},{int(record.start_time/1000)},{int(record.end_time/1000)},'
+            f'{diff_time},{tid},{record.length},{int(record.gen_time/1000)}\n')
+        self.completed += 1
+
+        if self.batch_means is not None and not self.converged:
+            self.batch_means.add(diff_time)
+            if self.batch_means.converged():
+                # frames entering from now on are left out of the window
+                self.converged = True
+                self.drain_from = self.entered if self.drain_from is None else min(self.drain_from, self.entered)
+                self.log.info("Latency converged after %d frames: mean %.2f +/- %.2f (batches of %d frames)", self.completed,
+                    self.batch_means.mean(), self.batch_means.half_width(), self.batch_means.batch_size)
+
+    def mismatch(self, tid, reason):
+        self.log.warning("Frame %d: %s", tid, reason)
+        self.mismatches.append((tid, reason))
+
+    def close(self):
+        # anything left has missed its ingress or egress event
+        for tid, record in self.records.items():
+            if record.start_time is None:
+                self.mismatch(tid, f'frame from input {record.input} to output {record.output} never entered the switch')
+            else:
+                self.mismatch(tid, f'frame from input {record.input} to output {record.output} never left the switch')
+        self.records.clear()
+
+        if self.discarded:
+            self.log.info("%d frames recorded, %d frames out of the measurement window discarded", self.completed, self.discarded)
+        if self.mismatches:
+            self.log.warning("%d frames recorded, %d frames did not match", self.completed, len(self.mismatches))
+
+        return not self.mismatches
+
+
+class IngressRecorder:
+    """
+    Buffered recorder for ingress (tx complete) events.
+
+    Events are stored in preallocated arrays and handed over to the scoreboard
+    in bulk whenever the buffer fills up and when the run finishes, so the
+    per-frame callback in the simulator event loop does no I/O at all. Unless
+    quiet, every event is also logged.
+
+    """
+
+    def __init__(self, scoreboard, capacity=65536, quiet=True, log=None):
+        self.scoreboard = scoreboard
+        self.capacity = capacity
+        self.quiet = quiet
+        self.log = log or logging.getLogger("cocotb.tb")
+
+        self.tid = array('Q', bytes(8*capacity))
+        self.tdest = array('Q', bytes(8*capacity))
+        self.start_time = array('Q', bytes(8*capacity))
+        self.count = 0
+
+    def record(self, frame):
+        k = self.count
+        self.tid[k] = frame.tid[0]
+        self.tdest[k] = frame.tdest[0]
+        self.start_time[k] = frame.sim_time_start
+        self.count = k + 1
+
+        if not self.quiet:
+            self.log.info("Ingress of frame %d to tdest 0x%x at %d", frame.tid[0], frame.tdest[0], frame.sim_time_start)
+
+        if self.count == self.capacity:
+            self.flush()
+
+    def flush(self):
+        ingress = self.scoreboard.ingress
+        for tid, tdest, start_time in zip(self.tid[:self.count], self.tdest[:self.count], self.start_time[:self.count]):
+            ingress(tid, tdest.bit_length()-1, start_time)
+        self.count = 0
@@ -0,0 +1,222 @@
+"""
+
+Copyright (c) 2023 Corundum organization
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+import fcntl
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+# placeholder for the build folder while the make variables are queried
+SIM_BUILD_TOKEN = '@SIM_BUILD@'
+# variables of the Makefile that decide what gets compiled
+KEY_VARIABLES = ['SIM', 'TOPLEVEL', 'DUT', 'VERILOG_SOURCES', 'COMPILE_ARGS', 'EXTRA_ARGS', 'COCOTB_HDL_TIMEUNIT', 'COCOTB_HDL_TIMEPRECISION']
+# the file that make builds last for every simulator
+SIM_TARGETS = {'icarus': 'sim.vvp', 'verilator': 'Vtop'}
+
+cache_dir = os.getenv('SIMCACHE_DIR', 'sim_cache')
+
+
+def make_variables(make_args:str, env:dict):
+    """Values of the Makefile variables relevant for the compiled simulation."""
+    targets = ' '.join(f'print-{v}' for v in KEY_VARIABLES)
+    output = subprocess.run(f'make -s {targets} {make_args} SIM_BUILD={SIM_BUILD_TOKEN}', shell=True, env=env,
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, check=True).stdout
+
+    variables = {}
+    for line in output.splitlines():
+        name, sep, value = line.partition('=')
+        if sep and name in KEY_VARIABLES:
+            variables[name] = value.split()
+    return variables
+
+
+def wrapper_text(dut:str, radix:int):
+    """Verilog of the generated switch wrapper."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output = f'{tmp_dir}/wrapper.v'
+        subprocess.run([sys.executable, f'../rtl/{dut}_wrap.py', '-p', str(radix), str(radix), '-o', output],
+            stdout=subprocess.DEVNULL, check=True)
+        return Path(output).read_text()
+
+
+def key(make_args:str, env:dict, radix:int):
+    """
+    Content address of a compiled simulation.
+
+    The key hashes the contents of the Verilog sources, the text of the generated
+    wrapper and the compile arguments (which carry every PARAM_* value), so a
+    build can be reused whenever none of them changed.
+
+    """
+    variables = make_variables(make_args, env)
+    h = hashlib.sha256()
+
+    for name in KEY_VARIABLES:
+        # arguments pointing inside the build folder do not change what is compiled
+        values = [v for v in variables.get(name, []) if SIM_BUILD_TOKEN not in v]
+        # make lists the PARAM_* variables in no particular order
+        if name == 'COMPILE_ARGS':
+            values.sort()
+        h.update(f'{name}={" ".join(values)}\n'.encode())
+
+    for source in variables.get('VERILOG_SOURCES', []):
+        if SIM_BUILD_TOKEN in source:
+            continue
+        if os.path.isfile(source):
+            h.update(source.encode())
+            h.update(hashlib.sha256(Path(source).read_bytes()).digest())
+
+    h.update(wrapper_text(variables['DUT'][0], radix).encode())
+
+    return h.hexdigest()
+
+
+def entry(build_key:str):
+    """Build folder of a cache entry."""
+    return f'{cache_dir}/{build_key[:20]}'
+
+
+@contextmanager
+def locked(sim_build:str, shared:bool = False, blocking:bool = True):
+    """
+    Hold a lock on a cache entry: exclusive to build or remove it, shared while
+    a simulation runs from it. Without 'blocking', BlockingIOError is raised
+    if the lock is held elsewhere.
+
+    Lock files are never removed, since a process may be waiting on them.
+
+    """
+    Path(cache_dir).mkdir(parents=True, exist_ok=True)
+    with open(f'{sim_build}.lock', 'a') as lock:
+        fcntl.flock(lock, (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | (0 if blocking else fcntl.LOCK_NB))
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+@contextmanager
+def checkout(sim_build:str, sim:str, build, log=None):
+    """
+    Hold a cache entry for as long as a simulation runs from it.
+
+    A missing entry is built with 'build' (which returns the exit status of
+    make) under the exclusive lock, so concurrent runs do not build it twice;
+    then the lock is turned shared, so that runs share the entry and it is
+    not evicted under them. Turning a lock shared is not atomic, so the entry
+    is checked again and rebuilt if it was evicted in between. A failed build
+    is left to the run to report.
+
+    """
+    Path(cache_dir).mkdir(parents=True, exist_ok=True)
+    with open(f'{sim_build}.lock', 'a') as lock:
+        try:
+            while True:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                if hit(sim_build):
+                    print(f'Reusing compiled simulation {sim_build}', file=log, flush=True)
+                    freshen(sim_build, sim)
+                elif build() == 0:
+                    complete(sim_build)
+                else:
+                    break
+                fcntl.flock(lock, fcntl.LOCK_SH)
+                if hit(sim_build):
+                    break
+            touch(sim_build)
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def hit(sim_build:str):
+    """Whether the entry holds a complete build."""
+    return os.path.isfile(f'{sim_build}/.complete')
+
+
+def complete(sim_build:str):
+    Path(f'{sim_build}/.complete').touch()
+
+
+def freshen(sim_build:str, sim:str):
+    """
+    Make a cached build newer than its sources.
+
+    The contents already match the key, so make must not rebuild just because
+    a source file was touched since: generated Verilog comes first, then the
+    rest of the build, then the simulation target itself.
+
+    """
+    now = time.time()
+    target = SIM_TARGETS.get(sim)
+    for path in Path(sim_build).iterdir():
+        if path.is_file():
+            t = now if path.suffix == '.v' else now + 1
+            if path.name == target:
+                t = now + 2
+            os.utime(path, (t, t))
+
+
+def touch(sim_build:str):
+    """Mark an entry as the most recently used one."""
+    Path(f'{sim_build}/.last_used').touch()
+
+
+def size(path:Path):
+    return sum(f.stat().st_size for f in path.rglob('*') if f.is_file())
+
+
+def evict(limit:int, keep:str = None):
+    """
+    Remove least recently used entries until the cache holds at most 'limit'
+    bytes. Entries being built or simulated from are skipped.
+
+    """
+    root = Path(cache_dir)
+    if not root.is_dir():
+        return
+
+    entries = []
+    for path in root.iterdir():
+        if path.is_dir() and str(path) != str(Path(keep or '')):
+            last_used = path / '.last_used'
+            entries.append((last_used.stat().st_mtime if last_used.exists() else 0, path))
+
+    total = size(root)
+    for _, path in sorted(entries):
+        if total <= limit:
+            break
+        try:
+            with locked(str(path), blocking=False):
+                entry_size = size(path)
+                shutil.rmtree(path, ignore_errors=True)
+        except BlockingIOError:
+            continue
+        total -= entry_size
@@ -0,0 +1 @@
+from .command import stats
\ No newline at end of file
@@ -0,0 +1,125 @@
+"""
+
+Copyright (c) 2023 Corundum organization
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+import numpy as np
+
+# frame size buckets in bytes (upper limits are exclusive)
+size_edges = [64, 128, 256, 512, 1024, 1515, 9215]
+percentiles = [50, 99, 99.9]
+# times in the results files are simulation steps (10 fs) divided by 1000,
+# with a 1 ns clock period
+units_per_cycle = 100
+
+
+def load_results(output_file:str):
+    """
+    Columns of a latency results file as NumPy arrays, indexed by column name.
+
+    Older results files without some of the columns are loaded as well, those
+    columns are simply missing from the result.
+
+    """
+    with open(output_file) as f:
+        metadata_list = f.readline().strip('\n').split(",")
+        columns = f.readline().strip('\n').split(",")
+
+    # tids use all 64 bits
+    data = np.loadtxt(output_file, delimiter=',', skiprows=2, dtype=np.uint64, ndmin=2)
+    if data.shape[0] == 0:
+        data = np.zeros((0, len(columns)), dtype=np.uint64)
+
+    results = {name: data[:, k] if name == 'ID' else data[:, k].astype(np.int64) for k, name in enumerate(columns)}
+    results['metadata'] = dict(zip(metadata_list[0::2], metadata_list[1::2]))
+    return results
+
+
+def summary(latency:np.ndarray):
+    """Mean, standard deviation, extremes and percentiles of a latency array."""
+    if latency.size == 0:
+        return {'frames': 0}
+
+    result = {
+        'frames': int(latency.size),
+        'mean': float(latency.mean()),
+        'std': float(latency.std()),
+        'min': int(latency.min()),
+        'max': int(latency.max()),
+    }
+    for p, value in zip(percentiles, np.percentile(latency, percentiles)):
+        result[f'p{p:g}'] = float(value)
+    return result
+
+
+def port_matrix(input:np.ndarray, output:np.ndarray, latency:np.ndarray, radix:int):
+    """RADIX x RADIX matrices of frame count and mean latency per (input, output) pair."""
+    pair = input*radix + output
+    count = np.bincount(pair, minlength=radix*radix).reshape(radix, radix)
+    total = np.bincount(pair, weights=latency, minlength=radix*radix).reshape(radix, radix)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(count > 0, total/count, np.nan)
+    return count, mean
+
+
+def size_buckets(length:np.ndarray, latency:np.ndarray, edges=size_edges):
+    """Latency summary per frame size bucket, as (lower, upper, summary) tuples."""
+    bucket = np.digitize(length, edges)
+    bounds = [0] + list(edges) + [None]
+    buckets = []
+    for k in np.unique(bucket):
+        buckets.append((bounds[k], bounds[k+1], summary(latency[bucket == k])))
+    return buckets
+
+
+def jitter(input:np.ndarray, output:np.ndarray, tid:np.ndarray, latency:np.ndarray):
+    """
+    Latency variation.
+
+    Besides the standard deviation of all latencies, the mean absolute
+    difference between the latencies of consecutive frames of the same
+    (input, output) flow is computed (the delay variation of RFC 3550). tids
+    grow with generation order at every input, so they order each flow.
+
+    """
+    if latency.size < 2:
+        return {'std': 0.0, 'ipdv': 0.0}
+
+    order = np.lexsort((tid, output, input))
+    flow = (input*(output.max()+1) + output)[order]
+    delta = np.abs(np.diff(latency[order]))
+    same_flow = flow[1:] == flow[:-1]
+    return {
+        'std': float(latency.std()),
+        'ipdv': float(delta[same_flow].mean()) if same_flow.any() else 0.0,
+    }
+
+
+def histogram(latency:np.ndarray, bins:int = 50):
+    """Latency histogram as (counts, bin edges)."""
+    return np.histogram(latency, bins=bins)
+
+
+def cdf(latency:np.ndarray):
+    """Empirical CDF of the latency as (values, cumulative fraction)."""
+    values, counts = np.unique(latency, return_counts=True)
+    return values, np.cumsum(counts)/latency.size
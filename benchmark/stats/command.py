@@ -0,0 +1,127 @@
+"""
+
+Copyright (c) 2023 Corundum organization
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+import click
+import json
+import os
+import numpy as np
+from fairness import port_shares, output_fairness
+from stats.analysis import load_results, summary, port_matrix, size_buckets, jitter, histogram, cdf
+
+@click.command()
+@click.option('-r', default=None, type=int, help='Radix of the switch  [default: highest port in the results]')
+@click.option('--hist', default=None, type=click.Path(dir_okay=False, writable=True), help='Write the latency histogram to this CSV file')
+@click.option('--bins', default=50, show_default=True, help='Number of bins of the histogram')
+@click.option('--cdf', 'cdf_file', default=None, type=click.Path(dir_okay=False, writable=True), help='Write the latency CDF to this CSV file')
+@click.option('--sojourn', is_flag=True, help='Measure latency from the arrival of each frame (GenTime) instead of from its ingress')
+@click.argument('results')
+def stats(results:str, r:int, hist:str, bins:int, cdf_file:str, sojourn:bool):
+    """
+    Latency statistics of a benchmark.
+
+    RESULTS is a latency results file, either a path or a file name in
+    latency/results. Mean, percentiles and maximum latency are reported
+    together with the mean latency per (input, output) port pair, per frame
+    size and the latency variation (jitter). Times are in the units of the
+    results file.
+
+    The share of the frames and bytes of every output sent by each input and
+    Jain's fairness index over those inputs are reported too, with the
+    head-of-queue waits at the output arbiters if the benchmark monitored
+    them.
+
+    """
+    output_file = results if os.path.isfile(results) else f'latency/results/{results}'
+    try:
+        data = load_results(output_file)
+    except FileNotFoundError:
+        print(f'There are no latency results in {output_file}.')
+        return
+
+    latency = data['DiffTime']
+    # with arrival times, frames may wait at the source before entering the switch
+    if sojourn and 'GenTime' in data:
+        latency = data['EndTime'] - data['GenTime']
+    metadata = data['metadata']
+    print(f'Architecture {metadata.get("Architecture")}, traffic profile {metadata.get("TrafficProfile")}')
+
+    overall = summary(latency)
+    if overall['frames'] == 0:
+        print('No frames in the results.')
+        return
+
+    print(f'Frames: {overall["frames"]}')
+    print(f'Latency: mean {overall["mean"]:.2f}, p50 {overall["p50"]:.2f}, p99 {overall["p99"]:.2f}, '
+        f'p99.9 {overall["p99.9"]:.2f}, max {overall["max"]}')
+
+    variation = jitter(data['Input'], data['Output'], data['ID'], latency)
+    print(f'Jitter: standard deviation {variation["std"]:.2f}, mean delay variation between consecutive frames of a flow {variation["ipdv"]:.2f}')
+
+    radix = r or int(max(data['Input'].max(), data['Output'].max())) + 1
+    count, mean = port_matrix(data['Input'], data['Output'], latency, radix)
+    print('Mean latency per input (rows) and output (columns):')
+    print('       ' + ''.join(f'{"out"+str(k):>10}' for k in range(radix)))
+    for i in range(radix):
+        print(f'{"in"+str(i):>7}' + ''.join(f'{x:10.2f}' if count[i, j] else f'{"-":>10}' for j, x in enumerate(mean[i])))
+
+    if 'Length' in data:
+        print('Latency per frame size:')
+        for lower, upper, bucket in size_buckets(data['Length'], latency):
+            size = f'[{lower}, {upper})' if upper is not None else f'>= {lower}'
+            print(f'{size:>14} bytes: {bucket["frames"]:8} frames, mean {bucket["mean"]:.2f}, p99 {bucket["p99"]:.2f}, max {bucket["max"]}')
+
+    if 'Length' in data:
+        grants, sent = port_shares(data['Input'], data['Output'], data['Length'], radix)
+        print("Share of the frames of every output (rows) per input (columns), Jain's index of frames and bytes:")
+        print('       ' + ''.join(f'{"in"+str(k):>8}' for k in range(radix)) + f'{"Frames":>9}{"Bytes":>9}')
+        for output in output_fairness(grants, sent):
+            print(f'{"out"+str(output["output"]):>7}' + ''.join(f'{x:8.3f}' for x in output['grant_share'])
+                + f'{output["jain_grants"]:9.3f}{output["jain_bytes"]:9.3f}')
+
+    fairness = read_fairness(output_file)
+    if fairness:
+        print(f'Head-of-queue wait at the output arbiters in cycles (starved above {fairness["threshold"]}):')
+        for output in fairness['outputs']:
+            print(f'{"out"+str(output["output"]):>7}: max {max(output["max_wait"]):.1f}, mean {max(output["mean_wait"]):.1f} '
+                f'(worst input), {sum(output["starved"])} starved frames')
+
+    if hist:
+        counts, edges = histogram(latency, bins)
+        np.savetxt(hist, np.column_stack((edges[:-1], edges[1:], counts)), delimiter=',', fmt=['%g', '%g', '%d'],
+            header='BinStart,BinEnd,Count', comments='')
+        print(f'Histogram written to {hist}')
+
+    if cdf_file:
+        values, fraction = cdf(latency)
+        np.savetxt(cdf_file, np.column_stack((values, fraction)), delimiter=',', fmt=['%d', '%.6f'],
+            header='Latency,Fraction', comments='')
+        print(f'CDF written to {cdf_file}')
+
+def read_fairness(output_file:str):
+    """Arbiter measurements stored next to the results of a latency benchmark, if any."""
+    try:
+        with open(f'{output_file}.json') as file:
+            return json.load(file).get('fairness')
+    except FileNotFoundError:
+        return None
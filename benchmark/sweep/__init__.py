@@ -0,0 +1 @@
+from .command import sweep
\ No newline at end of file
@@ -0,0 +1,172 @@
+"""
+
+Copyright (c) 2023 Corundum organization
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+import click
+import itertools
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from types_arg import SwitchSuffix, switch_suffixes
+from latency.command import profile_radix, results_file, run_latency
+
+try:
+    import tomllib
+except ImportError:
+    import tomli as tomllib
+
+@click.command()
+@click.option('-a', multiple=True, type=SwitchSuffix(), help='Architecture suffix to sweep (repeatable)')
+@click.option('-r', multiple=True, type=int, help='Radix of the switch to sweep (repeatable)')
+@click.option('-d', multiple=True, type=int, help='Width of the data bus in bits to sweep (repeatable)')
+@click.option('-f', multiple=True, help='Traffic profile file name to sweep (repeatable)')
+@click.option('-s', '--spec', type=click.Path(exists=True, dir_okay=False), help='TOML file with the lists of architectures, radices, data_widths and profiles')
+@click.option('-j', '--jobs', default=os.cpu_count(), show_default=True, help='Maximum number of configurations simulated at the same time')
+@click.option('-n', '--name', default=None, help='Name of the sweep  [default: current date and time]')
+@click.option('--cache/--no-cache', default=True, show_default=True, help='Reuse compiled simulations with the same sources and parameters')
+@click.option('--cache-size', default=4096, show_default=True, help='Size limit of the compiled simulation cache in MB')
+def sweep(a:tuple, r:tuple, d:tuple, f:tuple, spec:str, jobs:int, name:str, cache:bool, cache_size:int):
+    """
+    Parameter sweep of latency benchmarks.
+
+    Latency benchmarks are run for every combination of architecture, radix,
+    data width and traffic profile given, either as options or in a TOML sweep
+    specification such as:
+
+    \b
+    architectures = ["iq", "iq_voq", "oq"]
+    radices = [4, 8]
+    data_widths = [64, 512]
+    profiles = ["uniform-4x4-100-(64-1514).txt", "uniform-8x8-100-(64-1514).txt"]
+
+    Profiles only run with the radix they were generated for. Configurations
+    run concurrently, each one in its own simulation build and results
+    folder under sweep/results/<name>, and a merged summary is written at the end.
+
+    """
+    architectures, radices, data_widths, profiles = list(a), list(r), list(d), list(f)
+
+    if spec:
+        with open(spec, 'rb') as file:
+            spec_dict = tomllib.load(file)
+        architectures += spec_dict.get('architectures', [])
+        radices += spec_dict.get('radices', [])
+        data_widths += spec_dict.get('data_widths', [])
+        profiles += spec_dict.get('profiles', [])
+
+    architectures = architectures or switch_suffixes
+    data_widths = data_widths or [64]
+
+    for architecture in architectures:
+        if architecture not in switch_suffixes:
+            raise click.BadParameter(f'{architecture!r} is not a valid switch architecture suffix.')
+
+    if not profiles:
+        raise click.UsageError('At least one traffic profile is required.')
+
+    profile_paths = {}
+    for profile in profiles:
+        file_path = profile if os.path.isfile(profile) else f'traffic/profiles/{profile}'
+        if not os.path.isfile(file_path):
+            raise click.BadParameter(f'{profile!r} is not a traffic profile.')
+        profile_paths[profile] = file_path
+
+    configs = []
+    for architecture, data_width, profile in itertools.product(architectures, data_widths, profiles):
+        file_path = profile_paths[profile]
+        # a traffic profile only makes sense for the radix it was generated for
+        radix = profile_radix(file_path)
+        if radices and radix not in radices:
+            continue
+        configs.append((architecture, radix, data_width, file_path))
+
+    if not configs:
+        print('No configuration matches the sweep specification.')
+        return
+
+    name = name or time.strftime("%Y%m%d-%H%M%S")
+    sweep_dir = f'sweep/results/{name}'
+    Path(sweep_dir).mkdir(parents=True, exist_ok=True)
+
+    print(f'Starting sweep {name}: {len(configs)} configurations, {min(jobs, len(configs))} at a time.')
+
+    results = {}
+    failed = set()
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {executor.submit(run_config, sweep_dir, *config, cache, cache_size): config for config in configs}
+        for future in as_completed(futures):
+            config = futures[future]
+            # a configuration that cannot run does not stop the rest of the sweep
+            try:
+                output_file, status, wall_time = future.result()
+            except Exception as e:
+                failed.add(config)
+                print(f'{config_name(*config)}: failed ({type(e).__name__}: {e})')
+                continue
+            results[config] = output_file
+            if status != 0:
+                failed.add(config)
+            print(f'{config_name(*config)}: {"finished" if status == 0 else "failed"} in {wall_time:.1f} s')
+
+    summary_file = f'{sweep_dir}/summary.csv'
+    with open(summary_file, 'w') as file:
+        file.write('Architecture,Radix,DataWidth,Profile,Status,Frames,MinLatency,MeanLatency,MaxLatency\n')
+        for config in configs:
+            architecture, radix, data_width, file_path = config
+            status = 'failed' if config in failed else 'finished'
+            latencies = read_latencies(results[config]) if config in results else []
+            if latencies:
+                file.write(f'{architecture},{radix},{data_width},{os.path.basename(file_path)},{status},{len(latencies)},'
+                    f'{min(latencies)},{sum(latencies)/len(latencies):.3f},{max(latencies)}\n')
+            else:
+                file.write(f'{architecture},{radix},{data_width},{os.path.basename(file_path)},{status},0,,,\n')
+
+    print(f'Finished sweep {name}, summary in {summary_file}' + (f' ({len(failed)} configurations failed)' if failed else ''))
+
+def config_name(architecture:str, radix:int, data_width:int, file_path:str):
+    # folder names end up in make targets, where parentheses and spaces are not allowed
+    return re.sub(r'[^\w.-]', '_', f'{architecture}-{data_width}-{radix}x{radix}-{os.path.basename(file_path)}')
+
+def run_config(sweep_dir:str, architecture:str, radix:int, data_width:int, file_path:str, cache:bool, cache_size:int):
+    """Run one configuration of the sweep in its own folder (executed by a worker process)."""
+    config_dir = f'{sweep_dir}/{config_name(architecture, radix, data_width, file_path)}'
+    Path(config_dir).mkdir(parents=True, exist_ok=True)
+
+    start = time.monotonic()
+    with open(f'{config_dir}/sim.log', 'w') as log:
+        status = run_latency(architecture, radix, data_width, file_path, sim_build=f'{config_dir}/sim_build',
+            results_dir=config_dir, waves=False, log=log, cache=cache, cache_size=cache_size)
+
+    return results_file(architecture, data_width, file_path, config_dir), status, time.monotonic() - start
+
+def read_latencies(output_file:str):
+    """DiffTime column of a latency results file."""
+    try:
+        with open(output_file) as file:
+            file.readline()
+            file.readline()
+            return [int(line.split(",")[4]) for line in file if line.strip()]
+    except FileNotFoundError:
+        return []
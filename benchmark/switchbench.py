@@ -26,6 +26,14 @@ import click
 
 from latency import latency
 from traffic import traffic
+from throughput import throughput
+from sweep import sweep
+from stats import stats
+from convert import convert
+from runs import runs
+from compare import compare
+from loadcurve import loadcurve
+from model import model
 
 @click.group()
 @click.pass_context
@@ -35,6 +43,14 @@ def switchbench(ctx: click.Context):
 
 switchbench.add_command(traffic)
 switchbench.add_command(latency)
+switchbench.add_command(throughput)
+switchbench.add_command(sweep)
+switchbench.add_command(stats)
+switchbench.add_command(convert)
+switchbench.add_command(runs)
+switchbench.add_command(compare)
+switchbench.add_command(loadcurve)
+switchbench.add_command(model)
 
 if __name__ == '__main__':
     switchbench()
\ No newline at end of file
@@ -0,0 +1,141 @@
+"""
+
+Copyright (c) 2023 Corundum organization
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+import numpy as np
+import pytest
+
+import profile_io
+
+
+timed_rows = [(0, 1, 64, 0), (0, 3, 1514, 64), (1, 0, 594, 0), (2, 2, 9000, 70000), (3, 1, 64, 2**33)]
+untimed_rows = [(0, 1, 64), (1, 0, 1514), (1, 1, 594), (3, 2, 64)]
+
+
+def write_profile(path, rows, timed=True):
+    with open(path, 'w') as f:
+        f.write('Test,custom,Radix,4,Seed,1\n')
+        f.write('Input,Output,Length,Time\n' if timed else 'Input,Output,Length\n')
+        f.writelines(f'{",".join(map(str, row))}\n' for row in rows)
+
+
+@pytest.mark.parametrize("rows, timed", [(timed_rows, True), (untimed_rows, False)])
+def test_round_trip(tmp_path, rows, timed):
+    csv_file = str(tmp_path / 'profile.txt')
+    bin_file = str(tmp_path / 'profile.bin')
+    back_file = str(tmp_path / 'back.txt')
+    write_profile(csv_file, rows, timed)
+
+    assert profile_io.convert(csv_file, bin_file) == len(rows)
+    assert profile_io.convert(bin_file, back_file) == len(rows)
+
+    expected = [row if timed else (*row, None) for row in rows]
+    for path in [csv_file, bin_file, back_file]:
+        assert list(profile_io.iter_frames(path)) == expected
+        assert profile_io.count_frames(path) == len(rows)
+        metadata, columns, offset = profile_io.read_header(path)
+        assert metadata == ['Test', 'custom', 'Radix', '4', 'Seed', '1']
+        assert columns == ['Input', 'Output', 'Length'] + (['Time'] if timed else [])
+    assert open(back_file).read() == open(csv_file).read()
+
+
+def test_binary_layout(tmp_path):
+    csv_file = str(tmp_path / 'profile.txt')
+    bin_file = str(tmp_path / 'profile.bin')
+    write_profile(csv_file, timed_rows)
+    profile_io.convert(csv_file, bin_file)
+
+    # records start aligned and use the smallest type holding every column
+    metadata, columns, offset = profile_io.read_header(bin_file)
+    assert offset % profile_io.alignment == 0
+    dtype = profile_io.binary_dtype(bin_file)
+    assert [dtype[name].itemsize for name in dtype.names] == [1, 1, 2, 8]
+    assert isinstance(profile_io.load_frames(bin_file), np.memmap)
+
+
+def test_input_filter(tmp_path):
+    csv_file = str(tmp_path / 'profile.txt')
+    bin_file = str(tmp_path / 'profile.bin')
+    write_profile(csv_file, timed_rows)
+    profile_io.convert(csv_file, bin_file)
+
+    for path in [csv_file, bin_file]:
+        assert list(profile_io.iter_frames(path, 0)) == timed_rows[:2]
+        assert list(profile_io.iter_frames(path, 1)) == timed_rows[2:3]
+        assert list(profile_io.iter_frames(path, 5)) == []
+
+
+def test_chunks(tmp_path, monkeypatch):
+    # binary profiles are read a chunk at a time
+    monkeypatch.setattr(profile_io, 'chunk_size', 2)
+    rows = [(k % 4, (k*7) % 4, 64 + k, 100*k) for k in range(11)]
+    csv_file = str(tmp_path / 'profile.txt')
+    bin_file = str(tmp_path / 'profile.bin')
+    write_profile(csv_file, rows)
+    profile_io.convert(csv_file, bin_file)
+    assert list(profile_io.iter_frames(bin_file)) == rows
+    assert list(profile_io.iter_frames(bin_file, 3)) == [row for row in rows if row[0] == 3]
+
+
+def test_empty_profile(tmp_path):
+    csv_file = str(tmp_path / 'profile.txt')
+    bin_file = str(tmp_path / 'profile.bin')
+    write_profile(csv_file, [])
+    profile_io.write_binary(bin_file, profile_io.read_header(csv_file)[0],
+        np.zeros(0, dtype=profile_io.frames_dtype(['Input', 'Output', 'Length', 'Time'])))
+    assert profile_io.count_frames(bin_file) == 0
+    assert list(profile_io.iter_frames(bin_file)) == []
+
+
+def test_results_name():
+    assert profile_io.results_name('traffic/profiles/uniform-4x4-100-(64-1514).bin') == 'uniform-4x4-100-(64-1514).txt'
+    assert profile_io.results_name('traffic/profiles/uniform-4x4-100-(64-1514).txt') == 'uniform-4x4-100-(64-1514).txt'
+
+
+@pytest.mark.parametrize("grouped", [True, False])
+def test_input_runs(tmp_path, monkeypatch, grouped):
+    monkeypatch.setattr(profile_io, 'chunk_size', 3)
+    rows = [(k % 4, (k*5) % 4, 64 + k, 10*k) for k in range(13)]
+    if grouped:
+        # one input at a time, as generated profiles
+        rows.sort(key=lambda row: row[0])
+    csv_file = str(tmp_path / 'profile.txt')
+    bin_file = str(tmp_path / 'profile.bin')
+    write_profile(csv_file, rows)
+    profile_io.convert(csv_file, bin_file)
+
+    for path in [csv_file, bin_file]:
+        runs = profile_io.input_runs(path, 4)
+        assert [len(input_runs)//2 for input_runs in runs] == [1]*4 if grouped else [4, 3, 3, 3]
+        for input in range(4):
+            assert list(profile_io.iter_runs(path, runs[input])) == [row for row in rows if row[0] == input]
+
+
+def test_input_runs_blank_lines(tmp_path):
+    csv_file = str(tmp_path / 'profile.txt')
+    write_profile(csv_file, timed_rows)
+    with open(csv_file, 'a') as f:
+        f.write('\n')
+    runs = profile_io.input_runs(csv_file, 2)
+    assert list(profile_io.iter_runs(csv_file, runs[0])) == timed_rows[:2]
+    assert list(profile_io.iter_runs(csv_file, runs[1])) == timed_rows[2:3]
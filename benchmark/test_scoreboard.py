@@ -0,0 +1,190 @@
+"""
+
+Copyright (c) 2023 Corundum organization
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+import io
+import random
+
+import pytest
+
+from scoreboard import BatchMeans, Scoreboard, IngressRecorder
+
+
+class Frame:
+    """Ingress event as handed over by the AXI stream source."""
+
+    def __init__(self, tid, output, sim_time_start):
+        self.tid = [tid]
+        self.tdest = [1 << output]
+        self.sim_time_start = sim_time_start
+
+
+def results(scoreboard):
+    """tid of every frame written to the results."""
+    return [int(line.split(",")[5]) for line in scoreboard.results.getvalue().splitlines()]
+
+
+def test_batch_means_converges():
+    random.seed(1)
+    estimate = BatchMeans(batch_size=100, precision=0.01)
+    for k in range(100000):
+        estimate.add(random.gauss(500, 50))
+        if estimate.converged():
+            break
+    assert estimate.converged()
+    assert len(estimate.means) >= estimate.min_batches
+    assert estimate.mean() == pytest.approx(500, rel=0.01)
+    assert estimate.half_width() <= 0.01*estimate.mean()
+
+
+def test_batch_means_merges_correlated_batches():
+    # a slow ramp makes adjacent batch means strongly correlated
+    estimate = BatchMeans(batch_size=10, precision=1e-9, min_batches=4)
+    for k in range(800):
+        estimate.add(k)
+    assert estimate.batch_size > 10
+    assert len(estimate.means) < 8*4
+
+
+def test_batch_means_needs_batches():
+    estimate = BatchMeans(batch_size=10, precision=1.0)
+    for k in range(10*19):
+        estimate.add(100)
+    assert not estimate.converged()
+    assert estimate.half_width() == 0
+    for k in range(10):
+        estimate.add(100)
+    assert estimate.converged()
+
+
+def test_join_in_any_order():
+    scoreboard = Scoreboard(io.StringIO())
+    scoreboard.generate(1, 0, 2, 64, 1000)
+    scoreboard.generate(2, 1, 3, 64, 1000)
+    scoreboard.egress(2, 3, 9000)
+    scoreboard.ingress(1, 2, 2000)
+    scoreboard.ingress(2, 3, 3000)
+    scoreboard.egress(1, 2, 8000)
+    assert scoreboard.close()
+    assert results(scoreboard) == [2, 1]
+    assert scoreboard.results.getvalue().splitlines()[0] == '1,3,3,9,6,2,64,1'
+
+
+def test_mismatches():
+    scoreboard = Scoreboard(io.StringIO())
+    scoreboard.generate(1, 0, 2, 64)
+    scoreboard.generate(2, 0, 2, 64)
+    scoreboard.generate(3, 0, 2, 64)
+    scoreboard.ingress(1, 2, 10)
+    scoreboard.egress(1, 1, 20)
+    scoreboard.ingress(2, 2, 10)
+    scoreboard.egress(7, 0, 30)
+    scoreboard.mismatch(3, 'payload differs')
+    assert not scoreboard.close()
+    # wrong output, unknown frame, the reported one, never left, never entered
+    assert [tid for tid, reason in scoreboard.mismatches] == [1, 7, 3, 2, 3]
+    assert scoreboard.completed == 0
+
+
+def run(scoreboard, events):
+    """Generate, enter and leave frames given as (tid, input, gen_time, start_time, end_time)."""
+    for tid, input, gen_time, start_time, end_time in events:
+        scoreboard.generate(tid, input, 0, 64, gen_time or 0, timed=gen_time is not None)
+    for tid, input, gen_time, start_time, end_time in sorted(events, key=lambda event: event[3]):
+        scoreboard.ingress(tid, 0, start_time)
+    for tid, input, gen_time, start_time, end_time in events:
+        scoreboard.egress(tid, 0, end_time)
+    assert scoreboard.close()
+
+
+def test_warmup_cycles_of_untimed_frames():
+    # frames without arrival times are all generated at the start of the run,
+    # the ingress time counts instead
+    scoreboard = Scoreboard(io.StringIO(), warmup_until=5000)
+    run(scoreboard, [(k, 0, None, 1000*k, 1000*k + 500) for k in range(1, 11)])
+    assert results(scoreboard) == list(range(5, 11))
+    assert scoreboard.discarded == 4
+
+
+def test_warmup_cycles_of_timed_frames():
+    # the arrival time counts, however late the frame enters the switch
+    scoreboard = Scoreboard(io.StringIO(), warmup_until=5000)
+    run(scoreboard, [(k, 0, 1000*k, 9000 + k, 20000) for k in range(1, 11)])
+    assert results(scoreboard) == list(range(5, 11))
+
+
+def test_warmup_and_drain_across_inputs():
+    # profiles list one input after the other, the switch interleaves them
+    scoreboard = Scoreboard(io.StringIO(), warmup_frames=2, drain_from=6)
+    events = [(10*input + k, input, 0, 4*k + input, 100) for input in range(2) for k in range(4)]
+    run(scoreboard, events)
+    # entering order: 0, 10, 1, 11, 2, 12, 3, 13
+    assert sorted(results(scoreboard)) == [1, 2, 11, 12]
+    assert scoreboard.discarded == 4
+
+
+def test_converges_with_ingress_flushed_on_egress():
+    scoreboard = Scoreboard(io.StringIO(), batch_means=BatchMeans(batch_size=10, precision=0.05))
+    recorder = IngressRecorder(scoreboard, capacity=65536)
+    random.seed(2)
+    frames = 50000
+    for tid in range(frames):
+        if scoreboard.converged:
+            break
+        scoreboard.generate(tid, 0, 1, 64, 1000*tid)
+        recorder.record(Frame(tid, 1, 1000*tid))
+        # as the bench does when converging
+        recorder.flush()
+        scoreboard.egress(tid, 1, 1000*tid + 1000*random.randint(90, 110))
+    assert scoreboard.converged
+    assert scoreboard.completed < frames
+    assert scoreboard.close()
+
+
+def test_frames_after_convergence_are_discarded():
+    scoreboard = Scoreboard(io.StringIO(), batch_means=BatchMeans(batch_size=1, precision=1.0, min_batches=2))
+    for tid in range(4):
+        scoreboard.generate(tid, 0, 0, 64, 0)
+    for tid in range(3):
+        scoreboard.ingress(tid, 0, 10*tid)
+    scoreboard.egress(0, 0, 100)
+    scoreboard.egress(1, 0, 100)
+    assert scoreboard.converged
+    # frames already in the switch are measured, those entering later are not
+    scoreboard.ingress(3, 0, 110)
+    scoreboard.egress(2, 0, 120)
+    scoreboard.egress(3, 0, 130)
+    assert scoreboard.close()
+    assert results(scoreboard) == [0, 1, 2]
+    assert scoreboard.discarded == 1
+
+
+def test_recorder_buffers_until_full():
+    scoreboard = Scoreboard(io.StringIO())
+    recorder = IngressRecorder(scoreboard, capacity=4)
+    for tid in range(6):
+        scoreboard.generate(tid, 0, 3, 64)
+        recorder.record(Frame(tid, 3, 100*tid))
+    assert [record.start_time for record in scoreboard.records.values()] == [0, 100, 200, 300, None, None]
+    recorder.flush()
+    assert all(record.in_output == 3 for record in scoreboard.records.values())
@@ -0,0 +1 @@
+from .command import throughput
\ No newline at end of file
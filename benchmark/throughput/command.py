@@ -0,0 +1,151 @@
+"""
+
+Copyright (c) 2023 Corundum organization
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+import click
+import os
+from pathlib import Path
+from subprocess import call
+from types_arg import SwitchSuffix
+
+import results_db
+
+default_loads = [0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0]
+
+@click.command()
+@click.option('-r', default=4, show_default=True, help='Radix of the switch')
+@click.option('-d', default=8, show_default=True, help='Width of the data bus in bits')
+@click.option('-l', default=64, show_default=True, help='Size of the frames in bytes')
+@click.option('-c', default=10000, show_default=True, help='Number of measured clock cycles per offered load')
+@click.option('-w', default=2000, show_default=True, help='Number of warm-up clock cycles per offered load')
+@click.option('--load', multiple=True, type=click.FloatRange(0, 1, min_open=True), help='Offered load as a fraction of the line rate (repeatable)  [default: 0.1 to 1.0 in steps of 0.1]')
+@click.option('--tolerance', default=0.02, show_default=True, help='Offered minus accepted load above which an input counts as saturated')
+@click.option('--occupancy', default=0, show_default=True, type=click.IntRange(0), help='Sample the occupancy of every queue each this many measured cycles (0 does not sample)')
+@click.option('--starvation', default=0, show_default=True, type=click.IntRange(0), help='Monitor the output arbiters and flag head-of-queue waits above this many cycles (0 does not monitor)')
+@click.option('--links', default=0, show_default=True, type=click.IntRange(0), help='Monitor every port and sample its utilization each this many measured cycles (0 does not monitor)')
+@click.argument('architecture', type=SwitchSuffix())
+def throughput(architecture:str, r:int, d:int, l:int, c:int, w:int, load:tuple, tolerance:float, occupancy:int, starvation:int,
+        links:int):
+    """
+    Saturation throughput benchmarking.
+
+    Every input port is driven with Bernoulli arrivals of 'l' byte frames at the
+    offered load(s) given, destinations taken uniformly at random. For each load
+    the accepted load per input and output port and the aggregate throughput are
+    reported as a fraction of the line rate, together with the saturation point
+    of the architecture. Above saturation, frames arriving while a few are
+    already waiting at an input are dropped and counted as offered but not
+    accepted, so the backlog does not grow with the measurement. With 'occupancy', the peak queue occupancy and the
+    smallest FIFO_DEPTH_CYCLES that would have avoided backpressure are logged
+    for each load and kept in the results database.
+
+    Jain's fairness index of the frames and bytes each output accepts from
+    the inputs offering it traffic is logged and stored for every load. With
+    'starvation', the output arbiters are monitored every cycle and the
+    longest head-of-queue wait and the starved frames are stored as well.
+    With 'links', the utilization, bus efficiency and stall ratio of every
+    port are logged and stored, and a utilization time series is written
+    next to the results for each load.
+
+    """
+    loads = sorted(load) if load else default_loads
+
+    dir_file = 'throughput/results'
+    output_file = f'{dir_file}/{architecture}-{d}-{r}x{r}-{l}.txt'
+    Path(dir_file).mkdir(parents=True, exist_ok=True)
+
+    # the file holds the latest run, every run is kept in the results database
+    if Path(output_file).exists():
+        print(f'Replacing previous results for {architecture} switch architecture in {output_file}.')
+        Path(output_file).unlink()
+
+    os.environ['ARCHITECTURE'] = architecture
+    os.environ['DATA_WIDTH'] = str(d)
+    os.environ['FRAME_LENGTH'] = str(l)
+    os.environ['WARMUP_CYCLES'] = str(w)
+    os.environ['MEASURE_CYCLES'] = str(c)
+    os.environ['OCCUPANCY_INTERVAL'] = str(occupancy)
+    os.environ['STARVATION_THRESHOLD'] = str(starvation)
+    os.environ['LINK_INTERVAL'] = str(links)
+    os.environ['THROUGHPUT_FILE'] = output_file
+    os.environ['RESULTS_DB'] = os.path.abspath(results_db.db_file)
+    print('Starting throughput benchmark.')
+    call(f'make clean SUFFIX={architecture} DATA_WIDTH={d} RADIX={r}', shell=True)
+    for offered in loads:
+        os.environ['OFFERED_LOAD'] = str(offered)
+        call(f'make SUFFIX={architecture} DATA_WIDTH={d} RADIX={r} MODULE={"bench_switch_throughput"}', shell=True)
+    print('Finished throughput benchmark.')
+
+    report(output_file, tolerance)
+
+def read_throughput(output_file:str):
+    """
+    Metadata, aggregate and per-port loads of a throughput results file.
+
+    Aggregate loads are (input, output) tuples indexed by offered load, per-port
+    loads lists of (port, input, output) tuples indexed by offered load.
+
+    """
+    with open(output_file) as f:
+        metadata_list = f.readline().strip('\n').split(",")
+        f.readline()
+        rows = [line.strip('\n').split(",") for line in f if line.strip()]
+
+    aggregate = {}
+    ports = {}
+    for offered, port, input_load, output_load in rows:
+        if port == 'all':
+            aggregate[float(offered)] = (float(input_load), float(output_load))
+        else:
+            ports.setdefault(float(offered), []).append((int(port), float(input_load), float(output_load)))
+    return metadata_list, aggregate, ports
+
+def saturation(aggregate:dict, tolerance:float):
+    """Saturation point (None if the switch never saturated) and saturation throughput of the aggregate loads."""
+    # the saturation point is the lowest offered load the switch could not keep up with
+    saturated = [offered for offered in sorted(aggregate) if offered - aggregate[offered][0] > tolerance]
+    return (saturated[0] if saturated else None), max(x[1] for x in aggregate.values())
+
+def report(output_file:str, tolerance:float):
+    """Print accepted load per port and the saturation point of a throughput results file."""
+    try:
+        metadata_list, aggregate, ports = read_throughput(output_file)
+    except FileNotFoundError:
+        print(f'There are no throughput results in {output_file}.')
+        return
+
+    radix = int(metadata_list[3])
+    print(f'Architecture {metadata_list[1]}, radix {radix}, {metadata_list[5]} bit data bus, {metadata_list[7]} byte frames')
+    print(f'{"Offered":>8} {"Accepted":>9} {"Output":>8}   ' + ' '.join(f'{"in"+str(k)+"/out"+str(k):>11}' for k in range(radix)))
+    for offered in sorted(aggregate):
+        per_port = ' '.join(f'{i:5.3f}/{o:5.3f}' for _, i, o in sorted(ports.get(offered, [])))
+        print(f'{offered:8.3f} {aggregate[offered][0]:9.3f} {aggregate[offered][1]:8.3f}   {per_port}')
+
+    if not aggregate:
+        return
+
+    saturation_point, saturation_throughput = saturation(aggregate, tolerance)
+    if saturation_point is not None:
+        print(f'Saturation point: offered load {saturation_point:.3f}, saturation throughput {saturation_throughput:.3f} of the line rate')
+    else:
+        print(f'No saturation up to offered load {max(aggregate):.3f}, maximum throughput {saturation_throughput:.3f} of the line rate')
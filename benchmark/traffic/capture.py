@@ -0,0 +1,128 @@
+"""
+
+Copyright (c) 2023 Corundum organization
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+from scapy.utils import RawPcapReader
+
+# ethertypes of 802.1Q and 802.1ad tags
+vlan_ethertypes = [0x8100, 0x88a8]
+mapping_keys = ['smac', 'dmac', 'ivlan', 'ovlan']
+
+
+def read_mapping(map_file:str, r:int):
+    """
+    Port mapping of a capture from a CSV file.
+
+    Each line holds a key, a value and a port: 'smac' and 'ivlan' map a source
+    MAC address or VLAN ID to an input port, 'dmac' and 'ovlan' a destination
+    MAC address or VLAN ID to an output port.
+
+    """
+    mapping = {key: {} for key in mapping_keys}
+    with open(map_file) as f:
+        for line in f:
+            if not line.strip() or line.startswith('#'):
+                continue
+            key, value, port = [x.strip() for x in line.strip('\n').split(",")[:3]]
+            if key not in mapping_keys:
+                # header line
+                if any(mapping.values()) or key.lower() != 'key':
+                    raise ValueError(f'{map_file}: {key!r} is not one of {", ".join(mapping_keys)}')
+                continue
+            if not 0 <= int(port) < r:
+                raise ValueError(f'{map_file}: port {port} is not lower than the radix {r}')
+            mapping[key][value.lower() if key.endswith('mac') else int(value, 0)] = int(port)
+
+    if not (mapping['smac'] or mapping['ivlan']) or not (mapping['dmac'] or mapping['ovlan']):
+        raise ValueError(f'{map_file} must map at least one input and one output port')
+    return mapping
+
+
+def read_capture(capture:str):
+    """
+    Stream the frames of a pcap or pcapng capture.
+
+    Yields the timestamp in seconds, the length on the wire and the first bytes
+    of every frame, one at a time, so captures of any size can be read.
+
+    """
+    with RawPcapReader(capture) as reader:
+        linktype = getattr(reader, 'linktype', 1)
+        nano = getattr(reader, 'nano', False)
+        for data, meta in reader:
+            if hasattr(meta, 'tsresol'):
+                # pcapng
+                if meta.linktype != 1 or meta.tshigh is None:
+                    continue
+                timestamp = ((meta.tshigh << 32) | meta.tslow)/meta.tsresol
+            else:
+                if linktype != 1:
+                    raise ValueError(f'{capture} is not an Ethernet capture')
+                timestamp = meta.sec + meta.usec*(1e-9 if nano else 1e-6)
+            yield timestamp, meta.wirelen, data
+
+
+def ports(data:bytes, mapping:dict):
+    """Input and output ports of a frame (None if not mapped)."""
+    dst = data[0:6].hex(':')
+    src = data[6:12].hex(':')
+    vid = None
+    if len(data) >= 16 and int.from_bytes(data[12:14], 'big') in vlan_ethertypes:
+        vid = int.from_bytes(data[14:16], 'big') & 0xfff
+
+    input = mapping['smac'].get(src, mapping['ivlan'].get(vid))
+    output = mapping['dmac'].get(dst, mapping['ovlan'].get(vid))
+    return input, output
+
+
+def replay(capture:str, mapping:dict, r:int, line_rate:float, min_length:int, max_frames:int, f):
+    """
+    Write the frames of a capture as a timed traffic profile.
+
+    Timestamps are converted to bytes at the 'line_rate' (Gbps) of the
+    captured link, so each port keeps the load it had in the capture, and a
+    frame never starts before the previous one of the same input port ends.
+    Frames shorter than 'min_length' are padded. Returns the number of frames
+    written per input port and the number of frames skipped.
+
+    """
+    frames = [0]*r
+    skipped = 0
+    port_end = [0]*r
+    start = None
+    for timestamp, length, data in read_capture(capture):
+        input, output = ports(data, mapping)
+        if input is None or output is None or (max_frames and frames[input] >= max_frames):
+            skipped += 1
+            continue
+
+        if start is None:
+            start = timestamp
+        length = max(length, min_length)
+        time = max(int((timestamp - start)*line_rate*1e9/8), port_end[input])
+        port_end[input] = time + length
+        frames[input] += 1
+
+        f.write(f'{input},{output},{length},{time}\n')
+
+    return frames, skipped
@@ -23,54 +23,178 @@ THE SOFTWARE.
 """
 
 import click
+import itertools
+import math
 import os
 import random
 import time
 
 from pathlib import Path
 from subprocess import call
-from types_arg import TrafficType
+from types_arg import TrafficType, ArrivalProcess, TrafficPattern, PortValues, SizeMix
+from .patterns import rate_matrix
+from .sizes import imixes, load_cdf
+from .capture import read_mapping, replay
 
 @click.command()
 @click.option('-r', default=4, show_default=True, help='Radix of the switch')
 @click.option('-n', default=100, show_default=True, help='Number of frames to send per port')
 @click.option('-l', default=64, show_default=True, help='Lower (exact) size limit of the payload in bytes')
 @click.option('-u', default=1514, show_default=True, help='Upper size limit of the payload in bytes')
+@click.option('--imix', 'imix_name', default='simple', show_default=True, type=click.Choice(list(imixes)), help='IMIX of the imix traffic')
+@click.option('--small-fraction', default=0.5, show_default=True, type=click.FloatRange(0, 1), help="Fraction of 'l' size frames of the bimodal traffic")
+@click.option('--mix', default=None, type=SizeMix(), help='Frame sizes and weights of the mix traffic, as SIZE:WEIGHT,SIZE:WEIGHT,...')
+@click.option('--cdf', 'cdf_file', default=None, type=click.Path(exists=True, dir_okay=False), help='CSV file with the frame size CDF of the cdf traffic (size,cumulative probability per line)')
+@click.option('--load', default=1.0, show_default=True, type=click.FloatRange(0, 1, min_open=True), help='Offered load per input port as a fraction of the line rate')
+@click.option('--arrival', default='none', show_default=True, type=ArrivalProcess(), help="Arrival process of the frames: 'none' (back-to-back, no arrival times), 'bernoulli', 'poisson', 'fixed' (constant gaps) or 'onoff' (bursts)")
+@click.option('--burst-length', default='8', show_default=True, type=PortValues(), help='Mean number of frames per burst of the onoff process, for all ports or one per port (comma separated)')
+@click.option('--idle-length', default=None, type=PortValues(), help='Mean idle bytes between bursts of the onoff process, for all ports or one per port (comma separated)  [default: set by --load]')
+@click.option('--correlated/--no-correlated', default=False, show_default=True, help='Send all the frames of an onoff burst to the same output')
+@click.option('-p', '--pattern', default='uniform', show_default=True, type=TrafficPattern(), help="Destination pattern: 'uniform', 'hotspot', 'incast', 'permutation', 'transpose', 'bitreverse', 'diagonal', 'logdiagonal' or a rate 'matrix' file")
+@click.option('--hotspot-port', default=0, show_default=True, help='Output port receiving the extra traffic of the hotspot pattern')
+@click.option('--hotspot-fraction', default=0.5, show_default=True, type=click.FloatRange(0, 1), help='Fraction of the traffic sent to the hotspot port')
+@click.option('--incast-target', default=0, show_default=True, help='Output port targeted by the incast pattern')
+@click.option('--incast-sources', default=None, type=click.IntRange(1), help='Number of inputs sending to the incast target  [default: all other inputs]')
+@click.option('--matrix', 'matrix_file', default=None, type=click.Path(exists=True, dir_okay=False), help='CSV file with a RADIX x RADIX rate matrix for the matrix pattern')
+@click.option('--map', 'map_file', default=None, type=click.Path(exists=True, dir_okay=False), help='CSV file mapping the MAC addresses or VLAN IDs of a capture to ports (key,value,port per line)')
+@click.option('--line-rate', default=10.0, show_default=True, type=click.FloatRange(0, min_open=True), help='Line rate of the captured link in Gbps')
+@click.option('--seed', default=None, type=int, help='Seed of the random generator, stored in the profile and, when given, in its name  [default: random]')
 @click.argument('test', type=TrafficType())
-def traffic(test:str, r:int, n: int, l: int, u:int):
+@click.argument('capture', required=False, type=click.Path(exists=True, dir_okay=False))
+def traffic(test:str, capture:str, map_file:str, line_rate:float, seed:int, r:int, n: int, l: int, u:int, imix_name:str, small_fraction:float, mix:list, cdf_file:str, load:float, arrival:str, burst_length:list, idle_length:list, correlated:bool, pattern:str, hotspot_port:int,
+        hotspot_fraction:float, incast_target:int, incast_sources:int, matrix_file:str):
     """
     Traffic generation.
 
     The type of the traffic to be generated must be specified:
     'custom' size for frames of equal 'l' size, 'min'imum size for frames of fixed 64 Bytes,
-    'max'imum size for frames of fixed 1514 Bytes or 'uniform' for frames with sizes taken from a
-    uniform distribution ['l', 'u'].
+    'max'imum size for frames of fixed 1514 Bytes, 'uniform' for frames with sizes taken from a
+    uniform distribution ['l', 'u'], 'imix' for a standard IMIX: the 'simple' one (64, 594 and
+    1514 Bytes in a 7:4:1 ratio), 'simple576' (the same with 576 Byte frames), 'tolly' (64, 78,
+    576 and 1514 Bytes in a 55:5:17:23 ratio) or 'jumbo' (the simple one plus 9000 Byte frames
+    in a 7:4:1:1 ratio), 'bimodal' for a 'small-fraction' of 'l' size frames and the rest of 'u' size, 'mix'
+    for a weighted mix of sizes or 'cdf' for sizes taken from an empirical distribution file.
+    Sizes are drawn independently for each input port.
+
+    'pcap' replays the CAPTURE file (pcap or pcapng, streamed frame by frame)
+    keeping the sizes and inter-arrival times of its frames. The '--map' file
+    assigns frames to ports with lines of the form 'smac,<MAC>,<input>',
+    'dmac,<MAC>,<output>', 'ivlan,<VID>,<input>' or 'ovlan,<VID>,<output>';
+    frames not mapped to an input and an output are skipped. Arrival times are
+    kept relative to the 'line-rate' of the captured link, so every port sees
+    the same load as in the capture. Frames shorter than 'l' are padded and 'n'
+    limits the frames per input port only when given.
+
+    With an arrival process other than 'none', every frame gets an arrival
+    time (in bytes at line rate from the start of the benchmark) such that each
+    input port is offered 'load' of its line rate: 'bernoulli' inserts
+    geometrically distributed idle gaps after each frame, 'poisson' uses
+    exponentially distributed inter-arrival times and 'fixed' constant gaps.
+    The 'onoff' process alternates bursts of back-to-back frames with idle
+    periods, both geometrically distributed with mean 'burst-length' frames
+    and 'idle-length' bytes (derived from 'load' unless given); with
+    'correlated' every frame of a burst goes to the same output.
+
+    The destinations follow the 'pattern': 'uniform' over all outputs,
+    'hotspot' (a fraction of the traffic to one port, the rest uniform),
+    'incast' (N inputs to one output), a random one-to-one 'permutation',
+    'transpose' and 'bitreverse' of the port number bits, 'diagonal' (2/3 to
+    output i, 1/3 to i+1), 'logdiagonal' (halving rates to outputs i, i+1, ...)
+    or an arbitrary rate 'matrix' read from a CSV file. Row i of the matrix
+    holds the rates from input i to each output as fractions of the line rate:
+    its sum scales the offered load of the input (inputs with an empty row send
+    nothing) and the destinations follow its distribution.
 
     The provision of the rest of parameters is encouraged.
 
     """
+    if test == 'pcap':
+        if capture is None or map_file is None:
+            raise click.BadParameter('the pcap traffic needs a CAPTURE file and a --map file', param_hint='TEST')
+        if arrival != 'none' or pattern != 'uniform':
+            raise click.BadParameter('the pcap traffic keeps the arrival times and destinations of the capture', param_hint='TEST')
+        max_frames = n if click.get_current_context().get_parameter_source('n') == click.core.ParameterSource.COMMANDLINE else 0
+        return pcap_traffic(capture, map_file, r, max_frames, l, line_rate)
+    elif capture is not None:
+        raise click.BadParameter(f'a CAPTURE file is only used by the pcap traffic', param_hint='CAPTURE')
+    if test == 'mix' and mix is None:
+        raise click.BadParameter('the mix traffic needs a --mix of sizes', param_hint='TEST')
+    if test == 'cdf' and cdf_file is None:
+        raise click.BadParameter('the cdf traffic needs a --cdf file', param_hint='TEST')
+    if test == 'uniform' and u < l:
+        raise click.BadParameter(f'the upper size limit {u} is lower than the lower one {l}', param_hint='-u')
+    if pattern == 'matrix' and matrix_file is None:
+        raise click.BadParameter('the matrix pattern needs a --matrix file', param_hint='--pattern')
+    if max(hotspot_port, incast_target) >= r:
+        raise click.BadParameter(f'ports must be lower than the radix {r}')
+    for name, values in [('--burst-length', burst_length), ('--idle-length', idle_length)]:
+        if values is not None and len(values) not in [1, r]:
+            raise click.BadParameter(f'expected 1 or {r} values, got {len(values)}', param_hint=name)
+    if arrival != 'onoff' and (correlated or idle_length is not None):
+        raise click.BadParameter('only available with the onoff arrival process', param_hint='--correlated/--idle-length')
+
+    # the seed is kept in the metadata so that the profile can be reproduced,
+    # and in the name when given, so that profiles of other seeds are not reused
+    seed_name = f'-s{seed}' if seed is not None else ''
+    if seed is None:
+        seed = random.randrange(2**32)
+    random.seed(seed)
+
+    try:
+        rates = rate_matrix(pattern, r, hotspot_port, hotspot_fraction, incast_target, incast_sources, matrix_file)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='--pattern')
+
     print('Starting creating traffic profile.')
-    # prepare benchmarking variables
+
+    # prepare benchmarking variables: frame sizes and their cumulative weights
+    size_weights = None
+    size_name = test
     if test == "custom":
-        frames_length = [l]*n
-        frames_min = l
-        frames_max = l
+        frames_sizes = [l]
     elif test == "min":
-        frames_length = [64]*n
-        frames_min = 64
-        frames_max = 64
+        frames_sizes = [64]
     elif test == "max":
-        frames_length = [1514]*n
-        frames_min = 1514
-        frames_max = 1514
+        frames_sizes = [1514]
     elif test == "uniform":
-        frames_length = random.sample(range(l, u+1), n)
-        frames_min = l
-        frames_max = u
+        frames_sizes = range(l, u+1)
+    elif test == "imix":
+        imix = imixes[imix_name]
+        frames_sizes = [size for size, weight in imix]
+        size_weights = list(itertools.accumulate(weight for size, weight in imix))
+        size_name = 'imix' if imix_name == 'simple' else f'imix-{imix_name}'
+    elif test == "bimodal":
+        frames_sizes = [l, u]
+        size_weights = [small_fraction, 1.0]
+        size_name = f'bimodal{small_fraction:g}'
+    elif test == "mix":
+        frames_sizes = [size for size, weight in mix]
+        size_weights = list(itertools.accumulate(weight for size, weight in mix))
+        size_name = 'mix-' + '_'.join(f'{size}x{weight:g}' for size, weight in mix)
+    elif test == "cdf":
+        try:
+            frames_sizes, size_weights = load_cdf(cdf_file)
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint='--cdf')
+        size_name = f'cdf-{Path(cdf_file).stem}'
+    frames_min = min(frames_sizes)
+    frames_max = max(frames_sizes)
 
     # prepare output file
     dir_file = f'traffic/profiles'
-    output_file = f'{dir_file}/{test}-{r}x{r}-{n}-({frames_min}-{frames_max}).txt' # consider adding {time.strftime("%Y%m%d-%H%M%S")}
+    timed = arrival != 'none'
+    arrival_name = f'-{arrival}{load:g}' if timed else ''
+    if arrival == 'onoff':
+        burst_name = '_'.join(f'{x:g}' for x in burst_length)
+        idle_name = f'i{"_".join(f"{x:g}" for x in idle_length)}' if idle_length else f'{load:g}'
+        arrival_name = f'-onoff-b{burst_name}-{idle_name}{"-corr" if correlated else ""}'
+    if pattern == 'matrix':
+        pattern_name = f'-matrix-{Path(matrix_file).stem}'
+    elif pattern != 'uniform':
+        pattern_name = f'-{pattern}'
+    else:
+        pattern_name = ''
+    output_file = f'{dir_file}/{size_name}{pattern_name}-{r}x{r}-{n}-({frames_min}-{frames_max}){arrival_name}{seed_name}.txt' # consider adding {time.strftime("%Y%m%d-%H%M%S")}
     Path(dir_file).mkdir(parents=True, exist_ok=True)
 
     # check if configuration available
@@ -78,19 +202,140 @@ def traffic(test:str, r:int, n: int, l: int, u:int):
         Path(output_file).touch(exist_ok=False)
         f = open(output_file, "a")
         # metadata
-        f.write(f'Test,{test},Radix,{r}\n')
-        f.write(f'Input,Output,Length\n')
+        metadata = f'Test,{test},Radix,{r}'
+        if arrival == 'onoff':
+            # with explicit idle lengths the load follows from the burst and idle lengths
+            metadata += '' if idle_length else f',Load,{load:g}'
+            metadata += f',Arrival,{arrival},Burst,{burst_name},Idle,{idle_name.lstrip("i") if idle_length else "auto"},Correlated,{int(correlated)}'
+        elif timed:
+            metadata += f',Load,{load:g},Arrival,{arrival}'
+        if pattern_name:
+            metadata += f',Pattern,{pattern_name[1:]}'
+        metadata += f',Seed,{seed}'
+        f.write(f'{metadata}\n')
+        f.write(f'Input,Output,Length,Time\n' if timed else f'Input,Output,Length\n')
 
         # generate profile
         for input in range(r):
+            input_rate = sum(rates[input])
+            if input_rate <= 0:
+                continue
+            frames_length = random.choices(frames_sizes, cum_weights=size_weights, k=n)
+            outputs = random.choices(range(r), weights=rates[input], k=len(frames_length))
+            if arrival == 'onoff':
+                burst = burst_length[input % len(burst_length)]
+                if idle_length:
+                    idle = idle_length[input % len(idle_length)]
+                else:
+                    input_load = min(load*input_rate, 1.0)
+                    idle = burst*sum(frames_length)/len(frames_length)*(1-input_load)/input_load
+                times, bursts = onoff_times(frames_length, burst, idle)
+                if correlated:
+                    burst_outputs = random.choices(range(r), weights=rates[input], k=bursts[-1]+1)
+                    outputs = [burst_outputs[b] for b in bursts]
+            elif timed:
+                times = arrival_times(frames_length, min(load*input_rate, 1.0), arrival)
             # frames loop
-            for length in frames_length:
-                output = random.randrange(r)
-                f.write(f'{input},{output},{length}\n')
+            for k, length in enumerate(frames_length):
+                output = outputs[k]
+                if timed:
+                    f.write(f'{input},{output},{length},{times[k]}\n')
+                else:
+                    f.write(f'{input},{output},{length}\n')
 
         f.close()
         print('Finishing creating traffic profile.')
 
     except FileExistsError:
         print("Configuration already exists")
-        return
\ No newline at end of file
+
+    return output_file
+
+def pcap_traffic(capture:str, map_file:str, r:int, max_frames:int, min_length:int, line_rate:float):
+    """Traffic profile replaying a capture."""
+    try:
+        mapping = read_mapping(map_file, r)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='--map')
+
+    print('Starting creating traffic profile.')
+
+    # prepare output file
+    dir_file = f'traffic/profiles'
+    limit_name = f'-{max_frames}' if max_frames else ''
+    output_file = f'{dir_file}/pcap-{Path(capture).stem}-{r}x{r}{limit_name}-{line_rate:g}G.txt'
+    Path(dir_file).mkdir(parents=True, exist_ok=True)
+
+    # check if configuration available
+    try:
+        Path(output_file).touch(exist_ok=False)
+    except FileExistsError:
+        print("Configuration already exists")
+        return
+
+    with open(output_file, "a") as f:
+        # metadata
+        f.write(f'Test,pcap,Radix,{r},Capture,{Path(capture).name},LineRate,{line_rate:g}\n')
+        f.write(f'Input,Output,Length,Time\n')
+        try:
+            frames, skipped = replay(capture, mapping, r, line_rate, min_length, max_frames, f)
+        except ValueError as e:
+            Path(output_file).unlink()
+            raise click.BadParameter(str(e), param_hint='CAPTURE')
+
+    print(f'Frames per input port: {", ".join(map(str, frames))} ({skipped} frames skipped)')
+    print('Finishing creating traffic profile.')
+
+def arrival_times(frames_length:list, load:float, arrival:str):
+    """
+    Arrival time of each frame of an input port, in bytes at line rate.
+
+    On average a frame of length L is followed by L*(1-load)/load idle bytes,
+    so that the port is offered 'load' of its line rate.
+
+    """
+    times = []
+    t = 0.0
+    for length in frames_length:
+        times.append(int(t))
+        mean_gap = length/load
+        if arrival == 'fixed':
+            t += mean_gap
+        elif arrival == 'poisson':
+            t += random.expovariate(1/mean_gap)
+        elif arrival == 'bernoulli':
+            # idle bytes until the next arrival, geometric with the right mean
+            t += length + geometric(mean_gap - length)
+    return times
+
+def onoff_times(frames_length:list, burst:float, idle:float):
+    """
+    Arrival time (in bytes at line rate) and burst index of each frame of an
+    input port for an on/off source.
+
+    Bursts hold a geometrically distributed number of back-to-back frames with
+    mean 'burst' (at least one) and are separated by geometrically distributed
+    idle periods with mean 'idle' bytes.
+
+    """
+    times = []
+    bursts = []
+    t = 0.0
+    b = 0
+    left = 1 + geometric(burst - 1)
+    for length in frames_length:
+        if left == 0:
+            t += geometric(idle)
+            b += 1
+            left = 1 + geometric(burst - 1)
+        times.append(int(t))
+        bursts.append(b)
+        t += length
+        left -= 1
+    return times, bursts
+
+def geometric(mean:float):
+    """Geometrically distributed non-negative integer with the given mean."""
+    if mean <= 0:
+        return 0
+    return math.floor(math.log(1.0-random.random())/math.log(mean/(mean+1)))
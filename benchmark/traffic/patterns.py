@@ -0,0 +1,90 @@
+"""
+
+Copyright (c) 2023 Corundum organization
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+import random
+
+
+def rate_matrix(pattern:str, r:int, hotspot_port:int = 0, hotspot_fraction:float = 0.5, incast_target:int = 0,
+        incast_sources:int = None, matrix_file:str = None):
+    """
+    RADIX x RADIX rate matrix of a traffic pattern.
+
+    Row i holds the rates from input i to every output as fractions of the
+    line rate of input i. The rows of the built-in patterns add up to 1 (or 0
+    for inputs that do not send anything); the destinations of the frames of
+    an input follow the distribution of its row.
+
+    """
+    if pattern == 'uniform':
+        return [[1/r]*r for i in range(r)]
+
+    elif pattern == 'hotspot':
+        # a fraction of the traffic goes to the hotspot, the rest is uniform
+        return [[(1-hotspot_fraction)/r + (hotspot_fraction if j == hotspot_port else 0) for j in range(r)] for i in range(r)]
+
+    elif pattern == 'incast':
+        # N inputs (other than the target) send everything to the target output
+        sources = [i for i in range(r) if i != incast_target][:incast_sources if incast_sources is not None else r-1]
+        return [[1.0 if (i in sources and j == incast_target) else 0.0 for j in range(r)] for i in range(r)]
+
+    elif pattern == 'permutation':
+        permutation = random.sample(range(r), r)
+        return [[1.0 if j == permutation[i] else 0.0 for j in range(r)] for i in range(r)]
+
+    elif pattern in ['transpose', 'bitreverse']:
+        b = (r-1).bit_length()
+        if 2**b != r:
+            raise ValueError(f'The {pattern} pattern needs a power of 2 radix, not {r}')
+        if pattern == 'transpose':
+            # swap the upper and lower halves of the port number bits
+            destination = [((i << (b//2)) | (i >> (b - b//2))) & (r-1) for i in range(r)]
+        else:
+            destination = [int(f'{i:0{b}b}'[::-1], 2) if b else 0 for i in range(r)]
+        return [[1.0 if j == destination[i] else 0.0 for j in range(r)] for i in range(r)]
+
+    elif pattern == 'diagonal':
+        # 2/3 of the traffic to output i, 1/3 to output i+1
+        return [[(2/3 if j == i else 0) + (1/3 if j == (i+1) % r else 0) for j in range(r)] for i in range(r)]
+
+    elif pattern == 'logdiagonal':
+        # the rate to output i+j halves with every j
+        total = sum(2**-(j+1) for j in range(r))
+        return [[2**-(((j-i) % r)+1)/total for j in range(r)] for i in range(r)]
+
+    elif pattern == 'matrix':
+        return load_matrix(matrix_file, r)
+
+    raise ValueError(f'Unknown traffic pattern {pattern}')
+
+
+def load_matrix(matrix_file:str, r:int):
+    """Rate matrix from a CSV file with RADIX rows of RADIX rates each."""
+    with open(matrix_file) as f:
+        rows = [[float(x) for x in line.strip('\n').split(",")] for line in f if line.strip() and not line.startswith('#')]
+
+    if len(rows) != r or any(len(row) != r for row in rows):
+        raise ValueError(f'{matrix_file} must hold a {r}x{r} rate matrix')
+    if any(x < 0 for row in rows for x in row) or any(sum(row) > 1 + 1e-9 for row in rows):
+        raise ValueError(f'The rates of every input in {matrix_file} must be non-negative and add up to at most 1')
+    return rows
@@ -0,0 +1,69 @@
+"""
+
+Copyright (c) 2023 Corundum organization
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+
+# IMIX frame sizes and weights, by name
+imixes = {
+    # simple IMIX: 7 minimum, 4 medium and 1 maximum size frames
+    'simple': [(64, 7), (594, 4), (1514, 1)],
+    # the 7:4:1 variant with 576 byte medium size frames
+    'simple576': [(64, 7), (576, 4), (1514, 1)],
+    # Tolly IMIX: 55% minimum, 5% 78, 17% 576 and 23% maximum size frames
+    'tolly': [(64, 55), (78, 5), (576, 17), (1514, 23)],
+    # simple IMIX with jumbo frames, 7:4:1:1 up to 9000 bytes
+    'jumbo': [(64, 7), (594, 4), (1514, 1), (9000, 1)],
+}
+
+
+def load_cdf(cdf_file:str):
+    """
+    Empirical frame size distribution from a CSV file.
+
+    Each line holds a frame size in bytes and the cumulative probability of
+    frames up to that size, with both columns increasing and the last
+    probability equal to 1. Returns the sizes and the cumulative weights.
+
+    """
+    sizes = []
+    cum_weights = []
+    with open(cdf_file) as f:
+        for line in f:
+            if not line.strip() or line.startswith('#'):
+                continue
+            size, probability = line.strip('\n').split(",")[:2]
+            try:
+                sizes.append(int(size))
+                cum_weights.append(float(probability))
+            except ValueError:
+                # header line
+                if sizes:
+                    raise ValueError(f'{cdf_file}: {line.strip()!r} is not a size and a cumulative probability')
+
+    if not sizes:
+        raise ValueError(f'{cdf_file} holds no frame sizes')
+    if any(x <= 0 for x in sizes) or any(b <= a for a, b in zip(sizes, sizes[1:])):
+        raise ValueError(f'The sizes in {cdf_file} must be positive and increasing')
+    if cum_weights[0] < 0 or any(b < a for a, b in zip(cum_weights, cum_weights[1:])) or abs(cum_weights[-1] - 1) > 1e-6:
+        raise ValueError(f'The cumulative probabilities in {cdf_file} must be increasing and end at 1')
+    return sizes, cum_weights
@@ -0,0 +1,78 @@
+"""
+
+Copyright (c) 2023 Corundum organization
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+import random
+
+import pytest
+
+from traffic.command import arrival_times, onoff_times, geometric
+
+
+def test_fixed_arrivals():
+    assert arrival_times([100, 100, 50, 100], 0.5, 'fixed') == [0, 200, 400, 500]
+    assert arrival_times([64]*3, 1.0, 'fixed') == [0, 64, 128]
+
+
+@pytest.mark.parametrize("arrival", ['bernoulli', 'poisson', 'fixed'])
+@pytest.mark.parametrize("load", [0.2, 0.7])
+def test_offered_load(arrival, load):
+    random.seed(3)
+    lengths = [random.choice([64, 594, 1514]) for k in range(20000)]
+    times = arrival_times(lengths, load, arrival)
+    assert times == sorted(times)
+    assert sum(lengths[:-1])/times[-1] == pytest.approx(load, rel=0.05)
+
+
+def test_bernoulli_frames_do_not_overlap():
+    random.seed(4)
+    lengths = [random.randint(64, 1514) for k in range(5000)]
+    times = arrival_times(lengths, 0.9, 'bernoulli')
+    assert all(b - a >= length for a, b, length in zip(times, times[1:], lengths))
+
+
+def test_geometric():
+    random.seed(5)
+    assert geometric(0) == 0
+    assert geometric(-1) == 0
+    samples = [geometric(10) for k in range(50000)]
+    assert min(samples) == 0
+    assert sum(samples)/len(samples) == pytest.approx(10, rel=0.05)
+
+
+def test_onoff():
+    random.seed(6)
+    lengths = [100]*50000
+    times, bursts = onoff_times(lengths, 8, 400)
+
+    assert bursts == sorted(bursts)
+    assert bursts[0] == 0
+    # back-to-back within a burst, idle gaps between bursts
+    for k in range(1, len(times)):
+        if bursts[k] == bursts[k-1]:
+            assert times[k] - times[k-1] == 100
+        else:
+            assert times[k] - times[k-1] >= 100
+    assert len(lengths)/(bursts[-1] + 1) == pytest.approx(8, rel=0.05)
+    # 8 frames of 100 bytes and 400 idle bytes per burst on average
+    assert sum(lengths[:-1])/times[-1] == pytest.approx(800/1200, rel=0.05)
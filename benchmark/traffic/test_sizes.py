@@ -0,0 +1,104 @@
+"""
+
+Copyright (c) 2023 Corundum organization
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+from collections import Counter
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+import profile_io
+from traffic import traffic
+from traffic.sizes import imixes, load_cdf
+
+
+@pytest.fixture(autouse=True)
+def work_dir(tmp_path, monkeypatch):
+    # profiles are written to traffic/profiles under the current folder
+    monkeypatch.chdir(tmp_path)
+
+
+def generate(args):
+    """Frames of a traffic profile generated in the current folder."""
+    result = CliRunner().invoke(traffic, args)
+    assert result.exit_code == 0, result.output
+    path = next(Path('traffic/profiles').iterdir())
+    return path, profile_io.load_frames(str(path))
+
+
+@pytest.mark.parametrize("name", list(imixes))
+def test_imix(name):
+    path, frames = generate(['imix', '--imix', name, '-n', '20000', '--seed', '1'])
+    # the simple IMIX keeps the name of the profiles generated before the others
+    assert path.name.startswith('imix-4x4-' if name == 'simple' else f'imix-{name}-4x4-')
+
+    counts = Counter(frames['Length'].tolist())
+    total = sum(weight for size, weight in imixes[name])
+    assert set(counts) == {size for size, weight in imixes[name]}
+    for size, weight in imixes[name]:
+        assert counts[size]/len(frames) == pytest.approx(weight/total, abs=0.01)
+
+
+def test_bimodal():
+    path, frames = generate(['bimodal', '-l', '64', '-u', '1514', '--small-fraction', '0.8', '-n', '10000', '--seed', '2'])
+    assert set(frames['Length'].tolist()) == {64, 1514}
+    assert (frames['Length'] == 64).mean() == pytest.approx(0.8, abs=0.01)
+
+
+def test_mix():
+    path, frames = generate(['mix', '--mix', '64:3,9000:1', '-n', '10000', '--seed', '3'])
+    assert path.name.startswith('mix-64x3_9000x1-')
+    assert (frames['Length'] == 9000).mean() == pytest.approx(0.25, abs=0.01)
+
+
+def test_same_seed_same_profile():
+    path, first = generate(['uniform', '-n', '100', '--seed', '4'])
+    path.unlink()
+    path, second = generate(['uniform', '-n', '100', '--seed', '4'])
+    assert (first == second).all()
+
+
+def test_cdf(tmp_path):
+    cdf_file = tmp_path / 'sizes.csv'
+    cdf_file.write_text('size,probability\n64,0.5\n# medium frames\n576,0.75\n1514,1\n')
+    assert load_cdf(str(cdf_file)) == ([64, 576, 1514], [0.5, 0.75, 1.0])
+
+    path, frames = generate(['cdf', '--cdf', str(cdf_file), '-n', '10000', '--seed', '5'])
+    assert path.name.startswith('cdf-sizes-')
+    assert (frames['Length'] == 64).mean() == pytest.approx(0.5, abs=0.02)
+    assert (frames['Length'] == 576).mean() == pytest.approx(0.25, abs=0.02)
+
+
+@pytest.mark.parametrize("text", [
+    '',
+    '64,0.5\n576,0.9\n',
+    '576,0.5\n64,1\n',
+    '64,0.5\n576,0.4\n1514,1\n',
+    '64,0.5\nmedium,1\n',
+])
+def test_invalid_cdf(tmp_path, text):
+    cdf_file = tmp_path / 'sizes.csv'
+    cdf_file.write_text(text)
+    with pytest.raises(ValueError):
+        load_cdf(str(cdf_file))
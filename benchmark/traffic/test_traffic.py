@@ -0,0 +1,130 @@
+"""
+
+Copyright (c) 2023 Corundum organization
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+import random
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from traffic import traffic
+from traffic.patterns import rate_matrix, load_matrix
+
+
+@pytest.fixture
+def work_dir(tmp_path, monkeypatch):
+    # profiles are written to traffic/profiles under the current folder
+    monkeypatch.chdir(tmp_path)
+
+
+@pytest.mark.parametrize("pattern", ['uniform', 'hotspot', 'permutation', 'transpose', 'bitreverse', 'diagonal', 'logdiagonal'])
+@pytest.mark.parametrize("r", [4, 8])
+def test_rows_add_up_to_one(pattern, r):
+    random.seed(1)
+    rates = rate_matrix(pattern, r)
+    assert len(rates) == r
+    for row in rates:
+        assert len(row) == r
+        assert min(row) >= 0
+        assert sum(row) == pytest.approx(1.0)
+
+
+def test_hotspot():
+    rates = rate_matrix('hotspot', 4, hotspot_port=2, hotspot_fraction=0.6)
+    for row in rates:
+        assert row[2] == pytest.approx(0.6 + 0.4/4)
+        assert row[0] == pytest.approx(0.4/4)
+
+
+def test_incast():
+    rates = rate_matrix('incast', 8, incast_target=3, incast_sources=2)
+    # the first two inputs other than the target send everything to it
+    assert [sum(row) for row in rates] == [1.0, 1.0, 0, 0, 0, 0, 0, 0]
+    assert all(row[3] == 1.0 for row in rates[:2])
+
+    rates = rate_matrix('incast', 4, incast_target=0)
+    assert [row[0] for row in rates] == [0.0, 1.0, 1.0, 1.0]
+
+
+@pytest.mark.parametrize("pattern", ['permutation', 'transpose', 'bitreverse'])
+def test_one_to_one(pattern):
+    random.seed(2)
+    rates = rate_matrix(pattern, 16)
+    destinations = [row.index(1.0) for row in rates]
+    assert sorted(destinations) == list(range(16))
+
+
+def test_transpose_and_bitreverse():
+    transpose = [row.index(1.0) for row in rate_matrix('transpose', 16)]
+    bitreverse = [row.index(1.0) for row in rate_matrix('bitreverse', 16)]
+    # 0b0001 -> 0b0100 and 0b1000
+    assert transpose[1] == 4
+    assert bitreverse[1] == 8
+    assert bitreverse[0b0011] == 0b1100
+    assert transpose[transpose[6]] == 6
+
+
+@pytest.mark.parametrize("pattern", ['transpose', 'bitreverse'])
+def test_power_of_two_radix(pattern):
+    with pytest.raises(ValueError):
+        rate_matrix(pattern, 6)
+
+
+def test_diagonal():
+    rates = rate_matrix('diagonal', 4)
+    assert rates[3][3] == pytest.approx(2/3)
+    assert rates[3][0] == pytest.approx(1/3)
+
+
+def test_logdiagonal():
+    rates = rate_matrix('logdiagonal', 4)
+    for i, row in enumerate(rates):
+        assert row[(i+1) % 4] == pytest.approx(row[i]/2)
+        assert row[(i+3) % 4] == pytest.approx(row[i]/8)
+
+
+def test_matrix(tmp_path):
+    matrix_file = tmp_path / 'rates.csv'
+    matrix_file.write_text('# rates\n0.5,0.5\n0,0.25\n')
+    assert rate_matrix('matrix', 2, matrix_file=str(matrix_file)) == [[0.5, 0.5], [0.0, 0.25]]
+
+    with pytest.raises(ValueError):
+        load_matrix(str(matrix_file), 3)
+    matrix_file.write_text('0.75,0.5\n0,0\n')
+    with pytest.raises(ValueError):
+        load_matrix(str(matrix_file), 2)
+
+
+def test_unknown_pattern():
+    with pytest.raises(ValueError):
+        rate_matrix('tornado', 4)
+
+
+def test_seed_in_name(work_dir):
+    # a profile of another seed is not reused
+    first = CliRunner().invoke(traffic, ['uniform', '-n', '100', '--load', '0.5', '--arrival', 'bernoulli', '--seed', '6'])
+    second = CliRunner().invoke(traffic, ['uniform', '-n', '100', '--load', '0.5', '--arrival', 'bernoulli', '--seed', '7'])
+    assert 'already exists' not in second.output
+    assert sorted(path.name for path in Path('traffic/profiles').iterdir()) == [
+        'uniform-4x4-100-(64-1514)-bernoulli0.5-s6.txt', 'uniform-4x4-100-(64-1514)-bernoulli0.5-s7.txt']
@@ -24,8 +24,10 @@ THE SOFTWARE.
 
 import click
 
-switch_suffixes = ['iq', 'iq_voq', 'oq']
-traffic_types = ['custom', 'min', 'max', 'uniform']
+switch_suffixes = ['iq', 'iq_voq', 'oq', 'cicq']
+traffic_types = ['custom', 'min', 'max', 'uniform', 'imix', 'bimodal', 'mix', 'cdf', 'pcap']
+arrival_processes = ['none', 'bernoulli', 'poisson', 'fixed', 'onoff']
+traffic_patterns = ['uniform', 'hotspot', 'incast', 'permutation', 'transpose', 'bitreverse', 'diagonal', 'logdiagonal', 'matrix']
 
 class SwitchSuffix(click.ParamType):
     """A valid switch architecture suffix."""
@@ -47,4 +49,58 @@ class TrafficType(click.ParamType):
         if value in traffic_types:
             return(value)
         else:
-            self.fail(f'{value!r} is not a valid latency test.', param, ctx)
\ No newline at end of file
+            self.fail(f'{value!r} is not a valid latency test.', param, ctx)
+
+class ArrivalProcess(click.ParamType):
+    """A valid frame arrival process."""
+
+    name = 'Arrival process'
+
+    def convert(self, value, param, ctx):
+        if value in arrival_processes:
+            return(value)
+        else:
+            self.fail(f'{value!r} is not a valid arrival process.', param, ctx)
+
+class TrafficPattern(click.ParamType):
+    """A valid traffic pattern (destination distribution)."""
+
+    name = 'Traffic pattern'
+
+    def convert(self, value, param, ctx):
+        if value in traffic_patterns:
+            return(value)
+        else:
+            self.fail(f'{value!r} is not a valid traffic pattern.', param, ctx)
+
+class PortValues(click.ParamType):
+    """A positive number for all ports or a comma separated list with one per port."""
+
+    name = 'Port values'
+
+    def convert(self, value, param, ctx):
+        if isinstance(value, list):
+            return(value)
+        try:
+            values = [float(x) for x in str(value).split(",")]
+        except ValueError:
+            self.fail(f'{value!r} is not a number or a comma separated list of numbers.', param, ctx)
+        if any(x <= 0 for x in values):
+            self.fail(f'{value!r} must only contain positive numbers.', param, ctx)
+        return(values)
+
+class SizeMix(click.ParamType):
+    """A comma separated list of SIZE:WEIGHT frame sizes."""
+
+    name = 'Size mix'
+
+    def convert(self, value, param, ctx):
+        if isinstance(value, list):
+            return(value)
+        try:
+            mix = [(int(size), float(weight)) for size, weight in (x.split(":") for x in str(value).split(","))]
+        except ValueError:
+            self.fail(f'{value!r} is not a comma separated list of SIZE:WEIGHT pairs.', param, ctx)
+        if any(size <= 0 or weight < 0 for size, weight in mix) or not sum(weight for size, weight in mix) > 0:
+            self.fail(f'{value!r} must have positive sizes and non-negative weights.', param, ctx)
+        return(mix)
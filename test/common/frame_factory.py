@@ -0,0 +1,79 @@
+"""
+
+Copyright (c) 2023 Corundum organization
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+import functools
+import itertools
+
+from cocotbext.axi import AxiStreamFrame
+
+# incrementing byte pattern long enough for the largest (jumbo) frames
+PATTERN_LENGTH = 9216
+pattern = bytes(itertools.islice(itertools.cycle(range(256)), PATTERN_LENGTH))
+pattern_view = memoryview(pattern)
+
+
+def payload(length):
+    """Incrementing payload of 'length' bytes, sliced from the shared pattern."""
+    if length <= PATTERN_LENGTH:
+        return bytearray(pattern_view[:length])
+    return bytearray(itertools.islice(itertools.cycle(range(256)), length))
+
+
+def incrementing_payload(length):
+    return bytes(payload(length))
+
+
+@functools.lru_cache(maxsize=None)
+def one_hot(radix):
+    """One-hot tdest of every port and port of every one-hot tdest."""
+    encode = tuple(1 << port for port in range(radix))
+    decode = {tdest: port for port, tdest in enumerate(encode)}
+    return encode, decode
+
+
+class FrameFactory:
+    """
+    Builds test frames with an incrementing payload and a one-hot tdest.
+
+    The one-hot tdest of every output and the payload pattern are computed
+    once, so the hot send loop only slices the payload and builds the frame.
+
+    """
+
+    def __init__(self, radix, user_width, tx_complete=None):
+        self.tdest, self.port = one_hot(radix)
+        self.user_mask = 2**user_width-1
+        self.tx_complete = tx_complete
+
+    def build(self, output, length, tid, tuser=None):
+        return AxiStreamFrame(payload(length), tid=tid, tdest=self.tdest[output],
+            tuser=length & self.user_mask if tuser is None else tuser, tx_complete=self.tx_complete)
+
+    def dest(self, output):
+        """One-hot tdest of an output port."""
+        return self.tdest[output]
+
+    def output(self, tdest):
+        """Output port of a one-hot tdest."""
+        return self.port[tdest]
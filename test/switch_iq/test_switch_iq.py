@@ -44,6 +44,8 @@ from cocotb.regression import TestFactory
 from cocotbext.axi import AxiStreamBus, AxiStreamSource, AxiStreamSink, AxiStreamFrame
 from cocotbext.axi.stream import define_stream
 
+from frame_factory import FrameFactory, incrementing_payload
+
 
 EthHdrBus, EthHdrTransaction, EthHdrSource, EthHdrSink, EthHdrMonitor = define_stream("EthHdr",
     signals=["hdr_valid", "hdr_ready", "dest_mac", "src_mac", "type"]
@@ -101,6 +103,7 @@ async def run_test(dut, payload_lengths=None, payload_data=None, idle_inserter=N
     DEST_ENABLE= int(os.getenv("PARAM_AXIS_DEST_ENABLE"))
     DEST_WIDTH = int(os.getenv("PARAM_AXIS_DEST_WIDTH")) 
 
+    frames = FrameFactory(tb.radix, USER_WIDTH)
     test_frames = []
     payload_lengths_lite = [28]
 
@@ -108,9 +111,7 @@ async def run_test(dut, payload_lengths=None, payload_data=None, idle_inserter=N
     for payload in [payload_data(x) for x in payload_lengths()]:
         test_frame = AxiStreamFrame(payload)
 
-        tdest = [0 if (i!=output) else 1 for i in range(tb.radix)][::-1]
-        tdest_int = int(''.join(map(str, tdest)), 2)
-        test_frame.tdest = tdest_int
+        test_frame.tdest = frames.dest(output)
 
         test_frame.tuser = len(payload)%(2**USER_WIDTH)
         test_frame.tid = len(payload)%(2**ID_WIDTH)
@@ -167,6 +168,7 @@ async def run_stress_test(dut, payload_lengths=None, payload_data=None, idle_ins
     count_mask = max_count-1
 
     cur_id = 1
+    frames = FrameFactory(tb.radix, USER_WIDTH)
 
     await tb.reset()
 
@@ -178,16 +180,8 @@ async def run_stress_test(dut, payload_lengths=None, payload_data=None, idle_ins
         # frames loop
         for k in range(128):
             length = random.randint(1, 128)
-            test_data = bytearray(itertools.islice(itertools.cycle(range(256)), length))
-            test_frame = AxiStreamFrame(test_data)
-
             output = random.randrange(len(tb.sink))
-            tdest = [0 if (i!=output) else 1 for i in range(tb.radix)][::-1]
-            tdest_int = int(''.join(map(str, tdest)), 2)
-            test_frame.tdest = tdest_int
-
-            test_frame.tid = cur_id | (input << src_shift)
-            test_frame.tuser = length%(2**USER_WIDTH)
+            test_frame = frames.build(output, length, cur_id | (input << src_shift))
 
             test_frames[input][output].append(test_frame)
             
@@ -203,7 +197,7 @@ async def run_stress_test(dut, payload_lengths=None, payload_data=None, idle_ins
             lst_clean = [x for x in input if x]
 
             # identify the output port
-            output = bin(lst_clean[0][0].tdest)[2:][::-1].index('1')
+            output = frames.output(lst_clean[0][0].tdest)
             rx_frame = await tb.sink[output].recv()
 
             test_frame = None
@@ -248,9 +242,6 @@ def cycle_pause_three():
 def size_list():
     return list(range(1, 128)) + [512, 1514, 9214] + [60]*10
 
-def incrementing_payload(length):
-    return bytes(itertools.islice(itertools.cycle(range(256)), length))
-
 # things to do within each run
 if cocotb.SIM_NAME:
 
@@ -275,6 +266,7 @@ if cocotb.SIM_NAME:
 # cocotb-test
 
 tests_dir = os.path.abspath(os.path.dirname(__file__))
+common_dir = os.path.abspath(os.path.join(tests_dir, '..', 'common'))
 rtl_dir = os.path.abspath(os.path.join(tests_dir, '..', '..', 'rtl'))
 lib_dir = os.path.abspath(os.path.join(rtl_dir, '..', 'lib'))
 axis_rtl_dir = os.path.abspath(os.path.join(lib_dir, 'verilog-axis', 'rtl'))
@@ -324,7 +316,7 @@ def test_switch_iq(request, data_width, radix):
         request.node.name.replace('[', '-').replace(']', ''))
 
     cocotb_test.simulator.run(
-        python_search=[tests_dir],
+        python_search=[tests_dir, common_dir],
         verilog_sources=verilog_sources,
         toplevel=toplevel,
         module=module,